@@ -0,0 +1,137 @@
+"""
+Module for writing files atomically
+
+Files are written to a temporary file in the destination directory and then
+renamed over the destination, so that concurrent importers sharing the same
+data directory never observe a partially written file. A batch of files can be
+staged first and renamed into place together once every file has been
+written. Files whose contents are unchanged are left alone, so re-importing an
+unchanged playbook performs no writes.
+"""
+import os
+import tempfile
+
+from typing import List, TextIO, Tuple
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.instrumentation import count, span
+
+
+def current_umask() -> int:
+    """Return the file mode creation mask of the process"""
+    umask: int = os.umask(0)
+    os.umask(umask)
+    return umask
+
+# Constant defining the mode the files written are given, that of a file
+# created by open() under the umask of the process. Temporary files are
+# otherwise only readable by their owner
+FILE_MODE = 0o666 & ~current_umask()
+
+
+def file_has_contents(file_name: str, contents: str) -> bool:
+    """Check whether file_name exists and consists exactly of contents"""
+    try:
+        # Compare the sizes first to avoid reading files which differ
+        if os.path.getsize(file_name) != len(contents.encode()):
+            return False
+        with open(file_name) as file:
+            return file.read() == contents
+    except OSError:
+        return False
+
+
+def create_staged_file(file_name: str) -> Tuple[int, str]:
+    """
+    Create a temporary file with the mode FILE_MODE in the directory of
+    file_name, which must exist already, and return its descriptor and name
+    """
+    directory: str = os.path.dirname(file_name) or "."
+    file_descriptor, temp_file_name = tempfile.mkstemp(
+        dir=directory, prefix=".tmp-", suffix=".part"
+    )
+    try:
+        os.chmod(temp_file_name, FILE_MODE)
+    except BaseException:
+        os.close(file_descriptor)
+        os.remove(temp_file_name)
+        raise
+    return file_descriptor, temp_file_name
+
+
+def open_staged_file(file_name: str) -> Tuple[str, TextIO]:
+    """
+    Create a temporary file in the directory of file_name, which must exist
+    already, and return its name and the file opened for writing
+    """
+    file_descriptor, temp_file_name = create_staged_file(file_name)
+    return temp_file_name, os.fdopen(file_descriptor, 'w')
+
+
+def stage_file(file_name: str, contents: str) -> str:
+    """
+    Write contents to a temporary file in the directory of file_name, which
+    must exist already, and return the name of the temporary file
+    """
+    temp_file_name, file = open_staged_file(file_name)
+    try:
+        with file:
+            count("bytes_written", file.write(contents))
+    except BaseException:
+        # Remove the temporary file so no debris is left in the directory
+        os.remove(temp_file_name)
+        raise
+    count("files_written")
+    return temp_file_name
+
+
+def commit_staged_files(staged_files: List[Tuple[str, str]]) -> None:
+    """
+    Rename each staged temporary file over its destination, given as a list
+    of (temporary file name, file name) pairs
+    """
+    for temp_file_name, file_name in staged_files:
+        os.replace(temp_file_name, file_name)
+
+
+def discard_staged_files(staged_files: List[Tuple[str, str]]) -> None:
+    """Remove each staged temporary file which hasn't been renamed"""
+    for temp_file_name, _ in staged_files:
+        if os.path.exists(temp_file_name):
+            os.remove(temp_file_name)
+
+
+def write_file_atomic(file_name: str, contents: str) -> bool:
+    """
+    Write contents to file_name by writing a temporary file in the same
+    directory and renaming it over file_name. Nothing is written if the file
+    holds the same contents already. Returns whether the file was written
+    """
+    with span("write_files"):
+        if file_has_contents(file_name, contents):
+            count("files_unchanged")
+            return False
+        os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+        staged_files = [(stage_file(file_name, contents), file_name)]
+        try:
+            commit_staged_files(staged_files)
+        except BaseException:
+            discard_staged_files(staged_files)
+            raise
+        return True
+
+
+def write_bytes_atomic(file_name: str, contents: bytes) -> None:
+    """
+    Write the binary contents to file_name, whose directory must exist
+    already, by writing a temporary file in the same directory and renaming
+    it over file_name
+    """
+    file_descriptor, temp_file_name = create_staged_file(file_name)
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            file.write(contents)
+        os.replace(temp_file_name, file_name)
+    except BaseException:
+        os.remove(temp_file_name)
+        raise
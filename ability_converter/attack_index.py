@@ -0,0 +1,198 @@
+"""
+Module for an index of the techniques of MITRE ATT&CK
+
+The techniques are read from a local STIX bundle of ATT&CK, such as
+enterprise-attack.json from https://github.com/mitre-attack/attack-stix-data.
+Rather than parsing the bundle, tens of megabytes of JSON, on each import,
+the tactic and name of each technique are kept in an index pickled next to
+the bundle, in {BUNDLE}.index.pickle. The index is built again whenever the
+modification time or size of the bundle changes.
+
+The workflow steps of a playbook give the techniques they carry out through
+their external references, either by id or by the URL of the technique on
+attack.mitre.org. Resolving the technique of a step takes a dictionary
+lookup per reference.
+"""
+import json
+import os
+import pickle
+import re
+
+from typing import Any, Dict, List, Mapping, Optional, TypedDict
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.atomic_file import write_bytes_atomic
+from ability_converter.instrumentation import span
+
+# Constant defining the suffix of the file holding the index of a bundle,
+# appended to the path of the bundle
+INDEX_SUFFIX = ".index.pickle"
+
+# Constant defining the version of the pickled index, changed whenever the
+# shape of its entries changes
+INDEX_VERSION = 1
+
+# Constant defining the source names of the external references giving the
+# ids of ATT&CK techniques, and the kill chains giving their tactics
+ATTACK_SOURCE_NAMES = (
+    "mitre-attack", "mitre-mobile-attack", "mitre-ics-attack"
+)
+
+# Constant defining the pattern of the URL of a technique or sub-technique
+TECHNIQUE_URL_PATTERN = re.compile(
+    r"attack\.mitre\.org/techniques/(T\d+)(?:/(\d+))?", re.IGNORECASE
+)
+
+
+class AttackTechnique(TypedDict):
+    """
+    Class defining the tactic and technique of an ability, as given by
+    ATT&CK
+    """
+    tactic: str
+    technique_id: str
+    technique_name: str
+
+
+def technique_id_of(stix_object: Mapping[str, Any]) -> Optional[str]:
+    """Return the ATT&CK id of the STIX object, if it has one"""
+    for reference in stix_object.get('external_references') or []:
+        if reference.get('source_name') in ATTACK_SOURCE_NAMES:
+            return reference.get('external_id')
+    return None
+
+
+def attack_techniques(bundle: Mapping[str, Any]) -> Dict[str, AttackTechnique]:
+    """
+    Return the techniques and sub-techniques of the STIX bundle by id, given
+    the first tactic of each. Sub-techniques are named after their parent
+    technique, as Caldera names them
+    """
+    techniques: Dict[str, AttackTechnique] = {}
+    for stix_object in bundle.get('objects') or []:
+        if (stix_object.get('type') != "attack-pattern"
+                or stix_object.get('revoked')):
+            continue
+        technique_id: Optional[str] = technique_id_of(stix_object)
+        if technique_id is None:
+            continue
+        tactics: List[str] = [
+            phase['phase_name']
+            for phase in stix_object.get('kill_chain_phases') or []
+            if phase.get('kill_chain_name') in ATTACK_SOURCE_NAMES
+        ]
+        techniques[technique_id.upper()] = {
+            'tactic': tactics[0] if tactics else "",
+            'technique_id': technique_id.upper(),
+            'technique_name': stix_object.get('name') or "",
+        }
+    for technique_id, technique in techniques.items():
+        parent: Optional[AttackTechnique] = techniques.get(
+            technique_id.split(".")[0]
+        )
+        if "." in technique_id and parent is not None:
+            technique['technique_name'] = (
+                f"{parent['technique_name']}: {technique['technique_name']}"
+            )
+    return techniques
+
+
+class AttackIndex:
+    """
+    Class object indexing the techniques of the ATT&CK STIX bundle at
+    bundle_path by id
+    """
+
+    def __init__(
+        self,
+        bundle_path: str,
+        index_path: Optional[str] = None
+        ) -> None:
+        """
+        Initialise AttackIndex class, loading the index pickled at
+        index_path, by default next to the bundle, or building it from the
+        bundle if it's missing or out of date
+        """
+        self.bundle_path: str = bundle_path
+        self.index_path: str = index_path or bundle_path + INDEX_SUFFIX
+        self.techniques: Dict[str, AttackTechnique] = {}
+        # Whether the bundle was parsed rather than the index loaded
+        self.built: bool = False
+        with span("index_attack"):
+            stat: os.stat_result = os.stat(bundle_path)
+            try:
+                with open(self.index_path, 'rb') as file:
+                    index: Dict[str, Any] = pickle.load(file)
+                if (index['version'] == INDEX_VERSION
+                        and index['mtime_ns'] == stat.st_mtime_ns
+                        and index['size'] == stat.st_size):
+                    self.techniques = index['techniques']
+                    return
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError,
+                    KeyError, TypeError):
+                # No usable index, so it's built from the bundle
+                pass
+            with open(bundle_path, 'rb') as file:
+                self.techniques = attack_techniques(json.load(file))
+            self.built = True
+        self.save(stat)
+
+    def save(self, stat: os.stat_result) -> None:
+        """
+        Pickle the index of the bundle with the given status, unless its
+        directory can't be written
+        """
+        contents: bytes = pickle.dumps({
+            'version': INDEX_VERSION,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'techniques': self.techniques,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        try:
+            write_bytes_atomic(self.index_path, contents)
+        except OSError:
+            pass
+
+    def technique(self, technique_id: str) -> Optional[AttackTechnique]:
+        """Return the technique with the given id, if there is one"""
+        return self.techniques.get(technique_id.upper())
+
+    def reference_technique(
+        self,
+        reference: Mapping[str, Any]
+        ) -> Optional[AttackTechnique]:
+        """
+        Return the technique an external reference refers to, by its id or
+        by its URL on attack.mitre.org, if there is one
+        """
+        external_id: Any = reference.get('external_id')
+        if isinstance(external_id, str):
+            technique: Optional[AttackTechnique] = self.technique(external_id)
+            if technique is not None:
+                return technique
+        url: Any = reference.get('url')
+        if isinstance(url, str):
+            match: Optional[re.Match] = TECHNIQUE_URL_PATTERN.search(url)
+            if match is not None:
+                technique_id: str = match.group(1)
+                if match.group(2) is not None:
+                    technique_id += f".{match.group(2)}"
+                return self.technique(technique_id)
+        return None
+
+    def step_technique(
+        self,
+        step: Mapping[str, Any]
+        ) -> Optional[AttackTechnique]:
+        """
+        Return the technique of the first external reference of the workflow
+        step referring to one, if any does
+        """
+        for reference in step.get('external_references') or []:
+            if isinstance(reference, Mapping):
+                technique: Optional[AttackTechnique] = (
+                    self.reference_technique(reference)
+                )
+                if technique is not None:
+                    return technique
+        return None
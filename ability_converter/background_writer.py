@@ -0,0 +1,135 @@
+"""
+Module for writing files to the Caldera library in background threads
+
+Converting a playbook is CPU bound while writing its files is I/O bound, so
+files are handed to a pool of writer threads as soon as they're ready and
+conversion carries on. The queue of pending writes is bounded: once it's full,
+the thread converting waits for the writers to catch up, which keeps the
+memory held by pending writes bounded. The first error raised by a write is
+raised again in the converting thread by the next call to submit or wait.
+"""
+import queue
+import threading
+
+from typing import Any, Callable, List, Optional, Tuple
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.instrumentation import span
+from ability_converter.output_sink import DirectorySink, OutputSink
+
+# Constant defining the number of writer threads used by default
+DEFAULT_WRITER_THREADS = 4
+
+# Constant defining the number of writes which may be pending at once
+MAX_QUEUED_WRITES = 256
+
+
+class BackgroundWriter:
+    """
+    Class object running writes submitted by the converting thread in a pool
+    of writer threads
+
+    Once a write has failed the writes still queued are skipped, until the
+    error has been raised in the converting thread. The writer can be used as
+    a context manager, which waits for every pending write and stops the
+    threads on exit.
+    """
+
+    def __init__(
+        self,
+        threads: int = DEFAULT_WRITER_THREADS,
+        max_queued: int = MAX_QUEUED_WRITES
+        ) -> None:
+        """Initialise BackgroundWriter class"""
+        self.tasks: "queue.Queue[Optional[Tuple[Callable, Tuple]]]" = (
+            queue.Queue(maxsize=max_queued)
+        )
+        self.error: Optional[BaseException] = None
+        self.error_lock = threading.Lock()
+        self.threads: List[threading.Thread] = [
+            threading.Thread(
+                target=self.run, name=f"ability-writer-{index}", daemon=True
+            )
+            for index in range(max(threads, 1))
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def run(self) -> None:
+        """Run the writes taken from the queue until told to stop"""
+        while True:
+            task: Optional[Tuple[Callable, Tuple]] = self.tasks.get()
+            try:
+                if task is None:
+                    return
+                function, args = task
+                if self.error is None:
+                    function(*args)
+            except BaseException as error: # pylint: disable=broad-except
+                with self.error_lock:
+                    if self.error is None:
+                        self.error = error
+            finally:
+                self.tasks.task_done()
+
+    def raise_error(self) -> None:
+        """Raise the error of a failed write, if any, only once"""
+        with self.error_lock:
+            error: Optional[BaseException] = self.error
+            self.error = None
+        if error is not None:
+            raise error
+
+    def submit(self, function: Callable[..., Any], *args: Any) -> None:
+        """
+        Queue a call of function with args to be run by a writer thread,
+        waiting if the queue is full
+        """
+        self.raise_error()
+        self.tasks.put((function, args))
+
+    def wait(self) -> None:
+        """Wait for every write submitted to finish"""
+        with span("wait_for_writes"):
+            self.tasks.join()
+        self.raise_error()
+
+    def close(self) -> None:
+        """Wait for every write submitted to finish and stop the threads"""
+        try:
+            self.wait()
+        finally:
+            for _ in self.threads:
+                self.tasks.put(None)
+            for thread in self.threads:
+                thread.join()
+
+    def __enter__(self) -> "BackgroundWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        # Don't hide the error being raised with that of a write
+        try:
+            self.close()
+        except BaseException: # pylint: disable=broad-except
+            pass
+
+
+def write_file(
+    file_name: str,
+    contents: str,
+    background_writer: Optional[BackgroundWriter] = None,
+    sink: Optional[OutputSink] = None
+    ) -> None:
+    """
+    Write contents to file_name in sink, by default the working directory, in
+    a writer thread of background_writer if one is given
+    """
+    sink = sink or DirectorySink()
+    if background_writer is None:
+        sink.write(file_name, contents)
+    else:
+        background_writer.submit(sink.write, file_name, contents)
@@ -0,0 +1,3 @@
+"""
+Initialise the benchmarks package
+"""
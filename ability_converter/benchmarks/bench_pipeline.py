@@ -0,0 +1,321 @@
+"""
+Module to benchmark the conversion pipeline end to end on generated playbooks
+
+Each scenario generates a synthetic playbook and times loading it, converting
+its workflow steps, writing the abilities, the sources and the profile, then
+records the peak memory of the whole pipeline with tracemalloc. The results
+are stored as JSON so that they can be compared with those of another version.
+
+Run with: python -m ability_converter.benchmarks.bench_pipeline
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, TypedDict
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.benchmarks.generate_playbook import (
+    PlaybookParameters, default_parameters, write_playbooks
+)
+from ability_converter.cacao_importer import (
+    construct_profile, construct_sources
+)
+from ability_converter.cacao_importer.construct_abilities import (
+    CacaoPlaybook
+)
+from ability_converter.write_ability import AbilityWriter
+
+# Constant defining the parameters of each benchmark scenario, on top of the
+# default playbook parameters
+SCENARIOS: Dict[str, Dict] = {
+    "baseline": {'steps': 1000},
+    "branching": {'steps': 1000, 'branching': 0.6},
+    "nested": {
+        'steps': 1000, 'nesting_depth': 3, 'playbook_steps': 0.1,
+        'nested_steps': 200
+    },
+    "large_payloads": {'steps': 200, 'payload_size': 64 * 1024},
+    "many_commands": {'steps': 200, 'commands_per_step': 50},
+}
+
+# Constant defining the stages of the pipeline which are timed, in order
+STAGES = (
+    "load", "convert_workflow_steps", "write_abilities", "construct_sources",
+    "write_profile"
+)
+
+# Constant defining the ratio to the baseline from which a result is reported
+# as a regression
+REGRESSION_THRESHOLD = 1.2
+
+
+class ScenarioResult(TypedDict):
+    """Class defining the results of a benchmark scenario"""
+    parameters: PlaybookParameters
+    abilities: int
+    timings: Dict[str, float]
+    peak_memory: int
+
+
+class BenchmarkResults(TypedDict):
+    """Class defining the results of a benchmark run"""
+    label: str
+    created: str
+    python: str
+    platform: str
+    scenarios: Dict[str, ScenarioResult]
+
+
+@contextmanager
+def working_directory(directory: str) -> Iterator[None]:
+    """Change the working directory for the duration of the context"""
+    previous_directory: str = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(previous_directory)
+
+
+def run_pipeline(path: str, timings: Dict[str, float]) -> int:
+    """
+    Import the playbook at the given path, adding the time taken by each
+    stage to timings, and return the number of abilities written
+    """
+    stage_start: float = time.perf_counter()
+
+    def end_stage(stage: str) -> None:
+        nonlocal stage_start
+        now: float = time.perf_counter()
+        timings[stage] = timings.get(stage, 0.0) + now - stage_start
+        stage_start = now
+
+    ability_writer = AbilityWriter()
+    playbook = CacaoPlaybook(path, ability_writer=ability_writer)
+    end_stage("load")
+    playbook.convert_workflow_steps()
+    end_stage("convert_workflow_steps")
+    ability_writer.flush()
+    end_stage("write_abilities")
+    construct_sources.construct_sources(playbook.playbook)
+    end_stage("construct_sources")
+    construct_profile.write_profile(
+        playbook.playbook, step_order=playbook.step_order()
+    )
+    end_stage("write_profile")
+    return len(ability_writer.file_names)
+
+
+def run_scenario(
+    parameters: PlaybookParameters,
+    repeat: int
+    ) -> ScenarioResult:
+    """
+    Run the pipeline on the playbook generated from the parameters, keeping
+    the fastest time of each stage over the repeats, and once more to measure
+    the peak memory. Every run starts from an empty Caldera library
+    """
+    best_timings: Dict[str, float] = {}
+    abilities: int = 0
+    with tempfile.TemporaryDirectory() as directory:
+        with working_directory(directory):
+            path: str = write_playbooks(parameters, "input")
+        for run in range(repeat + 1):
+            run_directory: str = os.path.join(directory, f"run_{run}")
+            # Each run has its own copy of the embedded playbooks
+            shutil.copytree(
+                os.path.join(directory, "playbooks"),
+                os.path.join(run_directory, "playbooks")
+            )
+            with working_directory(run_directory):
+                timings: Dict[str, float] = {}
+                if run < repeat:
+                    abilities = run_pipeline(
+                        os.path.join(directory, path), timings
+                    )
+                    for stage, seconds in timings.items():
+                        best_timings[stage] = min(
+                            best_timings.get(stage, seconds), seconds
+                        )
+                    continue
+                tracemalloc.start()
+                try:
+                    run_pipeline(os.path.join(directory, path), timings)
+                    _, peak_memory = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+
+    best_timings['total'] = sum(best_timings[stage] for stage in STAGES)
+    return {
+        'parameters': parameters,
+        'abilities': abilities,
+        'timings': best_timings,
+        'peak_memory': peak_memory,
+    }
+
+
+def current_version() -> str:
+    """Return the short hash of the checked out commit, if there is one"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_benchmarks(
+    scenario_names: List[str],
+    repeat: int = 3,
+    scale: float = 1.0,
+    label: Optional[str] = None
+    ) -> BenchmarkResults:
+    """Run each of the named scenarios and return the results"""
+    results: BenchmarkResults = {
+        'label': label or current_version(),
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': {},
+    }
+    for name in scenario_names:
+        parameters: Dict = dict(SCENARIOS[name])
+        for attribute in ('steps', 'nested_steps'):
+            if attribute in parameters:
+                parameters[attribute] = max(
+                    3, round(parameters[attribute] * scale)
+                )
+        results['scenarios'][name] = run_scenario(
+            default_parameters(**parameters), repeat
+        )
+    return results
+
+
+def compare_results(
+    results: BenchmarkResults,
+    baseline: BenchmarkResults,
+    threshold: float = REGRESSION_THRESHOLD
+    ) -> List[str]:
+    """
+    Print the ratio of each timing and peak memory to the baseline, and
+    return a description of each one past the threshold
+    """
+    regressions: List[str] = []
+    print(f"Compared with {baseline['label']} ({baseline['created']})")
+    for name, result in results['scenarios'].items():
+        baseline_result: Optional[ScenarioResult] = (
+            baseline['scenarios'].get(name)
+        )
+        if baseline_result is None:
+            continue
+        if baseline_result['parameters'] != result['parameters']:
+            print(f"  {name:<16} skipped, the parameters differ")
+            continue
+        measures: Dict[str, float] = {
+            **result['timings'], 'peak_memory': result['peak_memory']
+        }
+        baseline_measures: Dict[str, float] = {
+            **baseline_result['timings'],
+            'peak_memory': baseline_result['peak_memory']
+        }
+        for measure, value in measures.items():
+            if not baseline_measures.get(measure):
+                continue
+            ratio: float = value / baseline_measures[measure]
+            flag: str = ""
+            if ratio > threshold:
+                flag = " REGRESSION"
+                regressions.append(f"{name} {measure} x{ratio:.2f}")
+            print(f"  {name:<16} {measure:<24} x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def print_results(results: BenchmarkResults) -> None:
+    """Print the timings and peak memory of each scenario"""
+    print(f"Results for {results['label']}")
+    for name, result in results['scenarios'].items():
+        print(
+            f"  {name:<16} {result['abilities']:>7} abilities "
+            f"{result['timings']['total']:8.3f}s "
+            f"{result['peak_memory'] / 2 ** 20:8.1f} MiB peak"
+        )
+        for stage in STAGES:
+            print(f"    {stage:<24} {result['timings'][stage]:8.3f}s")
+
+
+def main(args: List[str]) -> int:
+    """
+    Run the benchmarks, store the results and compare them with a baseline,
+    returning a non-zero exit status if there were regressions
+    """
+    parser = argparse.ArgumentParser(
+        prog="bench_pipeline",
+        description="Benchmark the conversion of generated Cacao playbooks"
+    )
+    parser.add_argument(
+        '--scenario', action='append', choices=list(SCENARIOS),
+        help="scenario to run, may be repeated (default: all)"
+    )
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help="number of timed runs of each scenario (default: 3)"
+    )
+    parser.add_argument(
+        '--scale', type=float, default=1.0,
+        help="factor applied to the number of steps of each scenario"
+    )
+    parser.add_argument(
+        '--label', help="name of the results (default: the commit hash)"
+    )
+    parser.add_argument(
+        '--output', metavar="PATH",
+        help="file to store the results in (default: "
+             "benchmark_results/{LABEL}.json)"
+    )
+    parser.add_argument(
+        '--compare', metavar="PATH",
+        help="results of a previous run to compare with"
+    )
+    parser.add_argument(
+        '--threshold', type=float, default=REGRESSION_THRESHOLD,
+        help="ratio to the previous results reported as a regression"
+    )
+    options = parser.parse_args(args[1:])
+
+    results: BenchmarkResults = run_benchmarks(
+        options.scenario or list(SCENARIOS), repeat=max(options.repeat, 1),
+        scale=options.scale, label=options.label
+    )
+    print_results(results)
+
+    output: str = (
+        options.output
+        or os.path.join("benchmark_results", f"{results['label']}.json")
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as file:
+        file.write(json.dumps(results, indent=4))
+    print(f"Results stored in {output}")
+
+    if options.compare:
+        with open(options.compare) as file:
+            baseline: BenchmarkResults = json.loads(file.read())
+        if compare_results(results, baseline, options.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,77 @@
+"""
+Module to benchmark the serialisation of the abilities, profiles and sources
+written for the test playbooks
+
+Run with: python -m ability_converter.benchmarks.bench_yaml_emitter
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+from typing import Any, Callable, Dict, List
+
+import yaml
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter import yaml_emitter
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+
+# Constant defining the directory of the test playbooks
+TEST_PLAYBOOKS_PATH: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "test_playbooks"
+)
+
+# Constant defining the number of times each document is serialised
+NUMBER_OF_ROUNDS = 20
+
+
+def load_test_documents() -> List[Any]:
+    """
+    Convert the test playbooks in a temporary directory and load every
+    document written to the Caldera library
+    """
+    paths: List[str] = [
+        os.path.abspath(os.path.join(TEST_PLAYBOOKS_PATH, file_name))
+        for file_name in sorted(os.listdir(TEST_PLAYBOOKS_PATH))
+        if file_name.endswith(".json")
+    ]
+    documents: List[Any] = []
+    working_directory: str = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            import_playbooks(paths)
+            for path, _, file_names in os.walk("data"):
+                for file_name in sorted(file_names):
+                    with open(os.path.join(path, file_name)) as file:
+                        documents.append(yaml.safe_load(file))
+        finally:
+            os.chdir(working_directory)
+    return documents
+
+
+def main() -> int:
+    """Time each way of serialising the test documents"""
+    documents: List[Any] = load_test_documents()
+    dumpers: Dict[str, Callable[[Any], str]] = {
+        "yaml.dump (pure Python)": yaml.dump,
+        "yaml.dump (libyaml)": lambda data: yaml.dump(
+            data, Dumper=yaml_emitter.Dumper
+        ),
+        "dump_yaml": yaml_emitter.dump_yaml,
+    }
+    print(f"Serialising {len(documents)} documents {NUMBER_OF_ROUNDS} times")
+    baseline: float = 0.0
+    for name, dump in dumpers.items():
+        seconds: float = timeit.timeit(
+            lambda dump=dump: [dump(document) for document in documents],
+            number=NUMBER_OF_ROUNDS
+        )
+        baseline = baseline or seconds
+        print(f"{name:<24} {seconds:8.3f}s {baseline / seconds:6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
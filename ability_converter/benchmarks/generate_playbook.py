@@ -0,0 +1,305 @@
+"""
+Module for generating synthetic Cacao playbooks to benchmark the importer
+
+The generated workflow is a chain running from the start step to the end step.
+Each link of the chain is a single step, a playbook step embedding a further
+generated playbook, or a branching step (parallel, if-condition,
+while-condition or switch-condition) whose branches are single steps. The
+same parameters and seed always give the same playbooks.
+"""
+import json
+import os
+import random
+
+from typing import Dict, List, Optional, Tuple, TypedDict
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.cacao_importer.cacao_types import (
+    CacaoPlaybookAttributes, CommandData, WorkflowStep
+)
+
+# Constant defining the relative frequency of each command type by default
+DEFAULT_COMMAND_MIX: Dict[str, float] = {
+    "bash": 4,
+    "ssh": 2,
+    "http-api": 2,
+    "openc2-json": 1,
+    "manual": 1,
+    "attack-cmd": 1,
+}
+
+# Constant defining the branching Workflow Step Types
+BRANCH_STEP_TYPES: Tuple[str, ...] = (
+    "parallel", "if-condition", "while-condition", "switch-condition"
+)
+
+# Constant defining the number of playbook variables of a generated playbook
+NUMBER_OF_VARIABLES = 16
+
+
+class PlaybookParameters(TypedDict):
+    """Class defining the parameters of a generated playbook"""
+    # The number of workflow steps of the top level playbook
+    steps: int
+    # The proportion of the links of the workflow which branch
+    branching: float
+    # The number of levels of embedded playbooks below the top level playbook
+    nesting_depth: int
+    # The proportion of the links of the workflow which embed a playbook
+    playbook_steps: float
+    # The number of workflow steps of each embedded playbook
+    nested_steps: int
+    # The relative frequency of each command type
+    command_mix: Dict[str, float]
+    # The number of commands of each single step
+    commands_per_step: int
+    # The number of characters of each command
+    payload_size: int
+    # The number of in_args and out_args of each single step
+    args_per_step: int
+    seed: int
+
+
+def default_parameters(**parameters) -> PlaybookParameters:
+    """Return the default playbook parameters updated with those given"""
+    defaults: PlaybookParameters = {
+        'steps': 1000,
+        'branching': 0.2,
+        'nesting_depth': 0,
+        'playbook_steps': 0.05,
+        'nested_steps': 50,
+        'command_mix': dict(DEFAULT_COMMAND_MIX),
+        'commands_per_step': 2,
+        'payload_size': 64,
+        'args_per_step': 2,
+        'seed': 0,
+    }
+    unknown: List[str] = sorted(set(parameters) - set(defaults))
+    if unknown:
+        raise TypeError(f"Unknown playbook parameters: {', '.join(unknown)}")
+    return {**defaults, **parameters}
+
+
+class PlaybookGenerator:
+    """
+    Class object generating a synthetic Cacao playbook and the playbooks it
+    embeds
+    """
+
+    def __init__(self, parameters: PlaybookParameters) -> None:
+        """Initialise PlaybookGenerator class"""
+        self.parameters: PlaybookParameters = parameters
+        self.random = random.Random(parameters['seed'])
+        self.command_types: List[str] = list(parameters['command_mix'])
+        self.command_weights: List[float] = list(
+            parameters['command_mix'].values()
+        )
+        self.variables: List[str] = [
+            f"$$var_{index}$$" for index in range(NUMBER_OF_VARIABLES)
+        ]
+        # The generated playbooks, keyed by playbook id
+        self.playbooks: Dict[str, CacaoPlaybookAttributes] = {}
+
+    def generate_command(self) -> CommandData:
+        """Generate a command of a type drawn from the command mix"""
+        command_type: str = self.random.choices(
+            self.command_types, self.command_weights
+        )[0]
+        if command_type == "attack-cmd":
+            return {
+                'type': command_type,
+                'command_b64': {'id': f"attack-{self.random.randrange(100)}"}
+            }
+        payload_size: int = self.parameters['payload_size']
+        prefix: str = f"{command_type} {self.random.randrange(10 ** 6)} "
+        return {
+            'type': command_type,
+            'command': (prefix + "x" * payload_size)[:payload_size]
+        }
+
+    def generate_single_step(
+        self,
+        name: str,
+        on_completion: Optional[str]
+        ) -> WorkflowStep:
+        """Generate a single step running commands from the command mix"""
+        step: WorkflowStep = {
+            'type': "single",
+            'name': name,
+            'description': f"Generated step {name}",
+            'timeout': self.random.choice((0, 10, 60)),
+            'commands': [
+                self.generate_command()
+                for _ in range(self.parameters['commands_per_step'])
+            ],
+            'in_args': self.random.sample(
+                self.variables, self.parameters['args_per_step']
+            ),
+            'out_args': self.random.sample(
+                self.variables, self.parameters['args_per_step']
+            ),
+        }
+        if on_completion is not None:
+            step['on_completion'] = on_completion
+        return step
+
+    def generate_branch_step(
+        self,
+        step_id: str,
+        on_completion: str,
+        workflow: Dict[str, WorkflowStep]
+        ) -> WorkflowStep:
+        """
+        Generate a branching step, adding the single steps of its two
+        branches to the workflow
+        """
+        branch_ids: List[str] = [
+            f"{step_id}_branch_{index}" for index in (0, 1)
+        ]
+        for branch_id in branch_ids:
+            workflow[branch_id] = self.generate_single_step(branch_id, None)
+
+        step_type: str = self.random.choice(BRANCH_STEP_TYPES)
+        step: WorkflowStep = {
+            'type': step_type,
+            'name': step_id,
+            'description': f"Generated {step_type} step",
+            'on_completion': on_completion,
+        }
+        if step_type == "parallel":
+            step['next_steps'] = branch_ids
+        elif step_type == "if-condition":
+            step['condition'] = "generated condition"
+            step['on_true'] = branch_ids[:1]
+            step['on_false'] = branch_ids[1:]
+        elif step_type == "while-condition":
+            # The loop exits to the step after the loop
+            step['condition'] = "generated condition"
+            step['on_true'] = branch_ids[:1]
+            step['on_false'] = branch_ids[1]
+            del step['on_completion']
+            workflow[branch_ids[1]]['on_completion'] = on_completion
+        else:
+            step['switch'] = "generated switch"
+            step['cases'] = {"1": branch_ids[:1], "default": branch_ids[1:]}
+        return step
+
+    def generate_playbook(self, playbook_id: str, depth: int) -> str:
+        """
+        Generate a playbook, and the playbooks it embeds down to the nesting
+        depth, returning its playbook id
+        """
+        if playbook_id in self.playbooks:
+            return playbook_id
+        number_of_steps: int = (
+            self.parameters['steps'] if depth == 0
+            else self.parameters['nested_steps']
+        )
+        # Choose the kind of each link of the chain first. A branching step
+        # counts for three steps, itself and the steps of its two branches
+        link_kinds: List[str] = []
+        remaining_steps: int = number_of_steps - 2
+        while remaining_steps > 0:
+            draw: float = self.random.random()
+            if (depth < self.parameters['nesting_depth']
+                    and draw < self.parameters['playbook_steps']):
+                link_kinds.append("playbook")
+                remaining_steps -= 1
+            elif (remaining_steps >= 3
+                  and draw > 1 - self.parameters['branching']):
+                link_kinds.append("branch")
+                remaining_steps -= 3
+            else:
+                link_kinds.append("single")
+                remaining_steps -= 1
+        link_ids: List[str] = [
+            "start",
+            *[f"step_{index}" for index in range(1, len(link_kinds) + 1)],
+            "end"
+        ]
+
+        workflow: Dict[str, WorkflowStep] = {
+            "start": {
+                'type': "start",
+                'name': "start",
+                'on_completion': link_ids[1],
+            }
+        }
+        for index, link_kind in enumerate(link_kinds, start=1):
+            step_id: str = link_ids[index]
+            on_completion: str = link_ids[index + 1]
+            if link_kind == "playbook":
+                workflow[step_id] = {
+                    'type': "playbook",
+                    'name': step_id,
+                    'description': "Generated playbook step",
+                    'playbook_id': self.generate_playbook(
+                        f"synthetic-{self.parameters['seed']}-{depth + 1}",
+                        depth + 1
+                    ),
+                    'in_args': self.random.sample(self.variables, 1),
+                    'out_args': self.random.sample(self.variables, 1),
+                    'on_completion': on_completion,
+                }
+            elif link_kind == "branch":
+                workflow[step_id] = self.generate_branch_step(
+                    step_id, on_completion, workflow
+                )
+            else:
+                workflow[step_id] = self.generate_single_step(
+                    step_id, on_completion
+                )
+        workflow["end"] = {'type': "end", 'name': "end"}
+
+        self.playbooks[playbook_id] = {
+            'id': playbook_id,
+            'name': f"Synthetic Playbook {playbook_id}",
+            'description': "Generated to benchmark the importer",
+            'playbook_variables': {
+                variable: {'type': "string"}
+                for variable in self.variables
+            },
+            'workflow_start': "start",
+            'workflow': workflow,
+        }
+        return playbook_id
+
+
+def generate_playbooks(
+    parameters: PlaybookParameters
+    ) -> Dict[str, CacaoPlaybookAttributes]:
+    """
+    Generate a playbook and the playbooks it embeds, keyed by playbook id.
+    The top level playbook comes first
+    """
+    generator = PlaybookGenerator(parameters)
+    top_level_id: str = generator.generate_playbook(
+        f"synthetic-{parameters['seed']}", 0
+    )
+    top_level_playbook: CacaoPlaybookAttributes = generator.playbooks.pop(
+        top_level_id
+    )
+    return {top_level_id: top_level_playbook, **generator.playbooks}
+
+
+def write_playbooks(parameters: PlaybookParameters, directory: str) -> str:
+    """
+    Generate a playbook and write it to the given directory as
+    {PLAYBOOK ID}.json, and the playbooks it embeds to playbooks/ where the
+    importer looks for them. Returns the path of the top level playbook
+    """
+    playbooks: Dict[str, CacaoPlaybookAttributes] = generate_playbooks(
+        parameters
+    )
+    top_level_id: str = next(iter(playbooks))
+    os.makedirs("playbooks", exist_ok=True)
+    os.makedirs(directory, exist_ok=True)
+    for playbook_id, playbook in playbooks.items():
+        path: str = (
+            os.path.join(directory, f"{playbook_id}.json")
+            if playbook_id == top_level_id
+            else os.path.join("playbooks", playbook_id)
+        )
+        with open(path, 'w') as file:
+            file.write(json.dumps(playbook))
+    return os.path.join(directory, f"{top_level_id}.json")
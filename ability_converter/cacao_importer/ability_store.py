@@ -0,0 +1,76 @@
+"""
+Module for the content-addressed store of the abilities of an import
+
+Playbooks reuse the same commands heavily, and each occurrence would
+otherwise be given an ability, and an ability file, of its own. When
+deduplicating, abilities are instead identified by a digest of what they do:
+their tactic, technique, flags, requirements and executors, but not the name
+and description of the step they were constructed for. Abilities with the
+same digest share a single id derived from it, so that identical abilities
+resolve to the same ability, and the same file, within a playbook and its
+embedded playbooks, across the playbooks of an import and across imports.
+"""
+import hashlib
+import json
+
+from typing import Any, Dict, Optional
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.ability_types import Ability
+from ability_converter.cacao_importer.compact_objects import plain_json
+
+# Constant defining the attributes of an ability which don't affect what it
+# does, and so are left out of its digest
+UNHASHED_ATTRIBUTES = frozenset(('id', 'name', 'description'))
+
+
+def ability_digest(ability: Ability) -> str:
+    """
+    Return the digest of the normalised contents of an ability, other than
+    its id, name and description
+    """
+    payload: Dict[str, Any] = {
+        attribute: value for attribute, value in ability.items()
+        if attribute not in UNHASHED_ATTRIBUTES
+    }
+    return hashlib.sha1(json.dumps(
+        payload, sort_keys=True, separators=(",", ":"), default=plain_json
+    ).encode()).hexdigest()
+
+
+class AbilityStore:
+    """
+    Class object holding the id of each distinct ability constructed, keyed
+    by the digest of its contents
+    """
+
+    def __init__(self) -> None:
+        """Initialise AbilityStore class"""
+        self.ability_ids: Dict[str, str] = {}
+
+    def get(self, digest: str) -> Optional[str]:
+        """
+        Return the id of the ability with the given digest, if one has been
+        added already
+        """
+        return self.ability_ids.get(digest)
+
+    def add(self, digest: str, ability_id: str) -> None:
+        """Add the id of the ability with the given digest"""
+        self.ability_ids[digest] = ability_id
+
+    def checkpoint(self) -> int:
+        """Return a checkpoint of the store, which rollback returns to"""
+        return len(self.ability_ids)
+
+    def rollback(self, checkpoint: int) -> None:
+        """
+        Remove the abilities added to the store since the checkpoint, which
+        were discarded with the playbook they were constructed for
+        """
+        for digest in list(self.ability_ids)[checkpoint:]:
+            del self.ability_ids[digest]
+
+    def __len__(self) -> int:
+        """Return the number of distinct abilities"""
+        return len(self.ability_ids)
@@ -0,0 +1,80 @@
+"""
+Module defining the registry of the command types of Cacao workflow steps
+which are converted into Caldera abilities
+
+Each command type is mapped to the platforms and executor names its command is
+run with. The parts of an executor which don't depend on the command are
+precomputed once per command type as shared, read-only templates, so only the
+command, timeout and parsers are filled in for each command converted. The
+templates hold tuples in place of the lists of an executor, and each executor
+is given lists of its own. Further command types can be added with
+register_command_type.
+"""
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.ability_types import Executor, Parser
+
+# Constant defining the (platform, executor name) pairs of each command type
+# supported out of the box. Commands of type 'manual' have no executors and
+# those of type 'attack-cmd' refer to an existing Caldera ability
+DEFAULT_COMMAND_TYPES: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "http-api": (("linux", "sh"), ("darwin", "sh"), ("windows", "pwsh")),
+    "ssh": (("linux", "sh"), ("darwin", "sh"), ("windows", "pwsh")),
+    "bash": (("linux", "bash"), ("darwin", "bash"), ("windows", "bash")),
+    "openc2-json": (
+        ("linux", "native"), ("darwin", "native"), ("windows", "native")
+    ),
+}
+
+# The executor templates of each registered command type
+COMMAND_TYPES: Dict[str, Tuple[Mapping[str, Any], ...]] = {}
+
+
+def register_command_type(
+    command_type: str,
+    executors: Sequence[Tuple[str, str]]
+    ) -> None:
+    """
+    Register a command type, or replace the executors of a registered one,
+    given the (platform, executor name) pair of each of its executors
+    """
+    COMMAND_TYPES[command_type] = tuple(
+        MappingProxyType({
+            'platform': platform,
+            'name': name,
+            'payloads': (),
+            'uploads': (),
+            'cleanup': ()
+        })
+        for platform, name in executors
+    )
+
+
+def construct_executors(
+    command_type: str,
+    command_string: str,
+    timeout: Optional[int],
+    parsers: List[Parser]
+    ) -> List[Executor]:
+    """
+    Construct the executors of a command from the templates of its command
+    type. A command type which isn't registered has no executors
+    """
+    return [
+        {
+            **template,
+            'payloads': list(template['payloads']),
+            'uploads': list(template['uploads']),
+            'cleanup': list(template['cleanup']),
+            'command': command_string,
+            'timeout': timeout,
+            'parsers': [parsers] if parsers else []
+        }
+        for template in COMMAND_TYPES.get(command_type, ())
+    ]
+
+
+for default_command_type, default_executors in DEFAULT_COMMAND_TYPES.items():
+    register_command_type(default_command_type, default_executors)
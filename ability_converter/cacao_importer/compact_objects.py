@@ -0,0 +1,206 @@
+"""
+Module for the compact representation of the JSON objects of a playbook
+
+Held as dicts, the workflow steps of a large playbook spend most of their
+memory on dict overhead, since every step and every command of a step is a
+dict of its own with a hash table sized for its keys. The objects of a
+playbook are instead loaded as CompactObjects: slotted objects holding a tuple
+of values and an ObjectShape, the keys of the object in order, which is shared
+by every object with the same keys. Short strings, such as step types,
+command types and variable names, are interned so that each repeated value is
+held once.
+
+A CompactObject is a mutable mapping, so it's read and updated like the dict
+it stands for, and it's only converted back to a dict when serialised, by
+giving plain_json as the default of json.dumps. A large playbook is
+serialised in chunks by json_chunks, so that its JSON is never held in
+memory as a whole.
+"""
+import json
+import sys
+
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+# Constant defining the most keys an object may have to be held compactly.
+# Objects with more keys, such as the workflow itself, are keyed by ids which
+# no other object shares, so they're held as dicts
+MAX_SHAPE_KEYS = 32
+
+# Constant defining the most shapes kept for reuse, so that loading playbooks
+# with ever differing keys can't grow the shapes kept without bound
+MAX_SHAPES = 4096
+
+# Constant defining the longest string values interned while loading
+MAX_INTERNED_LENGTH = 64
+
+# Constant defining the number of characters of JSON joined into each chunk
+# yielded by json_chunks
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+class ObjectShape:
+    """
+    Class object for the keys of a CompactObject in order, along with the
+    index of the value of each key, shared by every object with those keys
+    """
+
+    __slots__ = ("keys", "indexes", "transitions")
+
+    def __init__(self, keys: Tuple[str, ...]) -> None:
+        """Initialise ObjectShape class"""
+        self.keys: Tuple[str, ...] = keys
+        self.indexes: Dict[str, int] = {
+            key: index for index, key in enumerate(keys)
+        }
+        # The shape reached by adding each key, looked up once per key
+        self.transitions: Dict[str, ObjectShape] = {}
+
+    def add_key(self, key: str) -> "ObjectShape":
+        """Return the shape of an object with these keys followed by key"""
+        shape: Optional[ObjectShape] = self.transitions.get(key)
+        if shape is None:
+            shape = object_shape(self.keys + (key,))
+            self.transitions[key] = shape
+        return shape
+
+
+# The shapes kept for reuse, keyed by their keys
+shapes: Dict[Tuple[str, ...], ObjectShape] = {}
+
+
+def object_shape(keys: Tuple[str, ...]) -> ObjectShape:
+    """Return the shape of an object with the given keys in order"""
+    shape: Optional[ObjectShape] = shapes.get(keys)
+    if shape is None:
+        shape = ObjectShape(keys)
+        if len(shapes) < MAX_SHAPES:
+            shape = shapes.setdefault(keys, shape)
+    return shape
+
+
+class CompactObject(MutableMapping):
+    """
+    Class object for a JSON object held as a shared ObjectShape and a tuple
+    of values, read and updated like a dict. Updating a value replaces the
+    tuple, which is cheap for objects as small as these
+    """
+
+    __slots__ = ("object_shape", "object_values")
+
+    def __init__(self, shape: ObjectShape, values: Tuple[Any, ...]) -> None:
+        """Initialise CompactObject class"""
+        self.object_shape: ObjectShape = shape
+        self.object_values: Tuple[Any, ...] = values
+
+    def __getitem__(self, key: str) -> Any:
+        return self.object_values[self.object_shape.indexes[key]]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index: Optional[int] = self.object_shape.indexes.get(key)
+        return default if index is None else self.object_values[index]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.object_shape.indexes
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        index: Optional[int] = self.object_shape.indexes.get(key)
+        if index is None:
+            self.object_shape = self.object_shape.add_key(key)
+            self.object_values += (value,)
+        else:
+            values: Tuple[Any, ...] = self.object_values
+            self.object_values = values[:index] + (value,) + values[index + 1:]
+
+    def __delitem__(self, key: str) -> None:
+        index: int = self.object_shape.indexes[key]
+        keys: Tuple[str, ...] = self.object_shape.keys
+        values: Tuple[Any, ...] = self.object_values
+        self.object_shape = object_shape(keys[:index] + keys[index + 1:])
+        self.object_values = values[:index] + values[index + 1:]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.object_shape.keys)
+
+    def __len__(self) -> int:
+        return len(self.object_values)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Pickle and copy the items rather than the shape shared with others
+        return compact_object, (list(self.items()),)
+
+    def __repr__(self) -> str:
+        return f"CompactObject({dict(self)!r})"
+
+
+def intern_value(value: Any) -> Any:
+    """
+    Return a short string value interned, interning the short strings of a
+    list value in place, and any other value as it is
+    """
+    if value.__class__ is str:
+        if len(value) <= MAX_INTERNED_LENGTH:
+            return sys.intern(value)
+    elif value.__class__ is list:
+        for index, item in enumerate(value):
+            if item.__class__ is str and len(item) <= MAX_INTERNED_LENGTH:
+                value[index] = sys.intern(item)
+    return value
+
+
+def compact_object(pairs: List[Tuple[str, Any]]) -> Any:
+    """
+    Return the JSON object with the given (key, value) pairs as a
+    CompactObject, or as a dict if it has too many or repeated keys, for use
+    as the object_pairs_hook of json.load
+    """
+    if len(pairs) > MAX_SHAPE_KEYS:
+        return dict(pairs)
+    shape: ObjectShape = object_shape(tuple(key for key, _ in pairs))
+    if len(shape.indexes) < len(pairs):
+        # The last of the values of a repeated key is kept, as by json.load
+        return dict(pairs)
+    return CompactObject(
+        shape, tuple([intern_value(value) for _, value in pairs])
+    )
+
+
+def load_compact(file: TextIO) -> Dict[str, Any]:
+    """
+    Load the JSON object in file with every object below it held as a
+    CompactObject
+    """
+    loaded: Any = json.load(file, object_pairs_hook=compact_object)
+    if not isinstance(loaded, (CompactObject, dict)):
+        raise ValueError("Expected a JSON object")
+    return dict(loaded)
+
+
+def plain_json(value: Any) -> Any:
+    """
+    Return a CompactObject as a dict, for use as the default of json.dumps
+    """
+    if isinstance(value, CompactObject):
+        return dict(value)
+    raise TypeError(
+        f"Object of type {value.__class__.__name__} is not JSON serializable"
+    )
+
+
+def json_chunks(value: Any, indent: Optional[int] = None) -> Iterator[str]:
+    """
+    Yield the JSON of value, as given by json.dumps with the indent and
+    plain_json as the default, in chunks of about JSON_CHUNK_SIZE characters
+    """
+    pieces: List[str] = []
+    size: int = 0
+    for piece in json.JSONEncoder(
+            indent=indent, default=plain_json).iterencode(value):
+        pieces.append(piece)
+        size += len(piece)
+        if size >= JSON_CHUNK_SIZE:
+            yield "".join(pieces)
+            pieces = []
+            size = 0
+    if pieces:
+        yield "".join(pieces)
@@ -5,12 +5,12 @@ to create a Caldera profile
 For details on the Cacao playbook, see:
 https://docs.oasis-open.org/cacao/security-playbooks/v1.0/security-playbooks-v1.0.html
 """
-import json
-import os
+import hashlib
 import random
+import re
 import string
 
-from typing import List
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import ability_converter.cacao_importer.cacao_types as cacao_types
 
@@ -18,16 +18,75 @@ import ability_converter.cacao_importer.cacao_types as cacao_types
 from ability_converter.cacao_importer.cacao_types import (
     CacaoPlaybookAttributes, WorkflowStep
 )
+from ability_converter.cacao_importer.ability_store import (
+    AbilityStore, ability_digest
+)
+from ability_converter.cacao_importer.command_types import (
+    construct_executors
+)
+from ability_converter.cacao_importer.compact_objects import (
+    json_chunks, load_compact
+)
+from ability_converter.cacao_importer.construct_profile import (
+    collate_caldera_ids
+)
+from ability_converter.cacao_importer.fact_index import FactIndex
+from ability_converter.cacao_importer.import_manifest import (
+    ImportManifest, StepRecord, fingerprint_step
+)
+from ability_converter.cacao_importer.playbook_cache import (
+    ConvertedPlaybook, PlaybookCache, hash_playbook_file
+)
+from ability_converter.cacao_importer.sidecar_index import (
+    format_index, index_path, load_index
+)
+from ability_converter.cacao_importer.stream_loader import (
+    iter_workflow_steps, load_playbook_attributes
+)
+from ability_converter.cacao_importer.validate_playbook import (
+    PlaybookValidationError, ValidationLimits, default_limits,
+    validate_playbook, validate_streamed_playbook
+)
+from ability_converter.cacao_importer.workflow_graph import WorkflowGraph
 from ability_converter.ability_types import (
-    Ability, Executor, Fact, Parser
+    Ability, Fact, Parser, Requirement
 )
+from ability_converter.attack_index import AttackIndex, AttackTechnique
+from ability_converter.background_writer import BackgroundWriter, write_file
+from ability_converter.caldera_library import CalderaLibrary, LibraryObject
+from ability_converter.instrumentation import count, span
+from ability_converter.output_sink import DirectorySink, OutputSink
 from ability_converter.write_ability import (
-    write_ability
+    MAX_BUFFERED_BYTES, AbilityWriter, BundleWriter
 )
 
 # Constant defining the set of alphanumeric characters
 ALPHANUMERIC_CHARS = list(string.digits + string.ascii_lowercase)
 
+# Constant defining the form of a variable, $$VAR_NAME$$
+VARIABLE_PATTERN = re.compile(r"\$\$([^$]*)\$\$")
+
+# Constant mapping each Workflow Step Type which produces abilities to the
+# name of the CacaoPlaybook method handling it. Steps which branch produce no
+# abilities, and the workflow graph gives the steps on their branches
+STEP_HANDLERS: Dict[str, str] = {
+    "start": "handle_start_step",
+    "end": "handle_end_step",
+    "single": "handle_single_step",
+    "playbook": "handle_playbook_step",
+}
+
+# Constant defining the Workflow Step Types which are only re-converted on an
+# incremental import if they've changed. Steps of type 'playbook' are always
+# converted, as the embedded playbook is itself imported incrementally
+INCREMENTAL_STEP_TYPES: Tuple[str, ...] = ("start", "end", "single")
+
+# Constant defining the attributes of an ability of the Caldera library given
+# to the attack-cmd commands referring to it
+LIBRARY_ABILITY_ATTRIBUTES: Tuple[str, ...] = (
+    "name", "tactic", "technique_id", "technique_name"
+)
+
 def generate_ability_id() -> str:
     """
     Function generates a random ID of the form
@@ -43,179 +102,238 @@ def generate_ability_id() -> str:
     return "".join(generated_id)
 
 
-def handle_http_api_command(
-    command_string: str,
-    ability: Ability,
-    step: WorkflowStep,
-    parsers: List[Parser]
-    ) -> None:
+def parse_variable_name(argument: str) -> str:
     """
-    Handle a command with the command type set to 'http-api'
+    Function returns VAR_NAME if the argument is a variable of the form
+    $$VAR_NAME$$, or the argument itself otherwise
     """
-    executor_base: Executor = {
-        'payloads': [],
-        'uploads': [],
-        'command': command_string,
-        'timeout': step['timeout'],
-        'cleanup': [],
-        'parsers': [parsers] if parsers else []
-    }
-    # Construct the executors
-    linux_executor: Executor = {
-        'platform': 'linux',
-        'name': 'sh',
-        **executor_base
-    }
-    darwin_executor: Executor = {
-        'platform': 'darwin',
-        'name': 'sh',
-        **executor_base
-    }
-    windows_executor: Executor = {
-        'platform': 'windows',
-        'name': 'pwsh',
-        **executor_base
-    }
-
-    # Add the executors to the ability
-    ability['executors'] = [
-        linux_executor, darwin_executor, windows_executor
-        ]
+    match: Optional[re.Match] = VARIABLE_PATTERN.fullmatch(argument)
+    return match.group(1) if match else argument
 
 
-def handle_ssh_command(
-    command_string: str,
-    ability: Ability,
-    step: WorkflowStep,
-    parsers: List[Parser]
-    ) -> None:
+def derive_ability_id(*parts: str) -> str:
     """
-    Handle a command with the command type set to 'ssh'
+    Function derives an ID of the form xxxxxxxx-xxxx-4xxx-xxxx-xxxxxxxxxxxx
+    from the given parts, so that the same parts always give the same ID
     """
-    executor_base: Executor = {
-        'payloads': [],
-        'uploads': [],
-        'command': command_string,
-        'timeout': step['timeout'],
-        'cleanup': [],
-        'parsers': [parsers] if parsers else []
-    }
-    # Construct the executors
-    linux_executor: Executor = {
-        'platform': 'linux',
-        'name': 'sh',
-        **executor_base
-    }
-    darwin_executor: Executor = {
-        'platform': 'darwin',
-        'name': 'sh',
-        **executor_base
-    }
-    windows_executor: Executor = {
-        'platform': 'windows',
-        'name': 'pwsh',
-        **executor_base
-    }
-
-    # Add the executors to the ability
-    ability['executors'] = [
-        linux_executor, darwin_executor, windows_executor
-        ]
-
-
-def handle_bash_command(
-    command_string: str,
-    ability: Ability,
-    step: WorkflowStep,
-    parsers: List[Parser]
-    ) -> None:
-    """
-    Handle a command with the command type set to 'bash'
-    """
-    executor_base: Executor = {
-        'name': 'bash',
-        'payloads': [],
-        'uploads': [],
-        'command': command_string,
-        'timeout': step['timeout'],
-        'cleanup': [],
-        'parsers': [parsers] if parsers else []
-    }
-    # Construct the executors
-    linux_executor: Executor = {
-        'platform': 'linux',
-        **executor_base
-    }
-    darwin_executor: Executor = {
-        'platform': 'darwin',
-        **executor_base
-    }
-    windows_executor: Executor = {
-        'platform': 'windows',
-        **executor_base
-    }
-
-    # Add the executors to the ability
-    ability['executors'] = [
-        linux_executor, darwin_executor, windows_executor
-        ]
-
-
-def handle_openc2_json_command(
-    command_string: str,
-    ability: Ability,
-    step: WorkflowStep,
-    parsers: List[Parser]
-    ) -> None:
-    """
-    Handle a command with the command type set to 'openc2-json'
-    """
-    executor_base: Executor = {
-        'name': 'native',
-        'payloads': [],
-        'uploads': [],
-        'command': command_string,
-        'timeout': step['timeout'],
-        'cleanup': [],
-        'parsers': [ parsers ] if parsers else []
-    }
-    # Construct the executors
-    linux_executor: Executor = {
-        'platform': 'linux',
-        **executor_base
-    }
-    darwin_executor: Executor = {
-        'platform': 'darwin',
-        **executor_base
-    }
-    windows_executor: Executor = {
-        'platform': 'windows',
-        **executor_base
-    }
-
-    # Add the executors to the ability
-    ability['executors'] = [
-        linux_executor, darwin_executor, windows_executor
-        ]
+    digest: str = hashlib.sha1("\x1f".join(parts).encode()).hexdigest()
+    return (
+        f"{digest[:8]}-{digest[8:12]}-4{digest[13:16]}-"
+        f"{digest[16:20]}-{digest[20:32]}"
+    )
 
 
 class CacaoPlaybook:
     """Class object for a Cacao playbook"""
 
-    def __init__(self, path_to_file: str) -> None:
-        """Initialise CacaoPlaybook class"""
+    def __init__(
+        self,
+        path_to_file: str,
+        ability_writer: Optional[AbilityWriter] = None,
+        deterministic_ids: bool = False,
+        incremental: bool = False,
+        playbook_cache: Optional[PlaybookCache] = None,
+        streaming: bool = False,
+        bundle: bool = False,
+        background_writer: Optional[BackgroundWriter] = None,
+        sink: Optional[OutputSink] = None,
+        limits: Optional[ValidationLimits] = None,
+        ability_store: Optional[AbilityStore] = None,
+        sidecar_index: bool = False,
+        library: Optional[CalderaLibrary] = None,
+        attack_index: Optional[AttackIndex] = None,
+        index_id: Optional[str] = None
+        ) -> None:
+        """
+        Initialise CacaoPlaybook class. The abilities of the playbook are
+        written through ability_writer, which is shared with any embedded
+        playbooks; a new AbilityWriter is used if none is given.
+
+        If deterministic_ids is set, the IDs of the playbook and its abilities
+        are derived from the playbook id, step id and command index rather
+        than generated at random, so re-importing a playbook gives the same
+        IDs.
+
+        If incremental is set, the manifest of the previous import of the
+        playbook is used to re-convert only the workflow steps which have
+        changed, and to remove the abilities of steps which have been removed.
+
+        Embedded playbooks are converted through playbook_cache, which should
+        be shared by every playbook of an import so that each embedded
+        playbook is converted once; a new PlaybookCache is used if none is
+        given.
+
+        If streaming is set, only the attributes of the playbook other than
+        its workflow are loaded here. The workflow steps are read and
+        converted one at a time by convert_workflow_steps, so that very large
+        playbooks can be converted in bounded memory.
+
+        If bundle is set, the abilities of the playbook and its embedded
+        playbooks are written to a single bundle named after the Caldera ID
+        of the playbook rather than one file per ability. A bundle can't be
+        imported incrementally, since the abilities of unchanged steps would
+        be missing from it.
+
+        If a background_writer is given, the files of the playbook are
+        written by its writer threads while the conversion carries on.
+
+        The files are written to sink, by default the working directory, which
+        is shared with any embedded playbooks. The ability_writer given, if
+        any, writes to its own sink.
+
+        The playbook is validated as soon as it's loaded, within the limits
+        given, which are shared with any embedded playbooks, raising a
+        PlaybookValidationError giving every error found. A streamed playbook
+        is read through once to validate its workflow steps before they're
+        converted.
+
+        If an ability_store is given, which is shared with any embedded
+        playbooks, abilities with the same contents are given a single id
+        derived from their contents and are written once. Deduplicated
+        abilities can't be imported incrementally, since the abilities of a
+        removed step may still be used by other steps.
+
+        If sidecar_index is set, the ids given to the playbook and its steps
+        are written to a compact sidecar index rather than to a rewritten
+        copy of the playbook, and embedded playbooks which haven't changed
+        since their index was written are resolved from it rather than
+        converted again. The index is written under index_id, by default the
+        id of the playbook. An embedded playbook is indexed under the name
+        its file is embedded by, which its index is looked up by.
+
+        If a library of the Caldera installation is given, which is shared
+        with any embedded playbooks, the abilities referred to by attack-cmd
+        commands must be in it, and the commands are given the name, tactic
+        and technique of their ability.
+
+        If an attack_index is given, which is shared with any embedded
+        playbooks, the abilities of each single step are given the tactic and
+        technique of ATT&CK its external references refer to, if any do, so
+        that they're filed under the directory of that tactic.
+        """
+        if bundle and incremental:
+            raise ValueError("A bundle can't be imported incrementally")
+        if ability_store is not None and incremental:
+            raise ValueError(
+                "Deduplicated abilities can't be imported incrementally"
+            )
+
         # Load the Cacao playbook
-        with open(path_to_file) as file:
-            self.playbook: CacaoPlaybookAttributes = json.loads(file.read())
+        self.path_to_file: str = path_to_file
+        self.streaming: bool = streaming
+        with span("load_playbook"):
+            if streaming:
+                self.playbook: CacaoPlaybookAttributes = (
+                    load_playbook_attributes(path_to_file)
+                )
+            else:
+                with open(path_to_file) as file:
+                    self.playbook = load_compact(file)
+
+        # Check the whole playbook before any of it is converted, compiling
+        # its workflow into the graph traversed to convert it
+        self.limits: ValidationLimits = limits or default_limits()
+        self.library: Optional[CalderaLibrary] = library
+        self.attack_index: Optional[AttackIndex] = attack_index
+        with span("validate_playbook"):
+            self.workflow_graph: WorkflowGraph = (
+                validate_streamed_playbook(
+                    path_to_file, self.playbook, self.limits, library
+                ) if streaming else validate_playbook(
+                    self.playbook, self.limits, path_to_file, library
+                )
+            )
 
-        # Give the playbook a Caldera ID, Sources ID and Operations ID
-        self.playbook['caldera_id'] = generate_ability_id()
-        self.playbook['sources_id'] = generate_ability_id()
-        self.playbook['objective_id'] = generate_ability_id()
+        self.deterministic_ids: bool = deterministic_ids
+        # The id of the workflow step being converted
+        self.current_step_id: Optional[str] = None
+        self.sink: OutputSink = sink or DirectorySink()
+
+        # Load the manifest of the previous import if importing incrementally
+        self.manifest: Optional[ImportManifest] = (
+            ImportManifest(self.playbook['id'], self.sink) if incremental
+            else None
+        )
+
+        # Give the playbook a Caldera ID, Sources ID and Operations ID, reusing
+        # those of the previous import when importing incrementally
+        for id_attribute, id_name in (
+            ('caldera_id', "caldera"),
+            ('sources_id', "sources"),
+            ('objective_id', "objective")
+        ):
+            previous_id: Optional[str] = (
+                self.manifest.previous.get(id_attribute)
+                if self.manifest is not None else None
+            )
+            self.playbook[id_attribute] = (
+                previous_id or self.generate_id(id_name)
+            )
+            if self.manifest is not None:
+                self.manifest.current[id_attribute] = (
+                    self.playbook[id_attribute]
+                )
 
         # Initialise the playbook relationships
         self.playbook['relationships'] = []
 
+        # Abilities are buffered and only written to the Caldera library once
+        # the whole playbook has been converted. Streamed playbooks stage each
+        # ability to a temporary file straight away to keep memory bounded
+        self.bundle: bool = bundle
+        self.background_writer: Optional[BackgroundWriter] = (
+            background_writer
+        )
+        if ability_writer is not None:
+            self.ability_writer: AbilityWriter = ability_writer
+        elif bundle:
+            self.ability_writer = BundleWriter(
+                self.playbook['caldera_id'], self.sink
+            )
+        else:
+            self.ability_writer = AbilityWriter(
+                max_buffered_bytes=0 if streaming else MAX_BUFFERED_BYTES,
+                background_writer=background_writer, sink=self.sink
+            )
+        self.owns_ability_writer: bool = ability_writer is None
+        # The index of the first ability file written for this playbook
+        self.first_file_index: int = len(self.ability_writer.file_names)
+        self.sidecar_index: bool = sidecar_index
+        self.index_id: str = index_id or self.playbook['id']
+        self.ability_store: Optional[AbilityStore] = ability_store
+        self.playbook_cache: PlaybookCache = playbook_cache or PlaybookCache()
+
+        # The facts of the playbook, merged without duplicates
+        self.fact_index: FactIndex = FactIndex(self.playbook.get('facts') or [])
+
+        # Bind the handler of each Workflow Step Type once, rather than
+        # choosing a handler each time a step is converted
+        self.step_handlers: Dict[str, Callable[[WorkflowStep], None]] = {
+            step_type: getattr(self, handler_name)
+            for step_type, handler_name in STEP_HANDLERS.items()
+        }
+
+    def generate_id(self, *parts: str) -> str:
+        """
+        Generate an ID for part of the playbook. IDs are derived from the
+        playbook id and the given parts if deterministic IDs are used and are
+        random otherwise
+        """
+        if self.deterministic_ids:
+            return derive_ability_id(self.playbook['id'], *parts)
+        return generate_ability_id()
+
+    def construct_fact_sources(self, arguments: List[str]) -> List[Fact]:
+        """
+        Construct a fact for each argument, named after the playbook and the
+        variable given by the argument
+        """
+        prefix: str = f"{self.playbook['name']}."
+        return [
+            {'source': prefix + parse_variable_name(argument)}
+            for argument in arguments
+        ]
+
     def construct_requirements(
         self,
         step: WorkflowStep
@@ -223,23 +341,8 @@ class CacaoPlaybook:
         """
         Construct the requirement based on the command and workflow step
         """
-        requirements: List[Fact] = []
         # Construct requirements only if 'in_args' attribute is present
-        try:
-            for in_arg in step['in_args']:
-                fact: Fact = {}
-                # If a variable is given, so has form $$VAR_NAME$$, obtain
-                # VAR_NAME
-                if in_arg[0] == "$" and in_arg[-1] == "$":
-                    var_name: str = in_arg.split("$$")[1]
-                    fact = {'source': f"{self.playbook['name']}.{var_name}"}
-                    requirements.append(fact)
-                else:
-                    fact = {'source': f"{self.playbook['name']}.{in_arg}"}
-                    requirements.append(fact)
-        except KeyError:
-            pass
-        return requirements
+        return self.construct_fact_sources(step.get('in_args', []))
 
     def construct_parsers(
         self,
@@ -248,30 +351,15 @@ class CacaoPlaybook:
         """
         Construct the parser based on the command and workflow step
         """
-        parsers: List[Fact] = []
-        # Construct requirments only if 'out_args' attribute is present
-        try:
-            for out_arg in step['out_args']:
-                fact: Fact = {}
-                # If a variable is given, so has form $$VAR_NAME$$, obtain
-                # VAR_NAME
-                if out_arg[0] == "$" and out_arg[-1] == "$":
-                    var_name: str = out_arg.split("$$")[1]
-                    fact = {'source': f"{self.playbook['name']}.{var_name}"}
-                    parsers.append(fact)
-                else:
-                    fact = {'source': f"{self.playbook['name']}.{out_arg}"}
-                    parsers.append(fact)
-        except KeyError:
-            pass
-        return parsers
+        # Construct parsers only if 'out_args' attribute is present
+        return self.construct_fact_sources(step.get('out_args', []))
 
     def construct_playbook_facts(self) -> List[cacao_types.Fact]:
         """Construct the list of facts from the playbook variables"""
         facts: List[cacao_types.Fact] = []
         for var in self.playbook['playbook_variables']:
             # Obtain the var_name from $$var_name$$
-            var_name: str = var.split("$$")[1]
+            var_name: str = parse_variable_name(var)
             facts.append({'trait': var_name, 'value': "", 'score': 1})
         return facts
 
@@ -285,9 +373,28 @@ class CacaoPlaybook:
         # Initialise the list of ability ids
         step['caldera_ability_ids'] = []
 
-        # Use the corresponding handler depending on the command type
-        # Note that commands of type 'manual' isn't handled
-        for command in step['commands']:
+        # Construct the requirements and parsers once for the step. They only
+        # depend on the step, so every ability of the step shares them
+        relationship_match: List[Fact] = self.construct_requirements(step)
+        requirements: List[Requirement] = [{
+            'module': "plugins.stockpile.app.requirements.basic",
+            'relationship_match': relationship_match
+        }] if relationship_match else []
+        parserconfigs: List[Fact] = self.construct_parsers(step)
+        parsers: List[Parser] = [{
+            'module': "plugins.stockpile.app.parsers.basic",
+            'parserconfigs': parserconfigs
+        }] if parserconfigs else []
+
+        # The abilities of the step share the technique it refers to
+        technique: Optional[AttackTechnique] = (
+            self.attack_index.step_technique(step)
+            if self.attack_index is not None else None
+        )
+
+        # Abilities get the executors registered for their command type.
+        # Note that commands of type 'manual' have no executors
+        for command_index, command in enumerate(step['commands']):
             command_string: str = ""
             if command.get('command') is not None:
                 command_string = command['command']
@@ -297,9 +404,20 @@ class CacaoPlaybook:
             if command['type'] == "attack-cmd":
                 # Case in which the command is a Caldera ability
                 step['caldera_ability_ids'].append(command_string['id'])
+
+                # Record what the ability is in the updated playbook
+                if self.library is not None:
+                    library_ability: Optional[LibraryObject] = (
+                        self.library.ability(command_string['id'])
+                    )
+                    if library_ability is not None:
+                        for attribute in LIBRARY_ABILITY_ATTRIBUTES:
+                            command_string[attribute] = (
+                                library_ability[attribute]
+                            )
             else:
                 ability: Ability = {
-                    'id': generate_ability_id(),
+                    'id': "",
                     'name': (
                         f"{step['name']}: {len(step['caldera_ability_ids'])+ 1}"
                     ),
@@ -310,72 +428,122 @@ class CacaoPlaybook:
                     'repeatable': False,
                     'delete_payload': False,
                     'description': step['description'],
-                    'requirements': [],
+                    'requirements': requirements,
                     'executors': []
                 }
+                if technique is not None:
+                    ability.update(technique)
 
-                # Construct the requirments and parsers for the command
-                relationship_match = self.construct_requirements(step)
-                ability['requirements'] = [{
-                    'module': "plugins.stockpile.app.requirements.basic",
-                    'relationship_match': relationship_match
-                }] if relationship_match != [] else []
-                parserconfigs = self.construct_parsers(step)
-                parsers: Parser = [{
-                    'module': "plugins.stockpile.app.parsers.basic",
-                    'parserconfigs': parserconfigs
-                }] if parserconfigs != [] else []
+                # Construct the executors registered for the command type
+                ability['executors'] = construct_executors(
+                    command['type'], command_string, step.get('timeout'),
+                    parsers
+                )
+
+                if self.ability_store is None:
+                    ability['id'] = self.generate_id(
+                        self.current_step_id, str(command_index)
+                    )
+                else:
+                    # Identical abilities share the id derived from their
+                    # contents, and only the first of them is written
+                    digest: str = ability_digest(ability)
+                    stored_id: Optional[str] = self.ability_store.get(digest)
+                    if stored_id is not None:
+                        count("abilities_reused")
+                        step['caldera_ability_ids'].append(stored_id)
+                        continue
+                    ability['id'] = derive_ability_id("ability", digest)
+                    self.ability_store.add(digest, ability['id'])
 
                 # Append the list of ability ids used for the workflow step
                 step['caldera_ability_ids'].append(ability['id'])
 
-                # The list of arguments required to handle the command
-                fn_args = [
-                    command_string,
-                    ability,
-                    step,
-                    parsers
-                ]
-
-                if command['type'] == "http-api":
-                    handle_http_api_command(*fn_args)
-                elif command['type'] == "ssh":
-                    handle_ssh_command(*fn_args)
-                elif command['type'] == "bash":
-                    handle_bash_command(*fn_args)
-                elif command['type'] == "openc2-json":
-                    handle_openc2_json_command(*fn_args)
-
                 # Write the ability to the Caldera library
-                write_ability(ability)
+                self.ability_writer.write(ability)
 
     def handle_playbook_step(self, step: WorkflowStep) -> None:
         """
         Handle a workflow step with Workflow Step Type set to playbook
+
+        The embedded playbook is read from playbooks/ below the Caldera
+        directory written to. It's converted once per import and the results
+        are reused by every other step referring to the same playbook contents
         """
-        new_playbook_path: str = f"playbooks/{step['playbook_id']}"
-        new_playbook: CacaoPlaybook = CacaoPlaybook(new_playbook_path)
+        new_playbook_path: str = self.sink.input_path(
+            f"playbooks/{step['playbook_id']}"
+        )
+
+        # Embedding a playbook which is being converted would never finish
+        self.playbook_cache.check_cycle(step['playbook_id'])
 
-        # Initialise 'facts' attribute if not initialised already
-        if self.playbook.get('facts') is None:
-            self.playbook['facts'] = []
+        # Nothing has been written yet, so a playbook embedded too deeply
+        # fails the import as a whole
+        if len(self.playbook_cache.converting_ids) > self.limits['max_depth']:
+            raise PlaybookValidationError(new_playbook_path, [
+                f"embedded more than {self.limits['max_depth']} playbooks deep"
+            ])
 
-        # Add the args of the embedded playbook as facts to the current playbook
-        self.playbook['facts'].extend(self.construct_requirements(step))
-        self.playbook['facts'].extend(self.construct_parsers(step))
+        content_hash: str = hash_playbook_file(new_playbook_path)
+        converted_playbook: Optional[ConvertedPlaybook] = (
+            self.playbook_cache.get(step['playbook_id'], content_hash)
+        )
+
+        # Otherwise reuse the abilities of a previous import of the playbook,
+        # unless they'd have to be in this playbook's bundle or its manifest
+        if (converted_playbook is None and self.sidecar_index
+                and not self.bundle and self.manifest is None):
+            converted_playbook = load_index(
+                self.sink, step['playbook_id'], content_hash
+            )
+            if converted_playbook is not None:
+                self.playbook_cache.add(converted_playbook)
+
+        if converted_playbook is None:
+            new_playbook: CacaoPlaybook = CacaoPlaybook(
+                new_playbook_path, ability_writer=self.ability_writer,
+                deterministic_ids=self.deterministic_ids,
+                incremental=self.manifest is not None,
+                playbook_cache=self.playbook_cache,
+                streaming=self.streaming, bundle=self.bundle,
+                background_writer=self.background_writer, sink=self.sink,
+                limits=self.limits, ability_store=self.ability_store,
+                sidecar_index=self.sidecar_index, library=self.library,
+                attack_index=self.attack_index, index_id=step['playbook_id']
+            )
 
-        # Convert the workflow steps of the embedded playbook
-        new_playbook.convert_workflow_steps()
+            # Convert the workflow steps of the embedded playbook
+            new_playbook.convert_workflow_steps()
+
+            converted_playbook = {
+                'playbook_id': step['playbook_id'],
+                'content_hash': content_hash,
+                'caldera_ability_ids': collate_caldera_ids(
+                    new_playbook.playbook['workflow'],
+                    new_playbook.step_order()
+                ),
+                'facts': new_playbook.playbook.get('facts') or []
+            }
+            self.playbook_cache.add(converted_playbook)
+
+        # The abilities of the embedded playbook are run as part of this step
+        step['caldera_ability_ids'] = list(
+            converted_playbook['caldera_ability_ids']
+        )
 
-        # Add any new facts from the embedded playbook to the current playbook
-        self.playbook['facts'].extend(new_playbook.playbook['facts'])
+        # Add the args of the embedded playbook as facts to the current
+        # playbook, along with any new facts from the embedded playbook
+        self.fact_index.extend(self.construct_requirements(step))
+        self.fact_index.extend(self.construct_parsers(step))
+        self.fact_index.extend(converted_playbook['facts'])
+        self.playbook['facts'] = self.fact_index.facts
 
     def handle_start_step(self, step: WorkflowStep) -> None:
         """
         Handle a workflow step with Workflow Step Type set to start
         """
         ability: Ability = {
-            'id': generate_ability_id(),
+            'id': self.generate_id(self.current_step_id, "0"),
             'name': "Start Step",
             'description': f"Start Step for Playbook: {self.playbook['name']}",
             'tactic': "Start",
@@ -391,18 +559,22 @@ class CacaoPlaybook:
         # Create the list of ability ids used for the workflow step
         step['caldera_ability_ids'] = [ability['id']]
 
-        # Construct the playbook facts from playbook
-        self.playbook['facts'] = self.construct_playbook_facts()
+        # Construct the playbook facts from playbook, ahead of any facts added
+        # by steps converted before the start step
+        self.fact_index = FactIndex(
+            [*self.construct_playbook_facts(), *self.fact_index]
+        )
+        self.playbook['facts'] = self.fact_index.facts
 
         # Write the ability to the Caldera library
-        write_ability(ability)
+        self.ability_writer.write(ability)
 
     def handle_end_step(self, step: WorkflowStep) -> None:
         """
         Handle a workflow step with Workflow Step Type set to end
         """
         ability: Ability = {
-            'id': generate_ability_id(),
+            'id': self.generate_id(self.current_step_id, "0"),
             'name': "End Step",
             'description': f"End Step for Playbook: {self.playbook['name']}",
             'tactic': "End",
@@ -419,87 +591,147 @@ class CacaoPlaybook:
         step['caldera_ability_ids']= [ability['id']]
 
         # Write the ability to the Caldera library
-        write_ability(ability)
+        self.ability_writer.write(ability)
 
-    def handle_parallel_step(self, step: WorkflowStep) -> None:
+    def step_order(self) -> List[str]:
         """
-        Handle a workflow step with Workflow Step Type set to parallel
+        Return the ids of the workflow steps in order of execution, followed
+        by those of any steps which can't be reached from the start
         """
-        for step_id in step['next_steps']:
-            self.convert_workflow_step(step_id)
+        return self.workflow_graph.step_order()
 
-    def handle_if_condition_step(self, step: WorkflowStep) -> None:
-        """
-        Handle a workflow step with Workflow Step Type set to if-condition
+    def convert_workflow_step(self, step_id: str) -> None:
         """
-        # Convert the workflow steps from both conditions
-        for step_id in step['on_true']:
-            self.convert_workflow_step(step_id)
-        for step_id in step['on_false']:
-            self.convert_workflow_step(step_id)
+        Convert a workflow step, and every workflow step reachable from it,
+        into Mitre Abilities
 
-    def handle_while_condition_step(self, step: WorkflowStep) -> None:
+        The workflow graph is traversed depth first with an explicit worklist
+        rather than recursion, so that the length of the workflow isn't
+        bounded by the recursion limit. Each step is converted at most once.
         """
-        Handle a workflow step with Workflow Step Type set to while-condition
+        workflow: Dict[str, WorkflowStep] = self.playbook['workflow']
+        graph: WorkflowGraph = self.workflow_graph
+        worklist: List[int] = [graph.indexes[step_id]]
+        while worklist:
+            index: int = worklist.pop()
+            step_id = graph.step_ids[index]
+            step: WorkflowStep = workflow[step_id]
+
+            # Check if the step has been converted already
+            if step.get('converted') is not None:
+                continue
+            step['converted'] = True
+            self.convert_step(step_id, step)
+
+            # Push the next steps in reverse so they're converted in the order
+            # in which they're given
+            worklist.extend(reversed(graph.next_steps(index)))
+
+    def convert_step(self, step_id: str, step: WorkflowStep) -> None:
         """
-        # Convert the workflow steps from both conditions
-        for step_id in step['on_true']:
-            self.convert_workflow_step(step_id)
-
-        self.convert_workflow_step(step['on_false'])
+        Convert a single workflow step into Mitre Abilities
+        """
+        # Call the corresponding function handler depending on the Workflow
+        # Step Type. Steps which branch have no handler
+        self.current_step_id = step_id
+        count("steps_converted")
+        with span("construct_abilities"):
+            if (self.manifest is not None
+                    and step['type'] in INCREMENTAL_STEP_TYPES):
+                self.convert_step_incrementally(step_id, step)
+            else:
+                handler = self.step_handlers.get(step['type'])
+                if handler is not None:
+                    handler(step)
 
-    def handle_switch_condition_step(self, step: WorkflowStep) -> None:
+    def step_enrichment(self, step: WorkflowStep) -> Optional[Dict[str, Any]]:
         """
-        Handle a workflow step with Workflow Step Type set to switch-condition
+        Return what the ATT&CK index and the Caldera library give the
+        abilities of a single step, if either is used, so that an incremental
+        import converts the step again once it changes
         """
-        for step_ids in step['cases'].values():
-            for step_id in step_ids:
-                self.convert_workflow_step(step_id)
-
-    def convert_workflow_step(self, step_id: str) -> None:
+        if step['type'] != "single" or (
+                self.attack_index is None and self.library is None):
+            return None
+        enrichment: Dict[str, Any] = {'technique': None, 'abilities': []}
+        if self.attack_index is not None:
+            enrichment['technique'] = self.attack_index.step_technique(step)
+        if self.library is not None:
+            for command in step.get('commands') or []:
+                if command.get('type') != "attack-cmd":
+                    continue
+                library_ability: Optional[LibraryObject] = (
+                    self.library.ability(command['command']['id'])
+                )
+                enrichment['abilities'].append(
+                    None if library_ability is None else {
+                        attribute: library_ability[attribute]
+                        for attribute in LIBRARY_ABILITY_ATTRIBUTES
+                    }
+                )
+        return enrichment
+
+    def convert_step_incrementally(
+        self,
+        step_id: str,
+        step: WorkflowStep
+        ) -> None:
         """
-        Convert a workflow step into a Mitre Ability
+        Convert a workflow step only if it has changed since the previous
+        import, otherwise reuse the abilities and facts it produced then
         """
-        # Check if the step has been converted already
-        if self.playbook['workflow'][step_id].get('converted') is None:
-            self.playbook['workflow'][step_id]['converted'] = True
+        context: List[Any] = [
+            self.playbook['name'],
+            self.deterministic_ids,
+            self.playbook.get('playbook_variables')
+            if step['type'] == "start" else None
+        ]
+        # Left out when unused, so that the steps of earlier manifests stay
+        # clean
+        enrichment: Optional[Dict[str, Any]] = self.step_enrichment(step)
+        if enrichment is not None:
+            context.append(enrichment)
+        fingerprint: str = fingerprint_step(step, *context)
+        record: Optional[StepRecord] = self.manifest.clean_record(
+            step_id, fingerprint
+        )
+        if record is not None:
+            step['caldera_ability_ids'] = list(record['caldera_ability_ids'])
+            if step['type'] == "start":
+                self.fact_index = FactIndex(record['facts'])
+                self.playbook['facts'] = self.fact_index.facts
         else:
-            return
-        # Call the corresponding function handler depending on the Workflow
-        # Step Type
-        workflow_step_type: str = self.playbook['workflow'][step_id]['type']
-        if workflow_step_type == "start":
-            self.handle_start_step(self.playbook['workflow'][step_id])
-        elif workflow_step_type == "end":
-            self.handle_end_step(self.playbook['workflow'][step_id])
-        elif workflow_step_type == "single":
-            self.handle_single_step(self.playbook['workflow'][step_id])
-        elif workflow_step_type == "playbook":
-            self.handle_playbook_step(self.playbook['workflow'][step_id])
-        elif workflow_step_type == "parallel":
-            self.handle_parallel_step(self.playbook['workflow'][step_id])
-        elif workflow_step_type == "if-condition":
-            self.handle_if_condition_step(self.playbook['workflow'][step_id])
-        elif workflow_step_type == "while-condition":
-            self.handle_while_condition_step(self.playbook['workflow'][step_id])
-        elif workflow_step_type == "switch-condition":
-            self.handle_switch_condition_step(
-                self.playbook['workflow'][step_id]
-            )
+            # Convert the step, recording the files of the abilities written
+            first_file_index: int = len(self.ability_writer.file_names)
+            self.step_handlers[step['type']](step)
+            record = {
+                'fingerprint': fingerprint,
+                'caldera_ability_ids': step['caldera_ability_ids'],
+                'files': self.ability_writer.file_names[first_file_index:],
+                'facts': (
+                    self.playbook['facts'] if step['type'] == "start" else []
+                )
+            }
+        self.manifest.record_step(step_id, record)
+
+    def convert_streamed_workflow_steps(self) -> None:
+        """
+        Convert every workflow step of the Cacao playbook as it is read from
+        the playbook file, in the order in which the steps are given
 
-        # Convert workflow step given for step completion, success or failure
-        if self.playbook['workflow'][step_id].get('on_completion') is not None:
-            self.convert_workflow_step(
-                self.playbook['workflow'][step_id]['on_completion']
-            )
-        if self.playbook['workflow'][step_id].get('on_success') is not None:
-            self.convert_workflow_step(
-                self.playbook['workflow'][step_id]['on_success']
-            )
-        if self.playbook['workflow'][step_id].get('on_failure') is not None:
-            self.convert_workflow_step(
-                self.playbook['workflow'][step_id]['on_failure']
-            )
+        Only the type of each step and the ids of the abilities it produced
+        are kept, so memory use is bounded by the size of the largest step.
+        Unlike convert_workflow_step, steps which can't be reached from the
+        start of the workflow are converted too.
+        """
+        workflow: Dict[str, WorkflowStep] = self.playbook['workflow']
+        for step_id, step in iter_workflow_steps(self.path_to_file):
+            self.convert_step(step_id, step)
+            workflow[step_id] = {
+                'type': step['type'],
+                'caldera_ability_ids': step.get('caldera_ability_ids', []),
+                'converted': True
+            }
 
     def convert_workflow_steps(self) -> None:
         """
@@ -507,11 +739,78 @@ class CacaoPlaybook:
         abilities
         """
         # Begin the cycle of converting workflow steps, beginning with the first
-        # workflow step
-        self.convert_workflow_step(self.playbook['workflow_start'])
-
-        # Overwrite playbook with the included Caldera IDs
-        path_to_playbook = f"playbooks/{self.playbook['id']}.json"
-        os.makedirs("playbooks", exist_ok=True)
-        with open(path_to_playbook, 'w') as playbook:
-            playbook.write(json.dumps(self.playbook, indent=4))
+        # workflow step. The abilities of the playbook are only written once
+        # every step has been converted, so that a failure part way through
+        # leaves the Caldera library untouched. The embedded playbooks
+        # converted on the way are only cached while their abilities are
+        # still to be written, as are the abilities stored when deduplicating
+        checkpoint: int = self.playbook_cache.checkpoint()
+        store_checkpoint: int = (
+            self.ability_store.checkpoint()
+            if self.ability_store is not None else 0
+        )
+        try:
+            with self.playbook_cache.converting(self.playbook['id']), span(
+                "traverse_workflow"
+            ):
+                if self.streaming:
+                    self.convert_streamed_workflow_steps()
+                else:
+                    self.convert_workflow_step(self.playbook['workflow_start'])
+        except BaseException:
+            if self.owns_ability_writer:
+                self.ability_writer.discard()
+                self.playbook_cache.rollback(checkpoint)
+                if self.ability_store is not None:
+                    self.ability_store.rollback(store_checkpoint)
+            raise
+
+        # Remove the abilities of the steps which have been edited or removed
+        # since the previous import
+        if self.manifest is not None:
+            for file_name in self.manifest.stale_files():
+                self.ability_writer.delete(file_name)
+
+        if self.owns_ability_writer:
+            self.ability_writer.flush()
+        if self.manifest is not None:
+            self.manifest.save()
+
+        # Record the Caldera IDs in the sidecar index, or else overwrite the
+        # playbook with them. A streamed playbook isn't held in memory, so
+        # there is no complete copy to write
+        if self.sidecar_index:
+            self.write_sidecar_index()
+        elif not self.streaming:
+            # The JSON of a large playbook is several times the size of the
+            # playbook in memory, so it's written out as it's serialised
+            path_to_playbook = f"playbooks/{self.playbook['id']}.json"
+            with span("serialise_json"):
+                self.sink.write_chunks(
+                    path_to_playbook, json_chunks(self.playbook, indent=4)
+                )
+
+    def write_sidecar_index(self) -> None:
+        """
+        Write the sidecar index of the playbook, giving the ids of the
+        playbook and of the abilities of each workflow step
+        """
+        with span("serialise_json"):
+            contents: str = format_index(
+                {
+                    'playbook_id': self.index_id,
+                    'content_hash': hash_playbook_file(self.path_to_file),
+                    'caldera_id': self.playbook['caldera_id'],
+                    'sources_id': self.playbook['sources_id'],
+                    'objective_id': self.playbook['objective_id'],
+                    'facts': self.playbook.get('facts') or [],
+                    'files': self.ability_writer.file_names[
+                        self.first_file_index:
+                    ]
+                },
+                self.playbook['workflow'], self.step_order()
+            )
+        write_file(
+            index_path(self.index_id), contents,
+            self.background_writer, self.sink
+        )
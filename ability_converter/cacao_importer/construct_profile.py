@@ -1,12 +1,15 @@
 """Module for creating a Caldera profile from a Cacao playbook"""
-from typing import Dict, List, TypedDict
-
-import yaml
+from typing import Dict, Iterable, List, Optional, TypedDict
 
 # pylint: disable=import-error, no-name-in-module
+from ability_converter.background_writer import BackgroundWriter, write_file
 from ability_converter.cacao_importer.cacao_types import (
     CacaoPlaybookAttributes, WorkflowStep
 )
+from ability_converter.caldera_library import PLAYBOOK_TAG_PREFIX
+from ability_converter.instrumentation import span
+from ability_converter.output_sink import OutputSink
+from ability_converter.yaml_emitter import dump_yaml
 class CalderaProfile(TypedDict):
     """Class defining the attributes of a Caldera adversary profile"""
     adversary_id: str
@@ -17,26 +20,48 @@ class CalderaProfile(TypedDict):
     tags: List[str]
 
 
-def collate_caldera_ids(workflow_steps: Dict[str, WorkflowStep]) -> List[str]:
-    """Collate all of the ids of the abilities used within the playbook"""
+def collate_caldera_ids(
+    workflow_steps: Dict[str, WorkflowStep],
+    step_order: Optional[Iterable[str]] = None
+    ) -> List[str]:
+    """
+    Collate all of the ids of the abilities used within the playbook, taking
+    the steps in step_order if given, such as their order of execution, and
+    in the order given otherwise. Steps which don't produce abilities, such
+    as those that branch, are skipped
+    """
     ids: List[str] = []
-    for step in workflow_steps.values():
-        ids.extend(step['caldera_ability_ids'])
+    for step_id in workflow_steps if step_order is None else step_order:
+        ids.extend(workflow_steps[step_id].get('caldera_ability_ids', []))
     return ids
 
 
-def write_profile(playbook: CacaoPlaybookAttributes) -> None:
-    """Construct profile representing Cacao playbook and write .yml file"""
-    profile: CalderaProfile = {
-        'adversary_id': playbook['caldera_id'],
-        'name': playbook['name'],
-        'description': playbook['description'],
-        'atomic_ordering': collate_caldera_ids(playbook['workflow']),
-        'objective': playbook['objective_id'],
-        'tags': []
-    }
+def write_profile(
+    playbook: CacaoPlaybookAttributes,
+    background_writer: Optional[BackgroundWriter] = None,
+    sink: Optional[OutputSink] = None,
+    step_order: Optional[List[str]] = None
+    ) -> None:
+    """
+    Construct profile representing Cacao playbook and write .yml file to
+    sink, by default the working directory, in the background if a
+    background_writer is given. The abilities are ordered by taking the
+    workflow steps in step_order if given
+    """
+    with span("construct_profile"):
+        profile: CalderaProfile = {
+            'adversary_id': playbook['caldera_id'],
+            'name': playbook['name'],
+            'description': playbook['description'],
+            'atomic_ordering': collate_caldera_ids(
+                playbook['workflow'], step_order
+            ),
+            'objective': playbook['objective_id'],
+            # Tag the profile with its playbook, so that importing the
+            # playbook again isn't taken for a clash of adversary names
+            'tags': [f"{PLAYBOOK_TAG_PREFIX}{playbook['id']}"]
+        }
 
     # Write the profile into the adversaries directory
     file_name: str = f"data/adversaries/{profile['adversary_id']}.yml"
-    with open(file_name, 'w') as file:
-        yaml.dump(profile, file)
+    write_file(file_name, dump_yaml(profile), background_writer, sink)
@@ -2,14 +2,16 @@
 Module for creating the fact sources and relationships of a
 Cacao playbook to be used within Caldera
 """
-from typing import List, TypedDict
-
-import yaml
+from typing import List, Optional, TypedDict
 
 # pylint: disable=import-error, no-name-in-module
+from ability_converter.background_writer import BackgroundWriter, write_file
 from ability_converter.cacao_importer.cacao_types import (
     CacaoPlaybookAttributes, Fact, Relationship
 )
+from ability_converter.instrumentation import span
+from ability_converter.output_sink import OutputSink
+from ability_converter.yaml_emitter import dump_yaml
 
 class Sources(TypedDict):
     """Class defining attributes of Sources"""
@@ -18,19 +20,24 @@ class Sources(TypedDict):
     facts: List[Fact]
     relationships: List[Relationship]
 
-def construct_sources(playbook: CacaoPlaybookAttributes) -> None:
+def construct_sources(
+    playbook: CacaoPlaybookAttributes,
+    background_writer: Optional[BackgroundWriter] = None,
+    sink: Optional[OutputSink] = None
+    ) -> None:
     """
     Write the yml file containing the sources and relationships of the
-    playbook
+    playbook to sink, by default the working directory, in the background if
+    a background_writer is given
     """
-    sources: Sources = {
-        'id': playbook['sources_id'],
-        'name': f"{playbook['name']} sources",
-        'facts': playbook['facts'],
-        'relationships': playbook['relationships']
-    }
+    with span("construct_sources"):
+        sources: Sources = {
+            'id': playbook['sources_id'],
+            'name': f"{playbook['name']} sources",
+            'facts': playbook['facts'],
+            'relationships': playbook['relationships']
+        }
 
     # Write the sources into the sources directory
     file_name: str = f"data/sources/{playbook['sources_id']}.yml"
-    with open(file_name, 'w') as file:
-        yaml.dump(sources, file)
+    write_file(file_name, dump_yaml(sources), background_writer, sink)
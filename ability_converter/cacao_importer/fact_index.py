@@ -0,0 +1,83 @@
+"""
+Module for merging the facts of a Cacao playbook without duplicates
+
+The facts of a playbook come from its playbook variables, the in_args and
+out_args of its playbook steps and the facts of every playbook it embeds, so
+the same fact is found again each time a playbook is embedded. Facts are
+merged through an index keyed by their trait and value, so that the facts of
+a playbook grow with the number of distinct facts rather than with the
+number of references to embedded playbooks.
+"""
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.cacao_importer.cacao_types import Fact
+
+# The trait and value identifying a fact
+FactKey = Tuple[str, str]
+
+
+def normalise_fact(fact: Mapping[str, Any]) -> Fact:
+    """
+    Return a fact in the shape of a Caldera fact, with a trait, value and
+    score. A fact given by its source, as for the requirements and parsers of
+    an ability, is the fact with that trait and no value
+    """
+    normalised: Dict[str, Any] = {
+        attribute: value for attribute, value in fact.items()
+        if attribute != 'source'
+    }
+    normalised['trait'] = fact.get('trait', fact.get('source'))
+    if normalised.get('value') is None:
+        normalised['value'] = ""
+    normalised.setdefault('score', 1)
+    return normalised
+
+
+def fact_key(fact: Fact) -> FactKey:
+    """Return the trait and value identifying a normalised fact"""
+    return fact['trait'], str(fact['value'])
+
+
+class FactIndex:
+    """
+    Class object holding distinct facts in the order they were first added,
+    indexed by their trait and value
+    """
+
+    def __init__(self, facts: Iterable[Mapping[str, Any]] = ()) -> None:
+        """Initialise FactIndex class with the facts given"""
+        # The distinct facts, which are written to the sources of a playbook
+        self.facts: List[Fact] = []
+        self.indexes: Dict[FactKey, int] = {}
+        self.extend(facts)
+
+    def add(self, fact: Mapping[str, Any]) -> bool:
+        """
+        Add a fact unless a fact with the same trait and value has been added
+        already, returning whether it was added
+        """
+        normalised: Fact = normalise_fact(fact)
+        key: FactKey = fact_key(normalised)
+        if key in self.indexes:
+            return False
+        self.indexes[key] = len(self.facts)
+        self.facts.append(normalised)
+        return True
+
+    def extend(self, facts: Iterable[Mapping[str, Any]]) -> None:
+        """Add each of the facts given"""
+        for fact in facts:
+            self.add(fact)
+
+    def __contains__(self, fact: Mapping[str, Any]) -> bool:
+        """Return whether a fact with the same trait and value was added"""
+        return fact_key(normalise_fact(fact)) in self.indexes
+
+    def __iter__(self) -> Iterator[Fact]:
+        """Iterate over the distinct facts in the order they were added"""
+        return iter(self.facts)
+
+    def __len__(self) -> int:
+        """Return the number of distinct facts"""
+        return len(self.facts)
@@ -0,0 +1,150 @@
+"""
+Module for the manifest recording what a previous import of a Cacao playbook
+produced, used to re-convert only the workflow steps which have changed
+
+The manifest of a playbook is stored alongside the updated playbook as
+playbooks/{id}.manifest.json. It records the Caldera, sources and objective
+ids given to the playbook and, for each workflow step, a fingerprint of the
+step together with the ability ids, ability files and facts it produced.
+"""
+import hashlib
+import json
+
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Set, TypedDict
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.cacao_importer.cacao_types import Fact, WorkflowStep
+from ability_converter.output_sink import DirectorySink, OutputSink
+
+# Constant defining the attributes added to a workflow step during conversion,
+# which are left out of its fingerprint
+CONVERSION_ATTRIBUTES = ("caldera_ability_ids", "converted")
+
+
+class StepRecord(TypedDict):
+    """Class defining what the conversion of a workflow step produced"""
+    fingerprint: str
+    caldera_ability_ids: List[str]
+    files: List[str]
+    facts: List[Fact]
+
+
+class ManifestAttributes(TypedDict):
+    """Class defining the attributes of an import manifest"""
+    playbook_id: str
+    caldera_id: Optional[str]
+    sources_id: Optional[str]
+    objective_id: Optional[str]
+    steps: Dict[str, StepRecord]
+
+
+def manifest_path(playbook_id: str) -> str:
+    """Return the path of the manifest of the playbook with the given id"""
+    return f"playbooks/{playbook_id}.manifest.json"
+
+
+def plain_value(value: object) -> object:
+    """
+    Return a value with no JSON form as a dict if it's a mapping, such as a
+    CompactObject, and as a string otherwise
+    """
+    if isinstance(value, Mapping):
+        return dict(value)
+    return str(value)
+
+
+def fingerprint_step(step: WorkflowStep, *context: object) -> str:
+    """
+    Return a fingerprint of a workflow step, ignoring the attributes added
+    during conversion. Anything else that the conversion of the step depends
+    on is given as context
+    """
+    step_contents = {
+        key: value for key, value in step.items()
+        if key not in CONVERSION_ATTRIBUTES
+    }
+    serialised: str = json.dumps(
+        [step_contents, *context], sort_keys=True, default=plain_value
+    )
+    return hashlib.sha1(serialised.encode()).hexdigest()
+
+
+class ImportManifest:
+    """
+    Class object for the manifest of a playbook, holding the records of the
+    previous import and collecting the records of the current one
+    """
+
+    def __init__(
+        self,
+        playbook_id: str,
+        sink: Optional[OutputSink] = None
+        ) -> None:
+        """
+        Initialise ImportManifest class, loading any previous manifest from
+        sink, by default the working directory
+        """
+        self.sink: OutputSink = sink or DirectorySink()
+        self.path: str = manifest_path(playbook_id)
+        self.previous: ManifestAttributes = {
+            'playbook_id': playbook_id,
+            'caldera_id': None,
+            'sources_id': None,
+            'objective_id': None,
+            'steps': {}
+        }
+        contents: Optional[str] = self.sink.read(self.path)
+        try:
+            if contents is not None:
+                self.previous = json.loads(contents)
+        except ValueError:
+            # No usable manifest, so every step is converted
+            pass
+        self.current: ManifestAttributes = {
+            **self.previous,
+            'steps': {}
+        }
+
+    def clean_record(
+        self,
+        step_id: str,
+        fingerprint: str
+        ) -> Optional[StepRecord]:
+        """
+        Return the record of the previous conversion of a workflow step if the
+        step is unchanged and the files it produced still exist
+        """
+        record: Optional[StepRecord] = self.previous['steps'].get(step_id)
+        if record is None or record['fingerprint'] != fingerprint:
+            return None
+        if not all(
+                self.sink.exists(file_name) for file_name in record['files']):
+            return None
+        return record
+
+    def record_step(self, step_id: str, record: StepRecord) -> None:
+        """Record what the conversion of a workflow step produced"""
+        self.current['steps'][step_id] = record
+
+    def stale_files(self) -> Set[str]:
+        """
+        Return the files produced by the previous import which aren't produced
+        by the current one, as the steps which produced them have been edited
+        or removed
+        """
+        current_files: Set[str] = {
+            file_name
+            for record in self.current['steps'].values()
+            for file_name in record['files']
+        }
+        return {
+            file_name
+            for record in self.previous['steps'].values()
+            for file_name in record['files']
+            if file_name not in current_files
+        }
+
+    def save(self) -> None:
+        """Write the records of the current import as the manifest"""
+        self.sink.write(self.path, json.dumps(self.current))
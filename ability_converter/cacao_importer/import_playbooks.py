@@ -0,0 +1,343 @@
+"""
+Module for importing a batch of Cacao playbooks, optionally converting
+independent playbooks concurrently in a pool of worker processes
+
+The embedded playbooks converted during an import are cached for the whole
+import, or for the lifetime of each worker process when converting
+concurrently, as are the ids of the abilities when deduplicating them. The
+files of each playbook are written by a pool of writer threads while the
+conversion carries on, to an output sink: a directory, by default the
+working directory, or else memory or an archive when converting in a single
+process. When profiling, the time spent in
+each phase of the conversion of a playbook is written to a JSON report,
+optionally along with cProfile statistics. Every playbook is validated
+before it's converted, or only validated when checking.
+"""
+import contextlib
+import cProfile
+import functools
+import json
+import os
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, List, Optional, TypedDict
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.attack_index import AttackIndex
+from ability_converter.background_writer import (
+    DEFAULT_WRITER_THREADS, BackgroundWriter
+)
+from ability_converter.cacao_importer import (
+    construct_abilities, construct_profile, construct_sources
+)
+from ability_converter.cacao_importer.ability_store import AbilityStore
+from ability_converter.cacao_importer.playbook_cache import PlaybookCache
+from ability_converter.cacao_importer.validate_playbook import (
+    ValidationLimits, check_playbook_file
+)
+from ability_converter.caldera_library import CalderaLibrary
+from ability_converter.instrumentation import NULL_SPAN, Profiler
+from ability_converter.output_sink import DirectorySink, OutputSink
+
+# The cache of embedded playbooks of a worker process
+worker_playbook_cache: Optional[PlaybookCache] = None
+
+# The writer threads of a worker process
+worker_background_writer: Optional[BackgroundWriter] = None
+
+# The output sink of a worker process
+worker_sink: Optional[OutputSink] = None
+
+# The store of deduplicated abilities of a worker process
+worker_ability_store: Optional[AbilityStore] = None
+
+
+class ImportResult(TypedDict):
+    """Class defining the outcome of importing a single Cacao playbook"""
+    path: str
+    playbook_id: Optional[str]
+    caldera_id: Optional[str]
+    error: Optional[str]
+
+
+def convert_playbook(
+    cacao_playbook_path: str,
+    deterministic_ids: bool = False,
+    incremental: bool = False,
+    playbook_cache: Optional[PlaybookCache] = None,
+    streaming: bool = False,
+    bundle: bool = False,
+    profile_directory: Optional[str] = None,
+    cprofile: bool = False,
+    background_writer: Optional[BackgroundWriter] = None,
+    sink: Optional[OutputSink] = None,
+    limits: Optional[ValidationLimits] = None,
+    check_only: bool = False,
+    ability_store: Optional[AbilityStore] = None,
+    sidecar_index: bool = False,
+    library: Optional[CalderaLibrary] = None,
+    attack_index: Optional[AttackIndex] = None
+    ) -> ImportResult:
+    """
+    Construct the playbook, convert its workflow steps and write the sources
+    and profile of the playbook. Any exception raised during the conversion is
+    recorded in the result rather than propagated, so that one malformed
+    playbook doesn't abort the rest of the batch. If profile_directory is
+    given, a report of the conversion is written there. If background_writer
+    is given, the files are written by its writer threads, and every write
+    has finished by the time the result is returned. The files are written
+    to sink, by default the working directory.
+
+    The playbook is validated within limits before it's converted. If
+    check_only is set, the playbook is only validated and nothing is written.
+    If an ability_store is given, which should be shared by every playbook of
+    an import, abilities with the same contents are given the same id,
+    derived from their contents, and written once. If
+    sidecar_index is set, the ids given to the playbook are written to a
+    sidecar index rather than to a rewritten copy of the playbook. If a
+    library of the Caldera installation is given, the abilities referred to
+    by attack-cmd commands must be in it, and no other adversary in it may
+    have the name of the playbook. If an attack_index is given, abilities are
+    given the ATT&CK tactic and technique their steps refer to
+    """
+    result: ImportResult = {
+        'path': cacao_playbook_path,
+        'playbook_id': None,
+        'caldera_id': None,
+        'error': None
+    }
+    # A bundle holds the abilities of the playbooks it embeds, so they can't
+    # be reused from the conversion of other playbooks
+    if bundle:
+        playbook_cache = None
+        if ability_store is not None:
+            ability_store = AbilityStore()
+
+    # The embedded playbooks cached and the abilities stored while converting
+    # a playbook which fails may have been discarded or left unwritten
+    checkpoint: int = (
+        playbook_cache.checkpoint() if playbook_cache is not None else 0
+    )
+    store_checkpoint: int = (
+        ability_store.checkpoint() if ability_store is not None else 0
+    )
+    with (
+        profile_conversion(result, profile_directory, cprofile)
+        if profile_directory is not None else NULL_SPAN
+    ):
+        try:
+            if check_only:
+                result['playbook_id'] = check_playbook_file(
+                    cacao_playbook_path, streaming, limits, library
+                ).get('id')
+                return result
+            playbook = construct_abilities.CacaoPlaybook(
+                cacao_playbook_path, deterministic_ids=deterministic_ids,
+                incremental=incremental, playbook_cache=playbook_cache,
+                streaming=streaming, bundle=bundle,
+                background_writer=background_writer, sink=sink,
+                limits=limits,
+                ability_store=ability_store,
+                sidecar_index=sidecar_index, library=library,
+                attack_index=attack_index
+            )
+            result['playbook_id'] = playbook.playbook.get('id')
+            result['caldera_id'] = playbook.playbook['caldera_id']
+
+            # The profile can't be told apart from an existing adversary
+            # with the same name, other than the profile of an earlier import
+            # of the playbook
+            if library is not None:
+                library.check_adversary_name(
+                    playbook.playbook['name'], playbook.playbook['caldera_id'],
+                    playbook.playbook['id']
+                )
+            playbook.convert_workflow_steps()
+            construct_sources.construct_sources(
+                playbook.playbook, background_writer, sink
+            )
+            construct_profile.write_profile(
+                playbook.playbook, background_writer, sink,
+                playbook.step_order()
+            )
+            if background_writer is not None:
+                background_writer.wait()
+        except Exception as error: # pylint: disable=broad-except
+            # Don't leave writes of the failed playbook pending, where their
+            # errors would be reported against the next playbook
+            if background_writer is not None:
+                with contextlib.suppress(Exception):
+                    background_writer.wait()
+            if playbook_cache is not None:
+                playbook_cache.rollback(checkpoint)
+            if ability_store is not None:
+                ability_store.rollback(store_checkpoint)
+            result['error'] = "".join(
+                traceback.format_exception_only(type(error), error)
+            ).strip()
+    return result
+
+
+@contextlib.contextmanager
+def profile_conversion(
+    result: ImportResult,
+    profile_directory: str,
+    cprofile: bool = False
+    ) -> Iterator[None]:
+    """
+    Profile the conversion of a playbook run in the context, then write the
+    report to {PLAYBOOK ID}.profile.json in profile_directory, along with the
+    cProfile statistics in {PLAYBOOK ID}.prof if cprofile is set
+    """
+    profiler = Profiler()
+    c_profile: Optional[cProfile.Profile] = (
+        cProfile.Profile() if cprofile else None
+    )
+    with profiler.activate():
+        if c_profile is not None:
+            c_profile.enable()
+        try:
+            yield
+        finally:
+            if c_profile is not None:
+                c_profile.disable()
+
+    # Name the report after the playbook, or its file if it couldn't be loaded
+    report_name: str = (
+        result['playbook_id'] or os.path.basename(result['path'])
+    ).replace(os.sep, "_")
+    os.makedirs(profile_directory, exist_ok=True)
+    report_path: str = os.path.join(
+        profile_directory, f"{report_name}.profile.json"
+    )
+    cprofile_path: Optional[str] = None
+    if c_profile is not None:
+        cprofile_path = os.path.join(profile_directory, f"{report_name}.prof")
+        c_profile.dump_stats(cprofile_path)
+    with open(report_path, 'w') as file:
+        file.write(json.dumps({
+            **result, **profiler.report(), 'cprofile': cprofile_path
+        }, indent=4))
+
+
+def initialise_worker(
+    writer_threads: int = 0,
+    output_root: str = ".",
+    dedupe_abilities: bool = False
+    ) -> None:
+    """
+    Initialise the cache of embedded playbooks, the writer threads, the
+    output sink writing below output_root and, if dedupe_abilities is set,
+    the store of deduplicated abilities of a worker process
+    """
+    # pylint: disable=global-statement
+    global worker_playbook_cache, worker_background_writer, worker_sink
+    global worker_ability_store
+    worker_playbook_cache = PlaybookCache()
+    worker_sink = DirectorySink(output_root)
+    if writer_threads > 0:
+        worker_background_writer = BackgroundWriter(writer_threads)
+    if dedupe_abilities:
+        worker_ability_store = AbilityStore()
+
+
+def convert_playbook_in_worker(
+    cacao_playbook_path: str,
+    **options: Any
+    ) -> ImportResult:
+    """
+    Convert a playbook in a worker process, sharing the cache of embedded
+    playbooks, the store of deduplicated abilities and the writer threads
+    with the other playbooks converted by the worker
+    """
+    return convert_playbook(
+        cacao_playbook_path, playbook_cache=worker_playbook_cache,
+        background_writer=worker_background_writer, sink=worker_sink,
+        ability_store=worker_ability_store, **options
+    )
+
+
+def import_playbooks(
+    cacao_playbook_paths: List[str],
+    jobs: int = 1,
+    deterministic_ids: bool = False,
+    incremental: bool = False,
+    streaming: bool = False,
+    bundle: bool = False,
+    profile_directory: Optional[str] = None,
+    cprofile: bool = False,
+    writer_threads: int = DEFAULT_WRITER_THREADS,
+    sink: Optional[OutputSink] = None,
+    limits: Optional[ValidationLimits] = None,
+    check_only: bool = False,
+    dedupe_abilities: bool = False,
+    sidecar_index: bool = False,
+    library: Optional[CalderaLibrary] = None,
+    attack_index: Optional[AttackIndex] = None
+    ) -> List[ImportResult]:
+    """
+    Import each of the given playbooks and return the results in the same
+    order as the given paths. When jobs is greater than one, the playbooks are
+    converted in a pool of that many worker processes. The files are written
+    by writer_threads threads, of each worker process if there are several,
+    or by the converting thread itself if writer_threads is 0.
+
+    The files are written to sink, by default the working directory. Worker
+    processes can only share a DirectorySink, which each of them opens anew.
+
+    Each playbook is validated within limits before it's converted. If
+    check_only is set, the playbooks are only validated and nothing is
+    written. If dedupe_abilities is set, identical abilities are given the
+    same id, derived from their contents, so that the playbooks of this and
+    other imports share them, and each is written once per import, or once
+    per worker process. If sidecar_index is set, sidecar indexes are
+    written in place of rewritten copies of the playbooks, and embedded
+    playbooks are resolved from them. If a library of the Caldera
+    installation is given, attack-cmd commands and the names of the profiles
+    are checked against it. If an attack_index is given, abilities are filed
+    under the ATT&CK tactic their steps refer to
+    """
+    sink = sink or DirectorySink()
+    options = {
+        'deterministic_ids': deterministic_ids,
+        'incremental': incremental,
+        'streaming': streaming,
+        'bundle': bundle,
+        'profile_directory': profile_directory,
+        'cprofile': cprofile,
+        'limits': limits,
+        'check_only': check_only,
+        'sidecar_index': sidecar_index,
+        'library': library,
+        'attack_index': attack_index
+    }
+    if jobs <= 1 or len(cacao_playbook_paths) <= 1:
+        playbook_cache = PlaybookCache()
+        ability_store: Optional[AbilityStore] = (
+            AbilityStore() if dedupe_abilities else None
+        )
+        with (
+            BackgroundWriter(writer_threads) if writer_threads > 0
+            else contextlib.nullcontext()
+        ) as background_writer:
+            return [
+                convert_playbook(
+                    path, playbook_cache=playbook_cache,
+                    background_writer=background_writer, sink=sink,
+                    ability_store=ability_store, **options
+                )
+                for path in cacao_playbook_paths
+            ]
+
+    if not isinstance(sink, DirectorySink):
+        raise ValueError(
+            "Playbooks can only be converted in worker processes to a "
+            "DirectorySink"
+        )
+    convert = functools.partial(convert_playbook_in_worker, **options)
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=initialise_worker,
+        initargs=(writer_threads, sink.root, dedupe_abilities)
+    ) as executor:
+        return list(executor.map(convert, cacao_playbook_paths))
@@ -1,9 +1,11 @@
 """
 Main module for importing a Cacao playbook
 """
+import argparse
+import os
 import sys
 
-from typing import List
+from typing import List, Optional
 
 # # Add the root directory to the search path
 current_dir: str = sys.path[0]
@@ -11,19 +13,361 @@ current_dir_path: List[str] = current_dir.split("/")[:-2]
 root_dir: str = "/".join(current_dir_path)
 sys.path.append(root_dir)
 
-from ability_converter.cacao_importer import (
-    construct_abilities, construct_profile, construct_sources
- )
+from ability_converter.background_writer import DEFAULT_WRITER_THREADS
+from ability_converter.attack_index import AttackIndex
+from ability_converter.caldera_library import CalderaLibrary
+from ability_converter.caldera_sink import (
+    DEFAULT_CONCURRENCY, CalderaClient, CalderaSink
+)
+from ability_converter.cacao_importer.import_playbooks import (
+    ImportResult, import_playbooks
+)
+from ability_converter.cacao_importer.validate_playbook import (
+    DEFAULT_MAX_COMMAND_SIZE, DEFAULT_MAX_DEPTH, DEFAULT_MAX_STEPS,
+    ValidationLimits, default_limits
+)
+from ability_converter.cacao_importer.watch_playbooks import PlaybookWatcher
+from ability_converter.directory_watcher import (
+    DEFAULT_DEBOUNCE_SECONDS, DEFAULT_POLL_INTERVAL
+)
+from ability_converter.output_sink import DirectorySink, OutputSink, open_sink
 
+# Constant defining the API key used for Caldera unless another is given,
+# that of a default Caldera installation
+DEFAULT_CALDERA_API_KEY = "ADMIN123"
 
-def main(args: List[str]) -> None:
-    # Construct the playbook and convert the workflow steps for each playbook
-    # path given
-    for cacao_playbooks_path in args[1:]:
-        playbook = construct_abilities.CacaoPlaybook(cacao_playbooks_path)
-        playbook.convert_workflow_steps()
-        construct_sources.construct_sources(playbook.playbook)
-        construct_profile.write_profile(playbook.playbook)
+
+def parse_args(args: List[str]) -> argparse.Namespace:
+    """Parse the command line arguments given to the importer"""
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(args[0]) if args else "main.py",
+        description="Convert Cacao playbooks into Caldera profiles"
+    )
+    parser.add_argument(
+        'playbooks', nargs='*', metavar="PATH",
+        help="path to a Cacao playbook (.json) to convert"
+    )
+    parser.add_argument(
+        '--watch', metavar="DIR",
+        help=(
+            "keep running, converting the playbooks in DIR and every "
+            "playbook added to or changed in DIR afterwards"
+        )
+    )
+    parser.add_argument(
+        '--debounce', type=float, default=DEFAULT_DEBOUNCE_SECONDS,
+        metavar="SECONDS",
+        help=(
+            "time DIR must be quiet before the playbooks changed are "
+            f"converted (default: {DEFAULT_DEBOUNCE_SECONDS})"
+        )
+    )
+    parser.add_argument(
+        '--poll', type=float, nargs='?', const=DEFAULT_POLL_INTERVAL,
+        metavar="SECONDS",
+        help=(
+            "scan DIR for changes every SECONDS rather than using inotify "
+            f"(default: {DEFAULT_POLL_INTERVAL})"
+        )
+    )
+    parser.add_argument(
+        '-o', '--output', default=".", metavar="DIR",
+        help=(
+            "Caldera directory to write the converted files below, and "
+            "to read embedded playbooks from (default: the working "
+            "directory)"
+        )
+    )
+    parser.add_argument(
+        '--archive', metavar="PATH",
+        help=(
+            "write the converted files to a .zip, .tar, .tar.gz, .tgz, "
+            ".tar.bz2 or .tar.xz archive rather than to a directory"
+        )
+    )
+    parser.add_argument(
+        '--caldera-url', metavar="URL",
+        help=(
+            "load the abilities, adversaries and sources into the running "
+            "Caldera server at URL through its REST API, writing the other "
+            "files below the output directory"
+        )
+    )
+    parser.add_argument(
+        '--caldera-key', metavar="KEY",
+        default=os.environ.get('CALDERA_API_KEY', DEFAULT_CALDERA_API_KEY),
+        help=(
+            "API key of the Caldera server (default: $CALDERA_API_KEY or "
+            f"{DEFAULT_CALDERA_API_KEY})"
+        )
+    )
+    parser.add_argument(
+        '--caldera-concurrency', type=int, default=DEFAULT_CONCURRENCY,
+        metavar="N",
+        help=(
+            "number of requests sent to the Caldera server at once "
+            f"(default: {DEFAULT_CONCURRENCY})"
+        )
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1, metavar="N",
+        help="number of playbooks to convert concurrently (default: 1)"
+    )
+    parser.add_argument(
+        '--writer-threads', type=int, default=DEFAULT_WRITER_THREADS,
+        metavar="N",
+        help=(
+            "number of threads writing the converted files while conversion "
+            f"carries on, 0 to write them in turn (default: "
+            f"{DEFAULT_WRITER_THREADS})"
+        )
+    )
+    parser.add_argument(
+        '--deterministic-ids', action='store_true',
+        help=(
+            "derive the ids of the generated abilities, sources and profile "
+            "from the playbook so that re-importing it rewrites the same files"
+        )
+    )
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help=(
+            "only re-convert the workflow steps which changed since the "
+            "previous import of each playbook"
+        )
+    )
+    parser.add_argument(
+        '--dedupe-abilities', action='store_true',
+        help=(
+            "give abilities with the same commands, requirements and parsers "
+            "a single id derived from their contents, writing each of them "
+            "once"
+        )
+    )
+    parser.add_argument(
+        '--sidecar-index', action='store_true',
+        help=(
+            "write the ids given to each playbook to a compact index in "
+            "playbooks/ rather than a rewritten copy of the playbook, and "
+            "reuse the abilities of unchanged embedded playbooks from it"
+        )
+    )
+    parser.add_argument(
+        '--streaming', action='store_true',
+        help=(
+            "read and convert the workflow steps of each playbook one at a "
+            "time, to convert very large playbooks in bounded memory"
+        )
+    )
+    parser.add_argument(
+        '--bundle', action='store_true',
+        help=(
+            "write the abilities of each playbook to a single multi-document "
+            "bundle rather than one file per ability"
+        )
+    )
+    parser.add_argument(
+        '--caldera-library', metavar="DIR",
+        help=(
+            "check the abilities of attack-cmd commands and the names of the "
+            "profiles against the library of the Caldera installation at "
+            "DIR, including its plugins"
+        )
+    )
+    parser.add_argument(
+        '--attack-bundle', metavar="PATH",
+        help=(
+            "give the abilities the tactic and technique of MITRE ATT&CK "
+            "their workflow steps refer to, as defined by the STIX bundle "
+            "at PATH"
+        )
+    )
+    parser.add_argument(
+        '--check', action='store_true',
+        help=(
+            "only validate each playbook, reporting every error found, "
+            "without converting it"
+        )
+    )
+    parser.add_argument(
+        '--max-steps', type=int, default=DEFAULT_MAX_STEPS, metavar="N",
+        help=(
+            "most workflow steps a playbook may have "
+            f"(default: {DEFAULT_MAX_STEPS})"
+        )
+    )
+    parser.add_argument(
+        '--max-depth', type=int, default=DEFAULT_MAX_DEPTH, metavar="N",
+        help=(
+            "most levels of playbooks which may be embedded below a "
+            f"playbook (default: {DEFAULT_MAX_DEPTH})"
+        )
+    )
+    parser.add_argument(
+        '--max-command-size', type=int, default=DEFAULT_MAX_COMMAND_SIZE,
+        metavar="N",
+        help=(
+            "most characters a command may have "
+            f"(default: {DEFAULT_MAX_COMMAND_SIZE})"
+        )
+    )
+    parser.add_argument(
+        '--profile', metavar="DIR", dest='profile_directory',
+        help=(
+            "write a JSON report of the time spent in each phase of the "
+            "conversion of each playbook to DIR"
+        )
+    )
+    parser.add_argument(
+        '--cprofile', action='store_true',
+        help="also write the cProfile statistics of each playbook to DIR"
+    )
+    options = parser.parse_args(args[1:])
+    if options.watch is None and not options.playbooks:
+        parser.error("give the paths of playbooks to convert or --watch")
+    if options.watch is not None:
+        if options.playbooks:
+            parser.error("--watch converts the playbooks in DIR only")
+        if options.jobs > 1 or options.archive is not None:
+            parser.error("--watch can't be used with --jobs or --archive")
+        if os.path.realpath(options.watch) == os.path.realpath(
+                os.path.join(options.output, "playbooks")):
+            parser.error(
+                "--watch can't watch the directory the updated playbooks "
+                "are written to"
+            )
+    if options.caldera_library is not None and not os.path.isdir(
+            options.caldera_library):
+        parser.error("--caldera-library must be a Caldera directory")
+    if options.attack_bundle is not None and not os.path.isfile(
+            options.attack_bundle):
+        parser.error("--attack-bundle must be a STIX bundle file")
+    if options.cprofile and options.profile_directory is None:
+        parser.error("--cprofile requires --profile")
+    if options.bundle and options.incremental:
+        parser.error("--bundle can't be used with --incremental")
+    if options.dedupe_abilities and options.incremental:
+        parser.error("--dedupe-abilities can't be used with --incremental")
+    if options.archive is not None and options.jobs > 1:
+        parser.error("--archive can't be used with --jobs")
+    if options.archive is not None and options.incremental:
+        parser.error("--archive can't be used with --incremental")
+    if options.caldera_url is not None and (
+            options.archive is not None or options.jobs > 1):
+        parser.error("--caldera-url can't be used with --archive or --jobs")
+    if options.caldera_url is not None and options.incremental:
+        parser.error("--caldera-url can't be used with --incremental")
+    return options
+
+
+def validation_limits(options: argparse.Namespace) -> ValidationLimits:
+    """Return the limits the playbooks are validated within"""
+    return default_limits(
+        max_steps=options.max_steps, max_depth=options.max_depth,
+        max_command_size=options.max_command_size
+    )
+
+
+def open_library(options: argparse.Namespace) -> Optional[CalderaLibrary]:
+    """Return the index of the Caldera library, if one is checked against"""
+    if options.caldera_library is None:
+        return None
+    return CalderaLibrary(options.caldera_library)
+
+
+def open_attack_index(options: argparse.Namespace) -> Optional[AttackIndex]:
+    """Return the index of ATT&CK, if abilities are given their technique"""
+    if options.attack_bundle is None:
+        return None
+    return AttackIndex(options.attack_bundle)
+
+
+def open_output(options: argparse.Namespace) -> OutputSink:
+    """Return the sink the converted files are written to"""
+    if options.caldera_url is not None:
+        return CalderaSink(
+            CalderaClient(
+                options.caldera_url, options.caldera_key,
+                concurrency=options.caldera_concurrency
+            ),
+            fallback=DirectorySink(options.output)
+        )
+    return open_sink(options.output, options.archive)
+
+
+def report_result(result: ImportResult) -> None:
+    """Report the outcome of converting a playbook while watching"""
+    if result['error'] is not None:
+        print(f"{result['path']}: {result['error']}", file=sys.stderr)
+    elif result['caldera_id'] is None:
+        print(f"{result['path']}: is a valid playbook", flush=True)
+    else:
+        print(
+            f"{result['path']}: converted to profile {result['caldera_id']}",
+            flush=True
+        )
+
+
+def watch(options: argparse.Namespace) -> int:
+    """Convert the playbooks of the watched directory until interrupted"""
+    with open_output(options) as sink, PlaybookWatcher(
+        options.watch, debounce=options.debounce,
+        polling=options.poll is not None,
+        poll_interval=options.poll or DEFAULT_POLL_INTERVAL,
+        writer_threads=max(options.writer_threads, 0),
+        sink=sink,
+        deterministic_ids=options.deterministic_ids,
+        incremental=options.incremental,
+        dedupe_abilities=options.dedupe_abilities,
+        sidecar_index=options.sidecar_index,
+        streaming=options.streaming,
+        bundle=options.bundle,
+        profile_directory=options.profile_directory,
+        cprofile=options.cprofile,
+        limits=validation_limits(options),
+        check_only=options.check,
+        library=open_library(options),
+        attack_index=open_attack_index(options)
+    ) as playbook_watcher:
+        try:
+            playbook_watcher.run(report_result)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def main(args: List[str]) -> int:
+    """
+    Construct the playbook and convert the workflow steps for each playbook
+    path given, returning a non-zero exit status if any playbook failed
+    """
+    options = parse_args(args)
+    if options.watch is not None:
+        return watch(options)
+    with open_output(options) as sink:
+        results = import_playbooks(
+            options.playbooks, jobs=options.jobs,
+            deterministic_ids=options.deterministic_ids,
+            incremental=options.incremental,
+            dedupe_abilities=options.dedupe_abilities,
+            sidecar_index=options.sidecar_index,
+            streaming=options.streaming,
+            bundle=options.bundle,
+            profile_directory=options.profile_directory,
+            cprofile=options.cprofile,
+            writer_threads=max(options.writer_threads, 0),
+            sink=sink,
+            limits=validation_limits(options),
+            check_only=options.check,
+            library=open_library(options),
+            attack_index=open_attack_index(options)
+        )
+
+    # Report the playbooks that could not be converted
+    failures = [result for result in results if result['error'] is not None]
+    for result in failures:
+        print(f"{result['path']}: {result['error']}", file=sys.stderr)
+    return 1 if failures else 0
 
 if __name__ == '__main__':
-    main(sys.argv)
+    sys.exit(main(sys.argv))
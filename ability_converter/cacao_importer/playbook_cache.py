@@ -0,0 +1,111 @@
+"""
+Module for the cache of the embedded playbooks converted during an import
+
+A playbook embedded by a workflow step of type 'playbook' is converted once
+per import, however many steps or parent playbooks refer to it, and the
+results of its conversion are reused by every later reference. The cache also
+tracks the chain of playbooks being converted so that playbooks which embed
+each other are reported rather than converted forever.
+"""
+import contextlib
+import hashlib
+
+from typing import Dict, Iterator, List, Optional, Tuple, TypedDict
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.cacao_importer.cacao_types import Fact
+
+
+class PlaybookCycleError(Exception):
+    """Exception raised when playbooks embed each other in a cycle"""
+
+    def __init__(self, playbook_ids: List[str]) -> None:
+        """Initialise PlaybookCycleError with the ids of the cycle"""
+        self.playbook_ids: List[str] = playbook_ids
+        super().__init__(
+            "Embedded playbooks form a cycle: " + " -> ".join(playbook_ids)
+        )
+
+
+class ConvertedPlaybook(TypedDict):
+    """Class defining the results of converting an embedded playbook"""
+    playbook_id: str
+    content_hash: str
+    caldera_ability_ids: List[str]
+    facts: List[Fact]
+
+
+def hash_playbook_file(path_to_file: str) -> str:
+    """Return a hash of the contents of a playbook file"""
+    with open(path_to_file, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+class PlaybookCache:
+    """
+    Class object caching the embedded playbooks converted during an import,
+    keyed by playbook id and the hash of the playbook's contents
+    """
+
+    def __init__(self) -> None:
+        """Initialise PlaybookCache class"""
+        self.converted: Dict[Tuple[str, str], ConvertedPlaybook] = {}
+        # The keys of the converted playbooks, in the order they were added
+        self.added_keys: List[Tuple[str, str]] = []
+        # The ids of the playbooks being converted, outermost first
+        self.converting_ids: List[str] = []
+
+    def get(
+        self,
+        playbook_id: str,
+        content_hash: str
+        ) -> Optional[ConvertedPlaybook]:
+        """Return the results of converting a playbook, if converted already"""
+        return self.converted.get((playbook_id, content_hash))
+
+    def add(self, converted_playbook: ConvertedPlaybook) -> None:
+        """Add the results of converting a playbook to the cache"""
+        key = (
+            converted_playbook['playbook_id'],
+            converted_playbook['content_hash']
+        )
+        if key not in self.converted:
+            self.added_keys.append(key)
+        self.converted[key] = converted_playbook
+
+    def checkpoint(self) -> int:
+        """Return a checkpoint of the cache, which rollback returns to"""
+        return len(self.added_keys)
+
+    def rollback(self, checkpoint: int) -> None:
+        """
+        Remove the playbooks added to the cache since the checkpoint, whose
+        abilities were discarded with the playbook embedding them
+        """
+        for key in self.added_keys[checkpoint:]:
+            del self.converted[key]
+        del self.added_keys[checkpoint:]
+
+    def check_cycle(self, playbook_id: str) -> None:
+        """
+        Raise PlaybookCycleError if the playbook with the given id is being
+        converted already, so embedding it again would form a cycle
+        """
+        if playbook_id in self.converting_ids:
+            cycle_start: int = self.converting_ids.index(playbook_id)
+            raise PlaybookCycleError(
+                [*self.converting_ids[cycle_start:], playbook_id]
+            )
+
+    @contextlib.contextmanager
+    def converting(self, playbook_id: str) -> Iterator[None]:
+        """
+        Context manager marking the playbook with the given id as being
+        converted for the duration of the context
+        """
+        self.check_cycle(playbook_id)
+        self.converting_ids.append(playbook_id)
+        try:
+            yield
+        finally:
+            self.converting_ids.pop()
@@ -0,0 +1,112 @@
+"""
+Module for the sidecar index of a converted Cacao playbook
+
+Rather than rewriting the whole playbook with the ids given to it, the ids
+can be written to a compact index, playbooks/{id}.index.jsonl, in the JSON
+lines format, where an embedded playbook is indexed under the name of its
+file in playbooks/ rather than its id. The first line gives the ids of the
+playbook, the hash of the playbook file it was converted from, its facts and
+the ability files written for it. Each following line gives the ids of the
+abilities of a workflow step, in the order the steps are executed.
+
+An embedded playbook whose file hasn't changed since its index was written
+is resolved from the index rather than being converted again.
+"""
+import json
+
+from typing import Dict, List, Optional, TypedDict
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.cacao_importer.cacao_types import Fact, WorkflowStep
+from ability_converter.cacao_importer.compact_objects import plain_json
+from ability_converter.cacao_importer.playbook_cache import ConvertedPlaybook
+from ability_converter.output_sink import OutputSink
+
+# Constant defining the separators of the JSON lines, without any whitespace
+COMPACT_SEPARATORS = (",", ":")
+
+
+class IndexHeader(TypedDict):
+    """Class defining the first line of the sidecar index of a playbook"""
+    playbook_id: str
+    content_hash: str
+    caldera_id: str
+    sources_id: str
+    objective_id: str
+    facts: List[Fact]
+    files: List[str]
+
+
+class IndexedStep(TypedDict):
+    """Class defining the line of a workflow step in a sidecar index"""
+    step_id: str
+    caldera_ability_ids: List[str]
+
+
+def index_path(playbook_id: str) -> str:
+    """
+    Return the path of the sidecar index of the playbook with the id, or of
+    the embedded playbook with the file name
+    """
+    return f"playbooks/{playbook_id}.index.jsonl"
+
+
+def format_index(
+    header: IndexHeader,
+    workflow: Dict[str, WorkflowStep],
+    step_order: List[str]
+    ) -> str:
+    """
+    Return the contents of a sidecar index with the given header, followed
+    by the ability ids of each workflow step taken in step_order
+    """
+    lines: List[str] = [
+        json.dumps(header, separators=COMPACT_SEPARATORS, default=plain_json)
+    ]
+    for step_id in step_order:
+        step: WorkflowStep = workflow[step_id]
+        indexed_step: IndexedStep = {
+            'step_id': step_id,
+            'caldera_ability_ids': step.get('caldera_ability_ids', [])
+        }
+        lines.append(json.dumps(indexed_step, separators=COMPACT_SEPARATORS))
+    return "\n".join(lines) + "\n"
+
+
+def load_index(
+    sink: OutputSink,
+    playbook_id: str,
+    content_hash: str
+    ) -> Optional[ConvertedPlaybook]:
+    """
+    Return the results of converting the playbook with the given id as
+    recorded by its sidecar index in sink, if the index was written for a
+    playbook file with the given hash and every file it lists still exists
+    """
+    contents: Optional[str] = sink.read(index_path(playbook_id))
+    if contents is None:
+        return None
+    try:
+        lines: List[str] = contents.splitlines()
+        header: IndexHeader = json.loads(lines[0])
+        indexed_steps: List[IndexedStep] = [
+            json.loads(line) for line in lines[1:]
+        ]
+    except (ValueError, IndexError):
+        # No usable index, so the playbook is converted
+        return None
+    if (header.get('playbook_id') != playbook_id
+            or header.get('content_hash') != content_hash):
+        return None
+    if not all(sink.exists(file_name) for file_name in header['files']):
+        return None
+    return {
+        'playbook_id': playbook_id,
+        'content_hash': content_hash,
+        'caldera_ability_ids': [
+            ability_id
+            for indexed_step in indexed_steps
+            for ability_id in indexed_step['caldera_ability_ids']
+        ],
+        'facts': header['facts']
+    }
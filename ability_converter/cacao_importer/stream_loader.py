@@ -0,0 +1,159 @@
+"""
+Module for loading very large Cacao playbooks without holding the whole
+document in memory
+
+The playbook is read in chunks and only one value is decoded at a time. The
+workflow steps are yielded one by one as they are read, so the memory used is
+close to the size of the largest workflow step rather than of the playbook.
+"""
+import json
+
+from typing import Any, Iterator, TextIO, Tuple
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.cacao_importer.cacao_types import (
+    CacaoPlaybookAttributes, WorkflowStep
+)
+
+# Constant defining the number of characters read from the playbook at a time
+CHUNK_SIZE = 64 * 1024
+
+# Constant defining the whitespace allowed between JSON tokens
+JSON_WHITESPACE = " \t\n\r"
+
+
+class JsonStreamReader:
+    """
+    Class object reading a JSON document from a file one value at a time,
+    holding only the part of the document which hasn't been consumed yet
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = CHUNK_SIZE) -> None:
+        """Initialise JsonStreamReader class"""
+        self.file: TextIO = file
+        self.chunk_size: int = chunk_size
+        self.buffer: str = ""
+        self.position: int = 0
+        self.end_of_file: bool = False
+        self.decoder = json.JSONDecoder()
+
+    def read_more(self) -> bool:
+        """
+        Read more of the document into the buffer, returning False at the end
+        of the file. At least as much as is buffered is read, so that a value
+        spanning many chunks is decoded in linear time
+        """
+        if self.end_of_file:
+            return False
+        # Drop the part of the buffer which has been consumed
+        self.buffer = self.buffer[self.position:]
+        self.position = 0
+        chunk: str = self.file.read(max(self.chunk_size, len(self.buffer)))
+        if not chunk:
+            self.end_of_file = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def peek(self) -> str:
+        """
+        Return the next character which isn't whitespace without consuming it
+        """
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position] in JSON_WHITESPACE):
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read_more():
+                raise json.JSONDecodeError(
+                    "Unexpected end of document", self.buffer, self.position
+                )
+
+    def expect(self, characters: str) -> str:
+        """
+        Consume the next character which isn't whitespace, which must be one
+        of the given characters, and return it
+        """
+        character: str = self.peek()
+        if character not in characters:
+            raise json.JSONDecodeError(
+                f"Expected one of {characters!r}", self.buffer, self.position
+            )
+        self.position += 1
+        return character
+
+    def decode_value(self) -> Any:
+        """Decode and consume the next JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(
+                    self.buffer, self.position
+                )
+            except json.JSONDecodeError:
+                # The value may continue past the end of the buffer
+                if self.read_more():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self.read_more():
+                continue
+            self.position = end
+            return value
+
+    def iter_object_keys(self) -> Iterator[str]:
+        """
+        Iterate over the keys of the next JSON object. The value of each key
+        must be consumed, with decode_value or by iterating over it, before
+        moving on to the next key
+        """
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+        while True:
+            key: str = self.decode_value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+
+def load_playbook_attributes(path_to_file: str) -> CacaoPlaybookAttributes:
+    """
+    Load every attribute of a playbook except for its workflow, which is
+    given as an empty dictionary
+    """
+    attributes: CacaoPlaybookAttributes = {}
+    with open(path_to_file) as file:
+        reader = JsonStreamReader(file)
+        for key in reader.iter_object_keys():
+            if key == "workflow":
+                # Consume the workflow steps one at a time without keeping them
+                for _ in reader.iter_object_keys():
+                    reader.decode_value()
+                attributes['workflow'] = {}
+            else:
+                attributes[key] = reader.decode_value()
+    return attributes
+
+
+def iter_workflow_steps(
+    path_to_file: str
+    ) -> Iterator[Tuple[str, WorkflowStep]]:
+    """
+    Iterate over the (step id, workflow step) pairs of the workflow of a
+    playbook in the order in which they're given
+    """
+    with open(path_to_file) as file:
+        reader = JsonStreamReader(file)
+        for key in reader.iter_object_keys():
+            if key != "workflow":
+                reader.decode_value()
+                continue
+            for step_id in reader.iter_object_keys():
+                step: WorkflowStep = reader.decode_value()
+                yield step_id, step
+            # The rest of the playbook isn't needed
+            return
@@ -0,0 +1,24 @@
+"""
+Module defining the fixtures shared by the tests of the cacao_importer
+package
+"""
+import os
+
+from typing import Callable
+
+import pytest
+
+
+@pytest.fixture(name="list_ability_files")
+def fixture_list_ability_files() -> Callable[[], list]:
+    """
+    Give a function listing the name of every ability file in the Caldera
+    library of the working directory
+    """
+    def list_ability_files() -> list:
+        return [
+            file_name
+            for _, _, file_names in os.walk("data/abilities")
+            for file_name in file_names
+        ]
+    return list_ability_files
@@ -0,0 +1,125 @@
+"""
+Module to test the ability_store.py module
+"""
+import glob
+import json
+
+import pytest
+import yaml
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer.ability_store import (
+    AbilityStore, ability_digest
+)
+from ability_converter.cacao_importer.construct_abilities import CacaoPlaybook
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+
+TEST_ABILITY = {
+    'id': "01234567-89ab-4cde-fghi-jklmnopqrstu",
+    'name': "Triage: 1",
+    'description': "List the running processes",
+    'tactic': "",
+    'technique_id': "",
+    'technique_name': "",
+    'singleton': False,
+    'repeatable': False,
+    'delete_payload': False,
+    'requirements': [],
+    'executors': [{'platform': "linux", 'name': "sh", 'command': "ps aux"}],
+}
+
+def test_ability_digest() -> None:
+    """
+    Test that the digest of an ability depends on what it does, and not on
+    its id, name or description
+    """
+    renamed_ability = {
+        **TEST_ABILITY, 'id': "other id", 'name': "Other: 2",
+        'description': ""
+    }
+    assert ability_digest(renamed_ability) == ability_digest(TEST_ABILITY)
+    assert ability_digest({**TEST_ABILITY, 'singleton': True}) != (
+        ability_digest(TEST_ABILITY)
+    )
+    assert ability_digest({
+        **TEST_ABILITY,
+        'executors': [{'platform': "linux", 'name': "sh", 'command': "ls"}]
+    }) != ability_digest(TEST_ABILITY)
+
+def test_ability_store() -> None:
+    """
+    Test that AbilityStore gives the id of the ability added with a digest,
+    until it's rolled back to a checkpoint from before it was added
+    """
+    store = AbilityStore()
+    assert store.get("digest") is None
+    store.add("digest", "ability id")
+    checkpoint = store.checkpoint()
+    store.add("other digest", "other ability id")
+    assert store.get("digest") == "ability id"
+    assert len(store) == 2
+    store.rollback(checkpoint)
+    assert store.get("other digest") is None
+    assert store.get("digest") == "ability id"
+
+def test_import_playbooks_dedupe_abilities(
+    tmp_path,
+    monkeypatch,
+    write_test_playbook,
+    make_triage_playbook,
+    list_ability_files
+    ) -> None:
+    """
+    Test that identical commands, within and across playbooks, resolve to a
+    single ability which every profile refers to
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_playbook("first.json", make_triage_playbook(
+        "first", ["ps aux", "ps aux", "netstat -an"]
+    ))
+    write_test_playbook("second.json", make_triage_playbook(
+        "second", ["netstat -an", "ps aux"]
+    ))
+    results = import_playbooks(
+        ["first.json", "second.json"], dedupe_abilities=True
+    )
+    assert [result['error'] for result in results] == [None, None]
+
+    with open("playbooks/first.json") as file:
+        first_ids = json.load(file)['workflow']['triage'][
+            'caldera_ability_ids'
+        ]
+    with open("playbooks/second.json") as file:
+        second_ids = json.load(file)['workflow']['triage'][
+            'caldera_ability_ids'
+        ]
+    assert first_ids[0] == first_ids[1] == second_ids[1]
+    assert first_ids[2] == second_ids[0]
+    assert first_ids[0] != first_ids[2]
+
+    # Two triage abilities, and a start and end ability for each playbook
+    assert len(list_ability_files()) == 6
+
+    # The abilities shared with the first playbook aren't written again
+    [ability_path] = glob.glob(f"data/abilities/*/{first_ids[2]}.yml")
+    with open(ability_path) as file:
+        assert "Triage first" in file.read()
+    for profile_path in glob.glob("data/adversaries/*.yml"):
+        with open(profile_path) as file:
+            atomic_ordering = yaml.safe_load(file)['atomic_ordering']
+        assert first_ids[0] in atomic_ordering
+        assert first_ids[2] in atomic_ordering
+
+    # Importing again reuses the files of the triage abilities, only adding
+    # the start and end abilities, which are given new random ids
+    import_playbooks(["first.json"], dedupe_abilities=True)
+    assert len(list_ability_files()) == 8
+
+def test_dedupe_abilities_incremental() -> None:
+    """
+    Test that deduplicated abilities can't be imported incrementally
+    """
+    with pytest.raises(ValueError, match="incrementally"):
+        CacaoPlaybook(
+            "playbook.json", incremental=True, ability_store=AbilityStore()
+        )
@@ -0,0 +1,72 @@
+"""
+Module to test the command_types.py module
+"""
+import unittest.mock as mock
+
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer import command_types
+
+def test_construct_executors() -> None:
+    """
+    Test that construct_executors fills in the templates of the command type
+    and gives no executors for a command type which isn't registered
+    """
+    parsers = [{'module': "test.parser", 'parserconfigs': []}]
+    executors = command_types.construct_executors(
+        "ssh", "Test SSH Command", 10, parsers
+    )
+
+    assert [
+        (executor['platform'], executor['name']) for executor in executors
+    ] == [("linux", "sh"), ("darwin", "sh"), ("windows", "pwsh")]
+    assert executors[0] == {
+        'platform': "linux",
+        'name': "sh",
+        'payloads': [],
+        'uploads': [],
+        'command': "Test SSH Command",
+        'timeout': 10,
+        'cleanup': [],
+        'parsers': [parsers]
+    }
+    assert command_types.construct_executors("manual", "", 0, []) == []
+
+def test_construct_executors_own_lists() -> None:
+    """
+    Test that the executors constructed don't share their lists with each
+    other or with the templates
+    """
+    first_executor, second_executor, _ = command_types.construct_executors(
+        "bash", "ls", None, [{'module': "test.parser", 'parserconfigs': []}]
+    )
+    first_executor['payloads'].append("payload.sh")
+    first_executor['cleanup'].append("rm payload.sh")
+    first_executor['parsers'].append([])
+
+    [executor, *_] = command_types.construct_executors("bash", "ls", None, [])
+    assert second_executor['payloads'] == executor['payloads'] == []
+    assert second_executor['cleanup'] == executor['cleanup'] == []
+    assert len(second_executor['parsers']) == 1
+    assert command_types.COMMAND_TYPES["bash"][0]['payloads'] == ()
+
+def test_register_command_type() -> None:
+    """
+    Test that a registered command type gets executors from read-only
+    templates
+    """
+    with mock.patch.dict(command_types.COMMAND_TYPES):
+        command_types.register_command_type(
+            "powershell", [("windows", "psh")]
+        )
+        [executor] = command_types.construct_executors(
+            "powershell", "Get-Process", None, []
+        )
+        with pytest.raises(TypeError):
+            command_types.COMMAND_TYPES["powershell"][0]['name'] = "cmd"
+
+    assert executor['platform'] == "windows"
+    assert executor['name'] == "psh"
+    assert executor['parsers'] == []
+    assert "powershell" not in command_types.COMMAND_TYPES
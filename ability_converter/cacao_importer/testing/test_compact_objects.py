@@ -0,0 +1,92 @@
+"""
+Module to test the compact_objects.py module
+"""
+import copy
+import io
+import json
+import pickle
+
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer import compact_objects
+from ability_converter.cacao_importer.compact_objects import (
+    MAX_SHAPE_KEYS, CompactObject, json_chunks, load_compact, plain_json
+)
+
+TEST_PLAYBOOK = """{
+    "id": "playbook--1",
+    "workflow": {
+        "step--1": {"type": "single", "in_args": ["$$a$$"],
+                    "commands": [{"type": "manual", "command": "echo"}]},
+        "step--2": {"type": "single", "in_args": ["$$a$$"],
+                    "commands": [{"type": "manual", "command": "ls"}]}
+    }
+}"""
+
+def test_load_compact() -> None:
+    """
+    Test that the objects below a loaded playbook are CompactObjects sharing
+    their shapes and interned strings, and serialise back to the same JSON
+    """
+    playbook = load_compact(io.StringIO(TEST_PLAYBOOK))
+    assert isinstance(playbook, dict)
+    first, second = playbook['workflow'].values()
+    assert isinstance(first, CompactObject)
+    assert isinstance(first['commands'][0], CompactObject)
+    assert first.object_shape is second.object_shape
+    assert first['in_args'][0] is second['in_args'][0]
+    assert json.dumps(playbook, default=plain_json) == json.dumps(
+        json.loads(TEST_PLAYBOOK)
+    )
+
+def test_compact_object_updates() -> None:
+    """
+    Test that a CompactObject is read and updated like a dict, keeping its
+    keys in order
+    """
+    step = load_compact(io.StringIO('{"step": {"type": "single"}}'))['step']
+    step['caldera_ability_ids'] = ["1"]
+    step['converted'] = True
+    step['type'] = "parallel"
+    assert list(step.items()) == [
+        ('type', "parallel"), ('caldera_ability_ids', ["1"]),
+        ('converted', True)
+    ]
+    assert step == {
+        'type': "parallel", 'caldera_ability_ids': ["1"], 'converted': True
+    }
+    assert step.get('name') is None and 'name' not in step
+    with pytest.raises(KeyError):
+        _ = step['name']
+    del step['caldera_ability_ids']
+    assert dict(step) == {'type': "parallel", 'converted': True}
+    assert pickle.loads(pickle.dumps(step)) == step
+    assert copy.deepcopy(step) == step
+
+def test_load_compact_keeps_dicts() -> None:
+    """
+    Test whether objects with many keys or repeated keys are loaded as dicts
+    """
+    many_keys = json.dumps({
+        'outer': {f"key{index}": index for index in range(MAX_SHAPE_KEYS + 1)}
+    })
+    assert type(load_compact(io.StringIO(many_keys))['outer']) is dict
+    repeated = load_compact(io.StringIO('{"outer": {"a": 1, "a": 2}}'))
+    assert repeated['outer'] == {'a': 2}
+    with pytest.raises(ValueError):
+        load_compact(io.StringIO("[]"))
+
+def test_json_chunks(monkeypatch) -> None:
+    """
+    Test that the JSON of a loaded playbook is given in chunks which join
+    into the JSON given by json.dumps
+    """
+    monkeypatch.setattr(compact_objects, "JSON_CHUNK_SIZE", 16)
+    playbook = load_compact(io.StringIO(TEST_PLAYBOOK))
+    chunks = list(json_chunks(playbook, indent=4))
+    assert len(chunks) > 1
+    assert "".join(chunks) == json.dumps(
+        playbook, indent=4, default=plain_json
+    )
+    assert "".join(json_chunks({})) == "{}"
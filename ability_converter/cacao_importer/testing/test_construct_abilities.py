@@ -9,15 +9,23 @@ import unittest.mock as mock
 from copy import deepcopy
 from typing import Dict
 
+import pytest
+
 # pylint: disable=import-error, wrong-import-position
 import ability_converter.cacao_importer.construct_abilities as construct_abilities
 
+from ability_converter.cacao_importer import command_types
+
 from ability_converter.cacao_importer.construct_abilities import (
     CacaoPlaybook
 )
 from ability_converter.cacao_importer.cacao_types import (
     CacaoPlaybookAttributes, CommandData, WorkflowStep
 )
+from ability_converter.cacao_importer.validate_playbook import (
+    PlaybookValidationError
+)
+from ability_converter.write_ability import AbilityWriter
 
 CacaoPlaybookClass: construct_abilities.CacaoPlaybook = (
     'ability_converter.cacao_importer.construct_abilities.CacaoPlaybook'
@@ -175,6 +183,22 @@ def test_generate_ability_id() -> None:
 
     assert generated_id == EXPECTED_GENERATED_ID
 
+def test_derive_ability_id() -> None:
+    """
+    Test that derive_ability_id gives the same ID for the same parts, a
+    different ID for different parts, and IDs of the expected form
+    """
+    generated_id = construct_abilities.derive_ability_id("playbook", "step_01")
+
+    assert generated_id == construct_abilities.derive_ability_id(
+        "playbook", "step_01"
+    )
+    assert generated_id != construct_abilities.derive_ability_id(
+        "playbook", "step_02"
+    )
+    assert [len(part) for part in generated_id.split("-")] == [8, 4, 4, 4, 12]
+    assert generated_id[14] == "4"
+
 def test_wrong_path_to_playbook() -> None:
     """
     Test whether an exception is raised when attempting to load a playbook
@@ -275,24 +299,19 @@ def test_convert_workflow_step_type() -> None:
     the right step handler for each different value of the step attribute 'type'
     """
     test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
-    # Patch all of the methods that are expected to be called
+    # Patch all of the methods that are expected to be called. Steps which
+    # branch have no handler
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(CacaoPlaybook, attribute='handle_start_step'
-    ) as mock1, mock.patch.object(CacaoPlaybook, attribute='handle_end_step'
+    ), mock.patch.object(
+        CacaoPlaybook, attribute='handle_start_step', return_value=None
+    ) as mock1, mock.patch.object(
+        CacaoPlaybook, attribute='handle_end_step', return_value=None
     ) as mock2, mock.patch.object(
-        CacaoPlaybook, attribute='handle_single_step'
+        CacaoPlaybook, attribute='handle_single_step', return_value=None
     ) as mock3, mock.patch.object(
-        CacaoPlaybook, attribute='handle_playbook_step'
-    ) as mock4, mock.patch.object(
-        CacaoPlaybook, attribute='handle_parallel_step'
-    ) as mock5, mock.patch.object(
-        CacaoPlaybook, attribute='handle_if_condition_step'
-    ) as mock6, mock.patch.object(
-        CacaoPlaybook, attribute='handle_while_condition_step'
-    ) as mock7, mock.patch.object(
-        CacaoPlaybook, attribute='handle_switch_condition_step'
-    ) as mock8:
+        CacaoPlaybook, attribute='handle_playbook_step', return_value=None
+    ) as mock4:
         playbook = CacaoPlaybook("path_to_file")
 
         # Convert each of the workflow steps exactly once
@@ -300,7 +319,7 @@ def test_convert_workflow_step_type() -> None:
             playbook.convert_workflow_step(step_id)
 
         # Assert that each handler was called the right number of times
-        mocks = [mock1, mock2, mock4, mock5, mock6, mock7, mock8,]
+        mocks = [mock1, mock2, mock4,]
         for mock_object in mocks:
             mock_object.assert_called_once()
         mock3.assert_has_calls([
@@ -314,12 +333,15 @@ def test_convert_workflow_step_converted() -> None:
     no handlers are called when a step has been converted already
     """
     test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
-    # Patch the loading of the playbook to return the test_playbook and
-    # the expected callback for the step type
+    # Patch the loading of the playbook to return the test_playbook,
+    # the expected callback for the step type and the conversion of the
+    # embedded playbook
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(CacaoPlaybook, attribute='handle_start_step'
-    ) as mock1:
+    ), mock.patch.object(CacaoPlaybook, attribute='handle_end_step'
+    ) as mock1, mock.patch.object(
+        CacaoPlaybook, attribute='handle_playbook_step', return_value=None
+    ):
         playbook = CacaoPlaybook("path_to_file")
 
         # Convert the same step twice
@@ -331,6 +353,78 @@ def test_convert_workflow_step_converted() -> None:
         mock1.assert_called_once()
         assert playbook.playbook['workflow']['step_02']['converted']
 
+def test_convert_workflow_step_order() -> None:
+    """
+    Test that CacaoPlaybook method convert_workflow_step converts the steps
+    depth first, in the order of the branches and then of the transitions
+    """
+    test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
+    converted_step_names = []
+    with mock.patch.object(builtins, attribute='open'
+    ), mock.patch.object(json, attribute='loads', return_value=test_playbook
+    ), mock.patch.object(
+        CacaoPlaybook, attribute='handle_single_step',
+        side_effect=lambda step: converted_step_names.append(step['name'])
+    ), mock.patch.object(CacaoPlaybook, attribute='handle_start_step'
+    ), mock.patch.object(CacaoPlaybook, attribute='handle_end_step'
+    ), mock.patch.object(CacaoPlaybook, attribute='handle_playbook_step',
+        return_value=None
+    ):
+        playbook = CacaoPlaybook("path_to_file")
+        playbook.convert_workflow_step("step_06")
+
+    assert converted_step_names == ["Test Single 1", "Test Single 2"]
+    # Every step reachable from step_06 is converted, including step_06
+    assert all(
+        step.get('converted') for step in playbook.playbook['workflow'].values()
+        if step['type'] != "start"
+    )
+    assert playbook.playbook['workflow']['step_01'].get('converted') is None
+
+def test_convert_workflow_step_missing_step() -> None:
+    """
+    Test that a workflow leading to a step missing from it is rejected when
+    the playbook is loaded, before any step is converted
+    """
+    test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
+    test_playbook['workflow']['step_03']['on_completion'] = "step_10"
+    with mock.patch.object(builtins, attribute='open'
+    ), mock.patch.object(json, attribute='loads', return_value=test_playbook
+    ), mock.patch.object(
+        CacaoPlaybook, attribute='handle_single_step'
+    ) as mock1, pytest.raises(PlaybookValidationError, match="step_10"):
+        CacaoPlaybook("path_to_file")
+    mock1.assert_not_called()
+
+def test_convert_workflow_step_long_workflow() -> None:
+    """
+    Test that a workflow much longer than the recursion limit is converted
+    """
+    number_of_steps = 20000
+    workflow = {
+        f"step_{index}": {
+            'type': "single", 'name': f"Step {index}", 'description': "",
+            'commands': [], 'on_completion': f"step_{index + 1}",
+        }
+        for index in range(number_of_steps)
+    }
+    workflow[f"step_{number_of_steps}"] = {'type': "end"}
+    test_playbook = {
+        **deepcopy(TEST_PLAYBOOK_COPY), 'workflow_start': "step_0",
+        'workflow': workflow
+    }
+    with mock.patch.object(builtins, attribute='open'
+    ), mock.patch.object(json, attribute='loads', return_value=test_playbook
+    ), mock.patch.object(
+        CacaoPlaybook, attribute='handle_single_step', return_value=None
+    ) as mock1, mock.patch.object(CacaoPlaybook, attribute='handle_end_step'
+    ) as mock2:
+        playbook = CacaoPlaybook("path_to_file")
+        playbook.convert_workflow_step("step_0")
+
+    assert mock1.call_count == number_of_steps
+    mock2.assert_called_once()
+
 def test_handle_start_step() -> None:
     """
     Test whether CacaoPlaybook method handle_start_step correctly handles a
@@ -338,10 +432,10 @@ def test_handle_start_step() -> None:
     """
     test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
     # Patch the loading of the playbook to return the test_playbook and the
-    # write_ability callback to ensure that it's called with the right arguments
+    # AbilityWriter callback to ensure that it's called with the right arguments
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(construct_abilities, attribute='write_ability'
+    ), mock.patch.object(AbilityWriter, attribute='write'
     ) as mock1, mock.patch.object(
         construct_abilities, attribute='generate_ability_id',
         return_value=EXPECTED_GENERATED_ID
@@ -365,10 +459,10 @@ def test_handle_end_step() -> None:
     """
     test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
     # Patch the loading of the playbook to return the test_playbook and the
-    # write_ability callback to ensure that it's called with the right arguments
+    # AbilityWriter callback to ensure that it's called with the right arguments
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(construct_abilities, attribute='write_ability'
+    ), mock.patch.object(AbilityWriter, attribute='write'
     ) as mock1, mock.patch.object(
         construct_abilities, attribute='generate_ability_id',
         return_value=EXPECTED_GENERATED_ID
@@ -385,90 +479,6 @@ def test_handle_end_step() -> None:
         }
         mock1.assert_called_once_with(expected_generated_ability)
 
-def test_handle_parallel_step() -> None:
-    """
-    Test whether CacaoPlaybook method handle_parallel_step correctly handles a
-    workflow step with 'type' as 'parallel'
-    """
-    test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
-    # Patch the loading of the playbook to return the test_playbook and the
-    # handler callback to ensure that it's called with the right arguments
-    with mock.patch.object(builtins, attribute='open'
-    ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(CacaoPlaybook, attribute='convert_workflow_step'
-    ) as mock1:
-        playbook = CacaoPlaybook("path_to_file")
-        playbook.handle_parallel_step(TEST_WORKFLOW['step_05'])
-
-        mock1.assert_has_calls([
-            mock.call("step_02"),
-            mock.call("step_04")
-        ])
-
-def test_handle_if_condition_step() -> None:
-    """
-    Test whether CacaoPlaybook method handle_if_condition_step correctly
-    handles a workflow step with 'type' as 'if_condition'
-    """
-    test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
-    # Patch the loading of the playbook to return the test_playbook and the
-    # handler callback to ensure that it's called with the right arguments
-    with mock.patch.object(builtins, attribute='open'
-    ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(CacaoPlaybook, attribute='convert_workflow_step'
-    ) as mock1:
-        playbook = CacaoPlaybook("path_to_file")
-        playbook.handle_if_condition_step(TEST_WORKFLOW['step_06'])
-
-        mock1.assert_has_calls([
-            mock.call("step_02"),
-            mock.call("step_03"),
-            mock.call("step_04"),
-            mock.call("step_05")
-        ])
-
-def test_handle_while_condition_step() -> None:
-    """
-    Test whether CacaoPlaybook method handle_while_condition_step correctly
-    handles a workflow step with 'type' as 'while_condition'
-    """
-    test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
-    # Patch the loading of the playbook to return the test_playbook and the
-    # handler callback to ensure that it's called with the right arguments
-    with mock.patch.object(builtins, attribute='open'
-    ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(CacaoPlaybook, attribute='convert_workflow_step'
-    ) as mock1:
-        playbook = CacaoPlaybook("path_to_file")
-        playbook.handle_while_condition_step(TEST_WORKFLOW['step_07'])
-
-        mock1.assert_has_calls([
-            mock.call("step_02"),
-            mock.call("step_09")
-        ])
-
-def test_handle_switch_condition_step() -> None:
-    """
-    Test whether CacaoPlaybook method handle_switch_condition_step correctly
-    handles a workflow step with 'type' as 'switch_condition'
-    """
-    test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
-    # Patch the loading of the playbook to return the test_playbook and the
-    # handler callback to ensure that it's called with the right arguments
-    with mock.patch.object(builtins, attribute='open'
-    ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(CacaoPlaybook, attribute='convert_workflow_step'
-    ) as mock1:
-        playbook = CacaoPlaybook("path_to_file")
-        playbook.handle_switch_condition_step(TEST_WORKFLOW['step_08'])
-
-        mock1.assert_has_calls([
-            mock.call("step_06"),
-            mock.call("step_02"),
-            mock.call("step_04"),
-            mock.call("step_03")
-        ])
-
 def test_handle_single_step_bash() -> None:
     """
     Test whether CacaoPlaybook method handle_single_step correctly
@@ -505,13 +515,13 @@ def test_handle_single_step_bash() -> None:
         'description': "Test Single Step 1 Description"
     }
     # Patch the loading of the playbook to return the test_playbook, the
-    # write_ability callback to ensure that it's called with the right arguments
-    # and the callbacks that handle the other command types
+    # AbilityWriter callback to ensure that it's called with the right arguments
+    # and the executors registered for the other command types
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(
-        construct_abilities, attribute='handle_http_api_command'
-    ), mock.patch.object(construct_abilities, attribute='write_ability'
+    ), mock.patch.dict(
+        command_types.COMMAND_TYPES, {"http-api": ()}
+    ), mock.patch.object(AbilityWriter, attribute='write'
     ) as mock1, mock.patch.object(
         construct_abilities, attribute='generate_ability_id',
         return_value=EXPECTED_GENERATED_ID
@@ -563,13 +573,13 @@ def test_handle_single_step_ssh() -> None:
         'description': "Test Single Step 2 Description",
     }
     # Patch the loading of the playbook to return the test_playbook, the
-    # write_ability callback to ensure that it's called with the right arguments
-    # and the callbacks that handle the other command types
+    # AbilityWriter callback to ensure that it's called with the right arguments
+    # and the executors registered for the other command types
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(
-        construct_abilities, attribute='handle_openc2_json_command'
-    ), mock.patch.object(construct_abilities, attribute='write_ability'
+    ), mock.patch.dict(
+        command_types.COMMAND_TYPES, {"openc2-json": ()}
+    ), mock.patch.object(AbilityWriter, attribute='write'
     ) as mock1, mock.patch.object(
         construct_abilities, attribute='generate_ability_id',
         return_value=EXPECTED_GENERATED_ID
@@ -622,12 +632,12 @@ def test_handle_single_step_http_api() -> None:
     }
 
     # Patch the loading of the playbook to return the test_playbook, the
-    # write_ability callback to ensure that it's called with the right arguments
-    # and the callbacks that handle the other command types
+    # AbilityWriter callback to ensure that it's called with the right arguments
+    # and the executors registered for the other command types
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(construct_abilities, attribute='handle_bash_command'
-    ), mock.patch.object(construct_abilities, attribute='write_ability'
+    ), mock.patch.dict(command_types.COMMAND_TYPES, {"bash": ()}
+    ), mock.patch.object(AbilityWriter, attribute='write'
     ) as mock1, mock.patch.object(
         construct_abilities, attribute='generate_ability_id',
         return_value=EXPECTED_GENERATED_ID
@@ -681,12 +691,12 @@ def test_handle_single_step_openc2_json() -> None:
     }
 
     # Patch the loading of the playbook to return the test_playbook, the
-    # write_ability callback to ensure that it's called with the right arguments
-    # and the callbacks that handle the other command types
+    # AbilityWriter callback to ensure that it's called with the right arguments
+    # and the executors registered for the other command types
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(construct_abilities, attribute='handle_ssh_command'
-    ), mock.patch.object(construct_abilities, attribute='write_ability'
+    ), mock.patch.dict(command_types.COMMAND_TYPES, {"ssh": ()}
+    ), mock.patch.object(AbilityWriter, attribute='write'
     ) as mock1, mock.patch.object(
         construct_abilities, attribute='generate_ability_id',
         return_value=EXPECTED_GENERATED_ID
@@ -709,16 +719,59 @@ def test_handle_single_step_attack_cmd() -> None:
     """
     test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
     # Patch the loading of the playbook to return the test_playbook, the
-    # write_ability callback to ensure that it's called the right number of
+    # AbilityWriter callback to ensure that it's called the right number of
     # times
     with mock.patch.object(builtins, attribute='open'
     ), mock.patch.object(json, attribute='loads', return_value=test_playbook
-    ), mock.patch.object(
-        construct_abilities, attribute='handle_http_api_command'
-    ), mock.patch.object(construct_abilities, attribute='handle_bash_command'
-    ), mock.patch.object(construct_abilities, attribute='write_ability'
+    ), mock.patch.dict(
+        command_types.COMMAND_TYPES, {"http-api": ()}
+    ), mock.patch.dict(command_types.COMMAND_TYPES, {"bash": ()}
+    ), mock.patch.object(AbilityWriter, attribute='write'
     ) as mock1:
         playbook = CacaoPlaybook("path_to_file")
         playbook.handle_single_step(playbook.playbook['workflow']["step_02"])
 
         assert mock1.call_count == 2
+
+def test_handle_single_step_shared_requirements() -> None:
+    """
+    Test whether CacaoPlaybook method handle_single_step constructs the
+    requirements and parsers of a step once and shares them between the
+    abilities of the step
+    """
+    test_playbook = deepcopy(TEST_PLAYBOOK_COPY)
+    step = test_playbook['workflow']["step_03"]
+    step['out_args'] = ["$$Test_Var_5$$"]
+    # Patch the loading of the playbook to return the test_playbook, and the
+    # AbilityWriter callback and construction of the requirements to count
+    # the calls made
+    with mock.patch.object(builtins, attribute='open'
+    ), mock.patch.object(json, attribute='loads', return_value=test_playbook
+    ), mock.patch.object(AbilityWriter, attribute='write'
+    ) as mock1, mock.patch.object(
+        CacaoPlaybook, 'construct_requirements', autospec=True,
+        side_effect=CacaoPlaybook.construct_requirements
+    ) as mock2:
+        playbook = CacaoPlaybook("path_to_file")
+        playbook.handle_single_step(step)
+
+    [ssh_ability], [openc2_ability] = [call.args for call in mock1.mock_calls]
+    mock2.assert_called_once()
+    assert ssh_ability['requirements'] == [{
+        'module': "plugins.stockpile.app.requirements.basic",
+        'relationship_match': [{'source': "Test Playbook Name.Test_Var_4"}]
+    }]
+    assert ssh_ability['requirements'] is openc2_ability['requirements']
+    assert ssh_ability['executors'][0]['parsers'] == [[{
+        'module': "plugins.stockpile.app.parsers.basic",
+        'parserconfigs': [{'source': "Test Playbook Name.Test_Var_5"}]
+    }]]
+
+def test_parse_variable_name() -> None:
+    """
+    Test whether parse_variable_name obtains the name of a variable and leaves
+    other arguments unchanged
+    """
+    assert construct_abilities.parse_variable_name("$$Test_Var$$") == "Test_Var"
+    assert construct_abilities.parse_variable_name("test_arg") == "test_arg"
+    assert construct_abilities.parse_variable_name("$5") == "$5"
@@ -30,3 +30,13 @@ def test_collate_caldera_ids() -> None:
     collated_ids = construct_profile.collate_caldera_ids(TEST_WORKFLOW_STEPS)
     expected_caldera_ids = ["Test Id 1", "Test Id 2", "Test Id 3"]
     assert collated_ids == expected_caldera_ids
+
+def test_collate_caldera_ids_in_step_order() -> None:
+    """
+    Test that the ids of the abilities are collated in the order of the steps
+    given
+    """
+    collated_ids = construct_profile.collate_caldera_ids(
+        TEST_WORKFLOW_STEPS, ["step_id_03", "step_id_02", "step_id_01"]
+    )
+    assert collated_ids == ["Test Id 3", "Test Id 1", "Test Id 2"]
@@ -0,0 +1,79 @@
+"""
+Module to test the fact_index.py module
+"""
+import glob
+
+import yaml
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer.fact_index import (
+    FactIndex, normalise_fact
+)
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+
+def test_normalise_fact() -> None:
+    """
+    Test that facts given by their source or trait are given the shape of a
+    Caldera fact
+    """
+    assert normalise_fact({'source': "Playbook.var"}) == {
+        'trait': "Playbook.var", 'value': "", 'score': 1
+    }
+    assert normalise_fact({'trait': "var", 'value': None}) == {
+        'trait': "var", 'value': "", 'score': 1
+    }
+    assert normalise_fact({'trait': "var", 'value': "x", 'score': 3}) == {
+        'trait': "var", 'value': "x", 'score': 3
+    }
+
+def test_fact_index() -> None:
+    """
+    Test that FactIndex keeps the first of the facts with the same trait and
+    value, in the order the facts were added
+    """
+    index = FactIndex([
+        {'trait': "var", 'value': "", 'score': 1},
+        {'source': "Playbook.var"},
+    ])
+    assert index.add({'source': "var"}) is False
+    assert index.add({'trait': "var", 'value': "x", 'score': 2}) is True
+    index.extend([{'source': "Playbook.var"}, {'trait': "var", 'value': "x"}])
+
+    assert list(index) == [
+        {'trait': "var", 'value': "", 'score': 1},
+        {'trait': "Playbook.var", 'value': "", 'score': 1},
+        {'trait': "var", 'value': "x", 'score': 2},
+    ]
+    assert len(index) == 3
+    assert {'source': "Playbook.var"} in index
+    assert {'trait': "var", 'value': "y"} not in index
+
+def test_embedded_playbook_facts_merged(
+    tmp_path, monkeypatch, make_test_playbook, write_test_playbook
+    ) -> None:
+    """
+    Test that the facts of a playbook embedded by several steps, at several
+    depths, are written to the sources of the parent playbook once
+    """
+    monkeypatch.chdir(tmp_path)
+    child = make_test_playbook("child", [])
+    child['playbook_variables'] = {"$$child_var$$": {'type': "string"}}
+    middle = make_test_playbook("middle", ["child", "child"])
+    parent = make_test_playbook("parent", ["middle", "child", "middle"])
+    for playbook in (middle, parent):
+        for step in playbook['workflow'].values():
+            if step['type'] == "playbook":
+                step['in_args'] = ["$$shared_var$$"]
+    write_test_playbook("playbooks/child", child)
+    write_test_playbook("playbooks/middle", middle)
+    write_test_playbook("parent.json", parent)
+
+    [result] = import_playbooks(["parent.json"])
+    assert result['error'] is None
+    with open(glob.glob("data/sources/*.yml")[0]) as file:
+        facts = yaml.safe_load(file)['facts']
+    assert sorted(fact['trait'] for fact in facts) == [
+        "Test Playbook middle.shared_var",
+        "Test Playbook parent.shared_var",
+        "child_var",
+    ]
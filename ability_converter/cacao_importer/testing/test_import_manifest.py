@@ -0,0 +1,147 @@
+"""
+Module to test the import_manifest.py module
+"""
+import json
+import os
+
+from copy import deepcopy
+
+import yaml
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer import import_manifest
+from ability_converter.attack_index import AttackIndex
+from ability_converter.caldera_library import CalderaLibrary
+from ability_converter.cacao_importer.import_playbooks import convert_playbook
+
+TEST_PLAYBOOK_PATH: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..",
+    "test_playbooks", "SuperSpy.json"
+)
+
+def list_ability_files() -> set:
+    """List every ability file in the Caldera library"""
+    return {
+        os.path.join(path, file_name)
+        for path, _, file_names in os.walk("data/abilities")
+        for file_name in file_names
+    }
+
+def test_fingerprint_step() -> None:
+    """
+    Test that the fingerprint of a step ignores the attributes added during
+    conversion but not the contents of the step or its context
+    """
+    step = {'type': "single", 'commands': [{'type': "bash", 'command': "ls"}]}
+    fingerprint = import_manifest.fingerprint_step(step, "Playbook")
+
+    converted_step = {
+        **deepcopy(step), 'converted': True, 'caldera_ability_ids': ["id"]
+    }
+    assert import_manifest.fingerprint_step(
+        converted_step, "Playbook"
+    ) == fingerprint
+
+    edited_step = deepcopy(step)
+    edited_step['commands'][0]['command'] = "ls -la"
+    assert import_manifest.fingerprint_step(
+        edited_step, "Playbook"
+    ) != fingerprint
+    assert import_manifest.fingerprint_step(step, "Other") != fingerprint
+
+def test_incremental_import(tmp_path, monkeypatch) -> None:
+    """
+    Test that an incremental re-import only re-converts the edited steps,
+    removes the abilities of removed steps and updates the profile
+    """
+    monkeypatch.chdir(tmp_path)
+    with open(TEST_PLAYBOOK_PATH) as file:
+        playbook = json.loads(file.read())
+    playbook_path = str(tmp_path / "playbook.json")
+    with open(playbook_path, 'w') as file:
+        file.write(json.dumps(playbook))
+
+    first_result = convert_playbook(playbook_path, incremental=True)
+    first_files = list_ability_files()
+    with open(import_manifest.manifest_path(playbook['id'])) as file:
+        first_manifest = json.loads(file.read())
+
+    # Edit the command of one step and remove another from the workflow
+    workflow = playbook['workflow']
+    workflow['step-uuid003']['commands'][0]['command'] = "pbpaste | head"
+    workflow['step-uuid003']['on_completion'] = "step-uuid005"
+    del workflow['step-uuid004']
+    with open(playbook_path, 'w') as file:
+        file.write(json.dumps(playbook))
+
+    second_result = convert_playbook(playbook_path, incremental=True)
+    second_files = list_ability_files()
+    with open(import_manifest.manifest_path(playbook['id'])) as file:
+        second_manifest = json.loads(file.read())
+
+    assert second_result['error'] is None
+    assert second_result['caldera_id'] == first_result['caldera_id']
+
+    # Only the edited step has a new ability; the removed step's is deleted
+    first_steps = first_manifest['steps']
+    second_steps = second_manifest['steps']
+    assert first_files - second_files == {
+        *first_steps['step-uuid003']['files'],
+        *first_steps['step-uuid004']['files'],
+    }
+    assert second_files - first_files == set(
+        second_steps['step-uuid003']['files']
+    )
+    for step_id, record in second_steps.items():
+        if step_id != "step-uuid003":
+            assert record == first_steps[step_id]
+
+    # The profile refers to the abilities of the current steps only
+    with open(f"data/adversaries/{second_result['caldera_id']}.yml") as file:
+        profile = yaml.safe_load(file)
+    assert len(profile['atomic_ordering']) == len(second_steps)
+    assert not set(
+        first_steps['step-uuid004']['caldera_ability_ids']
+    ) & set(profile['atomic_ordering'])
+
+def test_incremental_import_enrichment(
+    tmp_path,
+    monkeypatch,
+    write_test_playbook,
+    make_triage_playbook,
+    make_test_library,
+    write_test_bundle
+    ) -> None:
+    """
+    Test that a step is converted again once the ATT&CK index or the Caldera
+    library gives its abilities something else
+    """
+    monkeypatch.chdir(tmp_path)
+    playbook = make_triage_playbook("playbook", ["ps aux"])
+    playbook['workflow']['triage']['external_references'] = [
+        {'name': "Process Discovery", 'external_id': "T1057"}
+    ]
+    playbook['workflow']['triage']['commands'].append(
+        {'type': "attack-cmd", 'command': {'id': "1ab2c3"}}
+    )
+    write_test_playbook("playbook.json", playbook)
+    assert convert_playbook("playbook.json", incremental=True)[
+        'error'
+    ] is None
+    assert os.listdir("data/abilities/Miscallaneous")
+
+    write_test_bundle("enterprise-attack.json")
+    make_test_library()
+    result = convert_playbook(
+        "playbook.json", incremental=True,
+        attack_index=AttackIndex("enterprise-attack.json"),
+        library=CalderaLibrary()
+    )
+    assert result['error'] is None
+    # The ability of the step moved to its tactic, next to that of the
+    # library
+    assert not os.listdir("data/abilities/Miscallaneous")
+    assert len(os.listdir("data/abilities/discovery")) == 2
+    with open("playbooks/playbook.json") as file:
+        [_, command] = json.load(file)['workflow']['triage']['commands']
+    assert command['command']['name'] == "Discover processes"
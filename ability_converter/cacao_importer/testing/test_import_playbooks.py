@@ -0,0 +1,249 @@
+"""
+Module to test the import_playbooks.py module
+"""
+import json
+import os
+import tarfile
+import unittest.mock as mock
+
+import pytest
+import yaml
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter import output_sink
+from ability_converter.cacao_importer import import_playbooks
+
+def test_convert_playbook_records_error(tmp_path, monkeypatch) -> None:
+    """
+    Test that a playbook which can't be loaded is reported in the result
+    instead of raising an exception
+    """
+    monkeypatch.chdir(tmp_path)
+    result = import_playbooks.convert_playbook("missing_playbook.json")
+
+    assert result['path'] == "missing_playbook.json"
+    assert result['caldera_id'] is None
+    assert "FileNotFoundError" in result['error']
+
+def test_import_playbooks_in_parallel(
+    tmp_path, monkeypatch, test_playbook_paths
+    ) -> None:
+    """
+    Test that importing playbooks with several jobs converts every playbook,
+    keeps the results in the order of the given paths and reports the failures
+    """
+    monkeypatch.chdir(tmp_path)
+    paths = [*test_playbook_paths, "missing_playbook.json"]
+    results = import_playbooks.import_playbooks(paths, jobs=2)
+
+    assert [result['path'] for result in results] == paths
+    assert [result['playbook_id'] for result in results] == [
+        "Playbook UUID-002", "Playbook UUID-001", None
+    ]
+    assert results[0]['error'] is None and results[1]['error'] is None
+    assert results[2]['error'] is not None
+
+    # Every converted playbook has a profile, sources and no temporary files
+    for result in results[:2]:
+        assert os.path.exists(
+            f"data/adversaries/{result['caldera_id']}.yml"
+        )
+    assert len(os.listdir("data/sources")) == 2
+    for directory, _, file_names in os.walk("data"):
+        assert not [name for name in file_names if name.endswith(".part")], \
+            directory
+
+def test_reimport_with_deterministic_ids(
+    tmp_path, monkeypatch, test_playbook_paths
+    ) -> None:
+    """
+    Test that re-importing an unchanged playbook with deterministic ids gives
+    the same ids and writes no files
+    """
+    monkeypatch.chdir(tmp_path)
+    [first_result] = import_playbooks.import_playbooks(
+        test_playbook_paths[:1], deterministic_ids=True
+    )
+    with mock.patch.object(os, attribute='replace', wraps=os.replace
+    ) as mock1:
+        [second_result] = import_playbooks.import_playbooks(
+            test_playbook_paths[:1], deterministic_ids=True
+        )
+
+    assert second_result['error'] is None
+    assert second_result['caldera_id'] == first_result['caldera_id']
+    mock1.assert_not_called()
+
+def test_import_playbooks_bundle(
+    tmp_path, monkeypatch, test_playbook_paths
+    ) -> None:
+    """
+    Test that a bundled import writes the same abilities as an import with one
+    file per ability, in a single bundle per playbook
+    """
+    abilities = {}
+    for bundle in (False, True):
+        monkeypatch.chdir(tmp_path)
+        os.makedirs(str(bundle))
+        monkeypatch.chdir(str(bundle))
+        results = import_playbooks.import_playbooks(
+            test_playbook_paths, deterministic_ids=True, bundle=bundle
+        )
+        assert [result['error'] for result in results] == [None, None]
+
+        abilities[bundle] = {}
+        for directory, _, file_names in os.walk("data/abilities"):
+            for file_name in file_names:
+                if not file_name.endswith(".yml"):
+                    continue
+                with open(os.path.join(directory, file_name)) as file:
+                    for [ability] in yaml.safe_load_all(file):
+                        abilities[bundle][ability['id']] = ability
+
+    assert abilities[True] == abilities[False]
+    assert sorted(os.listdir("data/abilities/bundles")) == sorted(
+        f"{result['caldera_id']}{extension}"
+        for result in results for extension in (".index.json", ".yml")
+    )
+
+def test_import_playbooks_bundles_embedding(
+    tmp_path, monkeypatch, make_test_playbook, write_test_playbook
+    ) -> None:
+    """
+    Test that each bundle holds the abilities of the playbooks it embeds,
+    even when another playbook of the import embeds them too
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_playbook("playbooks/child", make_test_playbook("child", []))
+    for parent_id in ("parent_1", "parent_2"):
+        write_test_playbook(
+            f"{parent_id}.json", make_test_playbook(parent_id, ["child"])
+        )
+    results = import_playbooks.import_playbooks(
+        ["parent_1.json", "parent_2.json"], bundle=True
+    )
+    assert [result['error'] for result in results] == [None, None]
+
+    for result in results:
+        with open(
+            f"data/abilities/bundles/{result['caldera_id']}.index.json"
+        ) as file:
+            bundled_ids = {entry['id'] for entry in json.load(file)}
+        with open(f"data/adversaries/{result['caldera_id']}.yml") as file:
+            atomic_ordering = yaml.safe_load(file)['atomic_ordering']
+        assert len(atomic_ordering) == 4
+        assert set(atomic_ordering) == bundled_ids
+
+def test_import_playbooks_bundle_incremental(
+    tmp_path, monkeypatch, test_playbook_paths
+    ) -> None:
+    """
+    Test that a bundled import can't be incremental
+    """
+    monkeypatch.chdir(tmp_path)
+    [result] = import_playbooks.import_playbooks(
+        test_playbook_paths[:1], incremental=True, bundle=True
+    )
+
+    assert "ValueError" in result['error']
+    assert not os.path.exists("data")
+
+def test_import_playbooks_profile(
+    tmp_path, monkeypatch, test_playbook_paths
+    ) -> None:
+    """
+    Test that profiling an import writes a report of each playbook, with the
+    cProfile statistics if asked for
+    """
+    monkeypatch.chdir(tmp_path)
+    [result] = import_playbooks.import_playbooks(
+        test_playbook_paths[:1], profile_directory="profile", cprofile=True
+    )
+
+    assert result['error'] is None
+    with open("profile/Playbook UUID-002.profile.json") as file:
+        report = json.loads(file.read())
+    assert report['caldera_id'] == result['caldera_id']
+    assert {
+        "load_playbook", "traverse_workflow", "construct_abilities",
+        "serialise_yaml", "write_files", "construct_profile",
+        "construct_sources"
+    } <= set(report['spans'])
+    assert report['counters']['abilities'] > 0
+    assert report['counters']['files_written'] > report['counters'][
+        'abilities'
+    ]
+    assert os.path.exists(report['cprofile'])
+
+def test_import_playbooks_sinks(
+    tmp_path, monkeypatch, test_playbook_paths
+    ) -> None:
+    """
+    Test that an import to memory or to an archive gives the same files as
+    an import to a directory, and that nothing is written to the working
+    directory
+    """
+    monkeypatch.chdir(tmp_path)
+    directory_sink = output_sink.DirectorySink("caldera")
+    import_playbooks.import_playbooks(
+        test_playbook_paths, deterministic_ids=True, sink=directory_sink
+    )
+    directory_files = {}
+    for directory, _, file_names in os.walk("caldera"):
+        for file_name in file_names:
+            path = os.path.join(directory, file_name)
+            with open(path) as file:
+                directory_files[os.path.relpath(path, "caldera")] = (
+                    file.read()
+                )
+
+    memory_sink = output_sink.MemorySink()
+    results = import_playbooks.import_playbooks(
+        test_playbook_paths, deterministic_ids=True, sink=memory_sink
+    )
+    assert [result['error'] for result in results] == [None, None]
+    assert memory_sink.files == directory_files
+
+    with output_sink.ArchiveSink("library.tar") as archive_sink:
+        import_playbooks.import_playbooks(
+            test_playbook_paths, deterministic_ids=True, sink=archive_sink
+        )
+    with tarfile.open("library.tar") as archive:
+        assert sorted(archive.getnames()) == sorted(directory_files)
+    assert sorted(os.listdir(".")) == ["caldera", "library.tar"]
+
+def test_import_playbooks_output_directory(
+    tmp_path, monkeypatch, make_test_playbook, write_test_playbook
+    ) -> None:
+    """
+    Test that embedded playbooks are read from the Caldera directory written
+    to, alongside their sidecar indexes, rather than the working directory
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_playbook(
+        "caldera/playbooks/child", make_test_playbook("child", [])
+    )
+    write_test_playbook("parent.json", make_test_playbook("parent", ["child"]))
+    sink = output_sink.DirectorySink("caldera")
+    for _ in range(2):
+        [result] = import_playbooks.import_playbooks(
+            ["parent.json"], sink=sink, sidecar_index=True
+        )
+        assert result['error'] is None
+    assert os.path.exists("caldera/playbooks/child.index.jsonl")
+    assert sorted(os.listdir(".")) == ["caldera", "parent.json"]
+
+    # The start and end abilities of the parent are constructed again, but
+    # the embedded playbook is resolved from its index
+    assert len(os.listdir("caldera/data/abilities/Start")) == 3
+    assert len(os.listdir("caldera/data/abilities/End")) == 3
+
+def test_import_playbooks_in_parallel_to_memory(test_playbook_paths) -> None:
+    """
+    Test that playbooks can only be converted in worker processes to a
+    directory
+    """
+    with pytest.raises(ValueError):
+        import_playbooks.import_playbooks(
+            test_playbook_paths, jobs=2, sink=output_sink.MemorySink()
+        )
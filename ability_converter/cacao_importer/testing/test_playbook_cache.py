@@ -0,0 +1,132 @@
+"""
+Module to test the playbook_cache.py module
+"""
+import json
+
+import pytest
+import yaml
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+from ability_converter.cacao_importer.playbook_cache import (
+    PlaybookCache, PlaybookCycleError
+)
+
+def test_check_cycle() -> None:
+    """
+    Test that PlaybookCache reports the chain of playbooks forming a cycle
+    """
+    cache = PlaybookCache()
+    with cache.converting("A"), cache.converting("B"):
+        cache.check_cycle("C")
+        with pytest.raises(PlaybookCycleError) as error:
+            cache.check_cycle("A")
+    assert error.value.playbook_ids == ["A", "B", "A"]
+    assert not cache.converting_ids
+
+def test_embedded_playbook_converted_once(
+    tmp_path,
+    monkeypatch,
+    make_test_playbook,
+    write_test_playbook,
+    list_ability_files
+    ) -> None:
+    """
+    Test that a playbook embedded by several steps and several playbooks is
+    converted once and its abilities are used by every step
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_playbook("playbooks/child", make_test_playbook("child", []))
+    write_test_playbook(
+        "parent_1.json", make_test_playbook("parent_1", ["child", "child"])
+    )
+    write_test_playbook(
+        "parent_2.json", make_test_playbook("parent_2", ["child"])
+    )
+
+    results = import_playbooks(["parent_1.json", "parent_2.json"])
+    assert [result['error'] for result in results] == [None, None]
+
+    # Each parent has a start and end ability and the child has one of each
+    assert len(list_ability_files()) == 6
+    with open("playbooks/parent_1.json") as file:
+        workflow = json.loads(file.read())['workflow']
+    assert len(workflow['step_1']['caldera_ability_ids']) == 2
+    assert (
+        workflow['step_1']['caldera_ability_ids']
+        == workflow['step_2']['caldera_ability_ids']
+    )
+
+def test_embedded_playbook_cycle(
+    tmp_path,
+    monkeypatch,
+    make_test_playbook,
+    write_test_playbook,
+    list_ability_files
+    ) -> None:
+    """
+    Test that playbooks embedding each other are reported as a cycle and no
+    abilities are written
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_playbook("playbooks/A", make_test_playbook("A", ["B"]))
+    write_test_playbook("playbooks/B", make_test_playbook("B", ["A"]))
+
+    [result] = import_playbooks(["playbooks/A"])
+    assert "PlaybookCycleError" in result['error']
+    assert "A -> B -> A" in result['error']
+    assert list_ability_files() == []
+
+def test_rollback() -> None:
+    """
+    Test that rolling PlaybookCache back removes the playbooks added since
+    the checkpoint only
+    """
+    cache = PlaybookCache()
+    cache.add({
+        'playbook_id': "A", 'content_hash': "a", 'caldera_ability_ids': [],
+        'facts': []
+    })
+    checkpoint = cache.checkpoint()
+    cache.add({
+        'playbook_id': "B", 'content_hash': "b", 'caldera_ability_ids': [],
+        'facts': []
+    })
+    cache.rollback(checkpoint)
+    assert cache.get("A", "a") is not None
+    assert cache.get("B", "b") is None
+    cache.rollback(checkpoint)
+    assert cache.get("A", "a") is not None
+
+def test_embedded_playbook_failed_parent(
+    tmp_path,
+    monkeypatch,
+    make_test_playbook,
+    write_test_playbook,
+    list_ability_files
+    ) -> None:
+    """
+    Test that a playbook embedded by a parent which fails is converted again
+    for the next parent, as the abilities converted for the first were
+    never written
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_playbook("playbooks/child", make_test_playbook("child", []))
+    write_test_playbook(
+        "failing.json", make_test_playbook("failing", ["child", "missing"])
+    )
+    write_test_playbook(
+        "parent.json", make_test_playbook("parent", ["child"])
+    )
+
+    failed, result = import_playbooks(["failing.json", "parent.json"])
+    assert failed['error'] is not None
+    assert result['error'] is None
+
+    # The profile refers to the start, end and child abilities written
+    with open(f"data/adversaries/{result['caldera_id']}.yml") as file:
+        atomic_ordering = yaml.safe_load(file)['atomic_ordering']
+    assert len(atomic_ordering) == 4
+    assert sorted(list_ability_files()) == sorted(
+        f"{ability_id}.yml" for ability_id in atomic_ordering
+    )
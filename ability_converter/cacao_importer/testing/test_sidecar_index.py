@@ -0,0 +1,146 @@
+"""
+Module to test the sidecar_index.py module
+"""
+import json
+import os
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+from ability_converter.cacao_importer.sidecar_index import (
+    format_index, index_path, load_index
+)
+from ability_converter.output_sink import MemorySink
+
+TEST_HEADER = {
+    'playbook_id': "child",
+    'content_hash': "hash",
+    'caldera_id': "caldera id",
+    'sources_id': "sources id",
+    'objective_id': "objective id",
+    'facts': [{'trait': "var", 'value': "", 'score': 1}],
+    'files': ["data/abilities/Start/start.yml"],
+}
+
+TEST_WORKFLOW = {
+    "end": {'type': "end", 'caldera_ability_ids': ["end"]},
+    "branch": {'type': "parallel"},
+    "start": {'type': "start", 'caldera_ability_ids': ["start"]},
+}
+
+def test_format_index() -> None:
+    """
+    Test that the index gives the header, then the ability ids of each step
+    in the order given, one JSON object per line
+    """
+    contents = format_index(
+        TEST_HEADER, TEST_WORKFLOW, ["start", "branch", "end"]
+    )
+    lines = contents.splitlines()
+    assert json.loads(lines[0]) == TEST_HEADER
+    assert [json.loads(line) for line in lines[1:]] == [
+        {'step_id': "start", 'caldera_ability_ids': ["start"]},
+        {'step_id': "branch", 'caldera_ability_ids': []},
+        {'step_id': "end", 'caldera_ability_ids': ["end"]},
+    ]
+    assert ", " not in contents and ": " not in contents
+
+def test_load_index() -> None:
+    """
+    Test that an index is only used for the playbook file it was written
+    for, while the files it lists exist
+    """
+    sink = MemorySink()
+    assert load_index(sink, "child", "hash") is None
+    sink.write(index_path("child"), format_index(
+        TEST_HEADER, TEST_WORKFLOW, ["start", "branch", "end"]
+    ))
+    assert load_index(sink, "child", "hash") is None
+
+    sink.write("data/abilities/Start/start.yml", "")
+    assert load_index(sink, "child", "hash") == {
+        'playbook_id': "child",
+        'content_hash': "hash",
+        'caldera_ability_ids': ["start", "end"],
+        'facts': TEST_HEADER['facts'],
+    }
+    assert load_index(sink, "child", "other hash") is None
+
+    sink.write(index_path("child"), "not an index")
+    assert load_index(sink, "child", "hash") is None
+
+def test_import_playbooks_sidecar_index(
+    tmp_path,
+    monkeypatch,
+    make_test_playbook,
+    write_test_playbook,
+    list_ability_files
+    ) -> None:
+    """
+    Test that a sidecar index is written in place of the rewritten playbook,
+    and that an unchanged embedded playbook is resolved from its index
+    rather than converted again
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_playbook("playbooks/child", make_test_playbook("child", []))
+    write_test_playbook("parent.json", make_test_playbook("parent", ["child"]))
+
+    [result] = import_playbooks(["parent.json"], sidecar_index=True)
+    assert result['error'] is None
+    assert not os.path.exists("playbooks/parent.json")
+    with open(index_path("child")) as file:
+        child_ids = [
+            ability_id
+            for line in file.read().splitlines()[1:]
+            for ability_id in json.loads(line)['caldera_ability_ids']
+        ]
+    with open(index_path("parent")) as file:
+        parent_lines = [json.loads(line) for line in file.read().splitlines()]
+    assert parent_lines[0]['caldera_id'] == result['caldera_id']
+    assert parent_lines[2] == {
+        'step_id': "step_1", 'caldera_ability_ids': child_ids
+    }
+    assert len(list_ability_files()) == 4
+
+    # Only the start and end abilities of the parent are constructed again
+    [result] = import_playbooks(["parent.json"], sidecar_index=True)
+    assert result['error'] is None
+    assert len(list_ability_files()) == 6
+    with open(index_path("parent")) as file:
+        assert json.loads(file.read().splitlines()[2]) == {
+            'step_id': "step_1", 'caldera_ability_ids': child_ids
+        }
+
+    # The embedded playbook is converted again once it changes
+    child = make_test_playbook("child", [])
+    child['description'] = "Changed"
+    write_test_playbook("playbooks/child", child)
+    import_playbooks(["parent.json"], sidecar_index=True)
+    assert len(list_ability_files()) == 10
+
+def test_import_playbooks_embedded_file_name(
+    tmp_path,
+    monkeypatch,
+    make_test_playbook,
+    write_test_playbook,
+    list_ability_files
+    ) -> None:
+    """
+    Test that an embedded playbook is indexed under the name of its file
+    rather than its id, so that it's resolved from its index though the two
+    differ
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_playbook("playbooks/child v2", make_test_playbook("child", []))
+    write_test_playbook(
+        "parent.json", make_test_playbook("parent", ["child v2"])
+    )
+
+    [result] = import_playbooks(["parent.json"], sidecar_index=True)
+    assert result['error'] is None
+    assert os.path.exists(index_path("child v2"))
+    assert not os.path.exists(index_path("child"))
+    assert len(list_ability_files()) == 4
+
+    [result] = import_playbooks(["parent.json"], sidecar_index=True)
+    assert result['error'] is None
+    assert len(list_ability_files()) == 6
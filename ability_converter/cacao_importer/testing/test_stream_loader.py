@@ -0,0 +1,121 @@
+"""
+Module to test the stream_loader.py module
+"""
+import io
+import json
+import os
+import tracemalloc
+
+import pytest
+import yaml
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer import stream_loader
+from ability_converter.cacao_importer.construct_abilities import CacaoPlaybook
+from ability_converter.cacao_importer.import_playbooks import convert_playbook
+
+TEST_PLAYBOOK_PATH: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..",
+    "test_playbooks", "IncidentResponder.json"
+)
+
+def test_decode_value_across_chunks() -> None:
+    """
+    Test that JsonStreamReader decodes values split across many chunks,
+    including numbers ending at the end of a chunk
+    """
+    document = {
+        'number': 1234567,
+        'text': "x" * 100,
+        'nested': {'list': [1, 2.5, None, True, "a,b}"]},
+        'empty': {}
+    }
+    reader = stream_loader.JsonStreamReader(
+        io.StringIO(json.dumps(document, indent=2)), chunk_size=3
+    )
+    decoded = {key: reader.decode_value() for key in reader.iter_object_keys()}
+
+    assert decoded == document
+
+def test_decode_value_malformed() -> None:
+    """
+    Test that JsonStreamReader raises JSONDecodeError for a truncated document
+    """
+    reader = stream_loader.JsonStreamReader(
+        io.StringIO('{"workflow": {"step": {"type": "st'), chunk_size=4
+    )
+    with pytest.raises(json.JSONDecodeError):
+        for _ in reader.iter_object_keys():
+            reader.decode_value()
+
+def test_load_playbook_attributes() -> None:
+    """
+    Test that the attributes of a playbook are loaded without its workflow and
+    the workflow steps are iterated over in order
+    """
+    with open(TEST_PLAYBOOK_PATH) as file:
+        playbook = json.loads(file.read())
+
+    attributes = stream_loader.load_playbook_attributes(TEST_PLAYBOOK_PATH)
+    assert attributes == {**playbook, 'workflow': {}}
+    assert list(
+        stream_loader.iter_workflow_steps(TEST_PLAYBOOK_PATH)
+    ) == list(playbook['workflow'].items())
+
+def test_streamed_conversion(tmp_path, monkeypatch) -> None:
+    """
+    Test that a streamed conversion gives the same profile and sources as a
+    conversion of the whole playbook
+    """
+    monkeypatch.chdir(tmp_path)
+    contents = {}
+    for streaming in (False, True):
+        result = convert_playbook(
+            TEST_PLAYBOOK_PATH, deterministic_ids=True, streaming=streaming
+        )
+        with open(f"data/adversaries/{result['caldera_id']}.yml") as file:
+            profile = yaml.safe_load(file)
+        with open(f"data/sources/{os.listdir('data/sources')[0]}") as file:
+            sources = yaml.safe_load(file)
+        contents[streaming] = (profile, sources)
+
+    assert contents[True] == contents[False]
+
+def test_streamed_conversion_memory(tmp_path, monkeypatch) -> None:
+    """
+    Test that the memory used by a streamed conversion is bounded by the size
+    of a workflow step rather than the size of the playbook
+    """
+    monkeypatch.chdir(tmp_path)
+    number_of_steps = 200
+    command = "x" * 50000
+    workflow = {'step_0': {'type': "start", 'on_completion': "step_1"}}
+    for index in range(1, number_of_steps):
+        workflow[f"step_{index}"] = {
+            'type': "single",
+            'name': f"Step {index}",
+            'description': "",
+            'timeout': 0,
+            'on_completion': f"step_{index + 1}",
+            'commands': [{'type': "manual", 'command': command}],
+        }
+    workflow[f"step_{number_of_steps}"] = {'type': "end"}
+    with open("large_playbook.json", 'w') as file:
+        file.write(json.dumps({
+            'id': "Large Playbook",
+            'name': "Large Playbook",
+            'description': "",
+            'playbook_variables': {},
+            'workflow_start': "step_0",
+            'workflow': workflow,
+        }))
+    playbook_size = os.path.getsize("large_playbook.json")
+
+    tracemalloc.start()
+    playbook = CacaoPlaybook("large_playbook.json", streaming=True)
+    playbook.convert_workflow_steps()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert len(playbook.ability_writer.file_names) == number_of_steps + 1
+    assert peak < playbook_size / 10
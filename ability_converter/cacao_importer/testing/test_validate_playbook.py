@@ -0,0 +1,168 @@
+"""
+Module to test the validate_playbook.py module
+"""
+import json
+import os
+
+from copy import deepcopy
+
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.benchmarks.generate_playbook import (
+    default_parameters, generate_playbooks, write_playbooks
+)
+from ability_converter.cacao_importer import import_playbooks
+from ability_converter.cacao_importer.validate_playbook import (
+    PlaybookValidationError, default_limits, validate_playbook,
+    validate_streamed_playbook
+)
+
+TEST_PLAYBOOK_PATH: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "..",
+    "test_playbooks", "SuperSpy.json"
+)
+
+with open(TEST_PLAYBOOK_PATH) as test_playbook_file:
+    TEST_PLAYBOOK = json.load(test_playbook_file)
+
+# A playbook generated with branching steps and every command type
+GENERATED_PLAYBOOK = next(iter(generate_playbooks(
+    default_parameters(steps=200, seed=7)
+).values()))
+
+def test_validate_playbook() -> None:
+    """
+    Test that valid playbooks are accepted, giving their workflow graph
+    """
+    for playbook in (TEST_PLAYBOOK, GENERATED_PLAYBOOK):
+        graph = validate_playbook(playbook)
+        assert graph.step_ids == list(playbook['workflow'])
+        assert graph.step_order()[0] == playbook['workflow_start']
+
+def test_validate_playbook_collects_errors() -> None:
+    """
+    Test that every error in a playbook is reported together, giving where
+    in the playbook each error is
+    """
+    playbook = deepcopy(TEST_PLAYBOOK)
+    del playbook['name']
+    steps = iter(playbook['workflow'].items())
+    start_id, _ = next(steps)
+    single_id, single_step = next(
+        (step_id, step) for step_id, step in steps
+        if step['type'] == "single"
+    )
+    single_step['in_args'] = "not a list"
+    single_step['commands'] = [{'type': "manual"}]
+    playbook['workflow'][start_id]['type'] = "unknown"
+    with pytest.raises(PlaybookValidationError) as error:
+        validate_playbook(playbook, source="test.json")
+
+    assert error.value.errors == [
+        "name: is missing",
+        f"workflow.{start_id}.type: unknown Workflow Step Type 'unknown'",
+        f"workflow.{single_id}.in_args: expected a list of strings",
+    ]
+    assert str(error.value).startswith("test.json is not a valid playbook:")
+
+    del single_step['in_args']
+    with pytest.raises(PlaybookValidationError) as error:
+        validate_playbook(playbook)
+    assert f"workflow.{single_id}.commands.0.command: is missing" in (
+        error.value.errors
+    )
+
+def test_validate_playbook_missing_steps() -> None:
+    """
+    Test that steps leading to a step missing from the workflow, and a
+    missing start step, are reported
+    """
+    playbook = deepcopy(TEST_PLAYBOOK)
+    step_id, step = next(
+        (step_id, step) for step_id, step in playbook['workflow'].items()
+        if 'on_completion' in step
+    )
+    step['on_completion'] = "missing_step"
+    playbook['workflow_start'] = "missing_start"
+    with pytest.raises(PlaybookValidationError) as error:
+        validate_playbook(playbook)
+
+    assert error.value.errors == [
+        f"workflow.{step_id}: refers to the missing step 'missing_step'",
+        "workflow_start: refers to the missing step 'missing_start'",
+    ]
+
+def test_validate_playbook_limits() -> None:
+    """
+    Test that playbooks with too many steps or too long commands are
+    rejected, and that unknown limits can't be given
+    """
+    with pytest.raises(PlaybookValidationError, match="more than 10 steps"):
+        validate_playbook(GENERATED_PLAYBOOK, default_limits(max_steps=10))
+    with pytest.raises(PlaybookValidationError, match="longer than 8"):
+        validate_playbook(
+            GENERATED_PLAYBOOK, default_limits(max_command_size=8)
+        )
+    with pytest.raises(TypeError):
+        default_limits(max_stepz=10)
+
+def test_validate_streamed_playbook(tmp_path) -> None:
+    """
+    Test that a playbook read one workflow step at a time is checked in the
+    same way
+    """
+    playbook = deepcopy(GENERATED_PLAYBOOK)
+    path = tmp_path / "playbook.json"
+    path.write_text(json.dumps(playbook))
+    attributes = {**playbook, 'workflow': {}}
+    graph = validate_streamed_playbook(str(path), attributes)
+    assert graph.step_order() == validate_playbook(playbook).step_order()
+
+    playbook['workflow']['step_1']['delay'] = -1
+    path.write_text(json.dumps(playbook))
+    with pytest.raises(
+        PlaybookValidationError,
+        match="step_1.delay: expected a non-negative integer"
+    ):
+        validate_streamed_playbook(str(path), attributes)
+
+def test_import_playbooks_check_only(tmp_path, monkeypatch) -> None:
+    """
+    Test that checking playbooks reports the invalid playbooks without
+    writing any file
+    """
+    monkeypatch.chdir(tmp_path)
+    invalid_path = tmp_path / "invalid.json"
+    invalid_path.write_text(json.dumps({**TEST_PLAYBOOK, 'workflow': []}))
+    results = import_playbooks.import_playbooks(
+        [TEST_PLAYBOOK_PATH, str(invalid_path)], check_only=True
+    )
+
+    assert results[0]['error'] is None
+    assert results[0]['playbook_id'] == TEST_PLAYBOOK['id']
+    assert "workflow: expected an object" in results[1]['error']
+    assert os.listdir(tmp_path) == ["invalid.json"]
+
+def test_import_playbooks_max_depth(tmp_path, monkeypatch) -> None:
+    """
+    Test that a playbook embedding playbooks more deeply than the limit
+    fails to import before any of its files are written
+    """
+    monkeypatch.chdir(tmp_path)
+    path = write_playbooks(default_parameters(
+        steps=40, nesting_depth=3, playbook_steps=0.5, nested_steps=10,
+        seed=1
+    ), "generated")
+    results = import_playbooks.import_playbooks(
+        [path], limits=default_limits(max_depth=2)
+    )
+    assert "embedded more than 2 playbooks deep" in results[0]['error']
+    assert not [
+        file_names for _, _, file_names in os.walk("data") if file_names
+    ]
+
+    results = import_playbooks.import_playbooks(
+        [path], limits=default_limits(max_depth=3)
+    )
+    assert results[0]['error'] is None
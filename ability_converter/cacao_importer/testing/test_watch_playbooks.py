@@ -0,0 +1,77 @@
+"""
+Module to test the watch_playbooks.py module
+"""
+import queue
+import shutil
+import threading
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer.watch_playbooks import PlaybookWatcher
+from ability_converter.output_sink import MemorySink
+
+def test_convert_playbooks_skips_unchanged(
+    tmp_path, test_playbook_paths
+    ) -> None:
+    """
+    Test that a playbook is only converted again once its contents change,
+    and that a playbook which failed is retried
+    """
+    playbook_path = str(tmp_path / "playbook.json")
+    shutil.copy(test_playbook_paths[0], playbook_path)
+    (tmp_path / "broken.json").write_text("{")
+    sink = MemorySink()
+
+    with PlaybookWatcher(str(tmp_path), sink=sink) as playbook_watcher:
+        first_results = playbook_watcher.convert_playbooks(
+            playbook_watcher.watcher.list_files()
+        )
+        second_results = playbook_watcher.convert_playbooks(
+            playbook_watcher.watcher.list_files()
+        )
+        with open(playbook_path, 'a') as file:
+            file.write("\n")
+        third_results = playbook_watcher.convert_playbooks([playbook_path])
+
+    assert [result['path'] for result in first_results] == [
+        str(tmp_path / "broken.json"), playbook_path
+    ]
+    assert first_results[0]['error'] is not None
+    assert first_results[1]['error'] is None
+    assert [result['path'] for result in second_results] == [
+        str(tmp_path / "broken.json")
+    ]
+    assert [result['path'] for result in third_results] == [playbook_path]
+    assert (
+        f"data/adversaries/{third_results[0]['caldera_id']}.yml" in sink.files
+    )
+
+def test_run_converts_new_playbooks(tmp_path, test_playbook_paths) -> None:
+    """
+    Test that a running watcher converts the playbooks in the directory and
+    those added later, until it's stopped
+    """
+    shutil.copy(test_playbook_paths[0], tmp_path / "first.json")
+    results = queue.Queue()
+    stop_event = threading.Event()
+
+    with PlaybookWatcher(
+        str(tmp_path), debounce=0.05, polling=True, poll_interval=0.01,
+        sink=MemorySink()
+    ) as playbook_watcher:
+        runner = threading.Thread(
+            target=playbook_watcher.run, args=(results.put, stop_event)
+        )
+        runner.start()
+        try:
+            assert results.get(timeout=10)['path'] == str(
+                tmp_path / "first.json"
+            )
+            shutil.copy(test_playbook_paths[1], tmp_path / "second.json")
+            second_result = results.get(timeout=10)
+        finally:
+            stop_event.set()
+            runner.join()
+
+    assert second_result['path'] == str(tmp_path / "second.json")
+    assert second_result['error'] is None
+    assert results.empty()
@@ -0,0 +1,126 @@
+"""
+Module to test the workflow_graph.py module
+"""
+from typing import Dict
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.cacao_importer.cacao_types import WorkflowStep
+from ability_converter.cacao_importer.workflow_graph import (
+    branch_step_ids, compile_workflow, next_step_ids
+)
+
+# A workflow with a step of each Workflow Step Type, branching back to
+# earlier steps
+TEST_WORKFLOW: Dict[str, WorkflowStep] = {
+    "step_01": {'type': "start", 'on_completion': "step_02"},
+    "step_02": {
+        'type': "single", 'on_success': "step_03", 'on_failure': "step_02"
+    },
+    "step_03": {'type': "single", 'on_completion': "step_04"},
+    "step_04": {
+        'type': "playbook", 'on_success': "step_05", 'on_failure': "step_09"
+    },
+    "step_05": {
+        'type': "parallel",
+        'on_completion': "step_08",
+        'next_steps': ["step_02", "step_04"],
+    },
+    "step_06": {
+        'type': "if-condition",
+        'on_completion': "step_07",
+        'on_true': ["step_02", "step_03"],
+        'on_false': ["step_04", "step_05"],
+    },
+    "step_07": {
+        'type': "while-condition",
+        'on_success': "step_08",
+        'on_failure': "step_09",
+        'on_true': ["step_02"],
+        'on_false': "step_09",
+    },
+    "step_08": {
+        'type': "switch-condition",
+        'on_completion': "step_09",
+        'cases': {
+            "1": ["step_06"],
+            "2": ["step_02", "step_04"],
+            "default": ["step_03"],
+        },
+    },
+    "step_09": {'type': "end"},
+}
+
+# A workflow with two parallel branches joining before the end, a loop, a
+# step which can't be reached and an edge to a step which doesn't exist
+TEST_PARALLEL_WORKFLOW: Dict[str, WorkflowStep] = {
+    "join": {'type': "single", 'on_completion': "loop"},
+    "start": {'type': "start", 'on_completion': "parallel"},
+    "parallel": {'type': "parallel", 'next_steps': ["first", "second"]},
+    "unreachable": {'type': "single", 'on_completion': "missing"},
+    "second": {'type': "single", 'on_completion': "join"},
+    "first": {'type': "single", 'on_completion': "join"},
+    "loop": {
+        'type': "while-condition", 'on_true': ["join"], 'on_false': "end"
+    },
+    "end": {'type': "end"},
+}
+
+def test_branch_step_ids() -> None:
+    """
+    Test that the steps on the branches of each Workflow Step Type which
+    branches are given in order, and no steps for any other type
+    """
+    assert branch_step_ids(TEST_WORKFLOW['step_05']) == ['step_02', 'step_04']
+    assert branch_step_ids(TEST_WORKFLOW['step_06']) == [
+        'step_02', 'step_03', 'step_04', 'step_05'
+    ]
+    assert branch_step_ids(TEST_WORKFLOW['step_07']) == ['step_02', 'step_09']
+    assert branch_step_ids(TEST_WORKFLOW['step_08']) == [
+        'step_06', 'step_02', 'step_04', 'step_03'
+    ]
+    assert branch_step_ids(TEST_WORKFLOW['step_02']) == []
+
+def test_compile_workflow() -> None:
+    """
+    Test that the adjacency arrays of a compiled workflow give the next steps
+    of each step in order
+    """
+    graph = compile_workflow(TEST_WORKFLOW, "step_01")
+    assert graph.step_ids == list(TEST_WORKFLOW)
+    for index, step_id in enumerate(graph.step_ids):
+        assert [
+            graph.step_ids[target] for target in graph.next_steps(index)
+        ] == next_step_ids(TEST_WORKFLOW[step_id])
+    assert graph.missing_edges == []
+    assert graph.unreachable_step_ids() == []
+
+def test_step_order() -> None:
+    """
+    Test that steps are ordered for execution, after every step leading to
+    them other than those looping back, keeping the order of branches, and
+    followed by the steps which can't be reached
+    """
+    graph = compile_workflow(TEST_PARALLEL_WORKFLOW, "start")
+    assert graph.step_order() == [
+        "start", "parallel", "first", "second", "join", "loop", "end",
+        "unreachable"
+    ]
+    assert graph.unreachable_step_ids() == ["unreachable"]
+    assert graph.missing_edges == [("unreachable", "missing")]
+
+def test_step_order_long_workflow() -> None:
+    """
+    Test that a workflow much longer than the recursion limit is ordered
+    """
+    number_of_steps = 20000
+    workflow = {
+        f"step_{index}": {
+            'type': "single", 'on_completion': f"step_{index + 1}"
+        }
+        for index in range(number_of_steps)
+    }
+    workflow[f"step_{number_of_steps}"] = {'type': "end"}
+    graph = compile_workflow(dict(reversed(workflow.items())), "step_0")
+    assert graph.step_order() == [
+        f"step_{index}" for index in range(number_of_steps + 1)
+    ]
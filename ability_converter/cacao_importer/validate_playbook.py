@@ -0,0 +1,413 @@
+"""
+Module for validating a Cacao playbook before it's converted
+
+A malformed playbook would otherwise only fail part way through its
+conversion, on the first attribute missing or of the wrong shape. The
+playbook is instead checked in full before any file is written, and every
+error found is reported together, along with where in the playbook it is.
+
+The checks of the attributes of each Workflow Step Type are compiled once
+into a table, so that checking a step takes a lookup and a few type checks.
+Limits on the number of workflow steps, the depth of embedded playbooks and
+the size of commands reject pathological playbooks before they're converted.
+"""
+from collections.abc import Mapping
+from typing import (
+    Any, Callable, Dict, Iterable, List, Optional, Tuple, TypedDict
+)
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.cacao_importer.cacao_types import (
+    CacaoPlaybookAttributes, CommandData, WorkflowStep
+)
+from ability_converter.cacao_importer.compact_objects import load_compact
+from ability_converter.cacao_importer.stream_loader import (
+    iter_workflow_steps, load_playbook_attributes
+)
+from ability_converter.cacao_importer.workflow_graph import (
+    WorkflowGraph, next_step_ids
+)
+from ability_converter.caldera_library import CalderaLibrary
+
+# Constant defining the most workflow steps a playbook may have by default
+DEFAULT_MAX_STEPS = 1000000
+
+# Constant defining the most levels of playbooks which may be embedded below
+# a playbook by default
+DEFAULT_MAX_DEPTH = 16
+
+# Constant defining the most characters a command may have by default
+DEFAULT_MAX_COMMAND_SIZE = 1024 * 1024
+
+# Constant defining the most errors given in the message of a
+# PlaybookValidationError, which holds every error found
+MAX_REPORTED_ERRORS = 20
+
+# A check of an attribute: whether the attribute is required, whether its
+# value is valid and a description of the values expected
+AttributeCheck = Tuple[bool, Callable[[Any], bool], str]
+
+# The (attribute, check) pairs of the attributes of a Workflow Step Type
+CompiledChecks = Tuple[Tuple[str, AttributeCheck], ...]
+
+
+class ValidationLimits(TypedDict):
+    """Class defining the limits on the size of a playbook"""
+    # The most workflow steps of a playbook
+    max_steps: int
+    # The most levels of playbooks embedded below a playbook
+    max_depth: int
+    # The most characters of each command
+    max_command_size: int
+
+
+def default_limits(**limits: int) -> ValidationLimits:
+    """Return the default validation limits updated with those given"""
+    defaults: ValidationLimits = {
+        'max_steps': DEFAULT_MAX_STEPS,
+        'max_depth': DEFAULT_MAX_DEPTH,
+        'max_command_size': DEFAULT_MAX_COMMAND_SIZE,
+    }
+    unknown: List[str] = sorted(set(limits) - set(defaults))
+    if unknown:
+        raise TypeError(f"Unknown validation limits: {', '.join(unknown)}")
+    return {**defaults, **limits}
+
+
+class PlaybookValidationError(ValueError):
+    """Exception raised when a playbook isn't valid, giving every error"""
+
+    def __init__(self, source: str, errors: List[str]) -> None:
+        """Initialise PlaybookValidationError with the errors found"""
+        self.errors: List[str] = errors
+        reported: List[str] = errors[:MAX_REPORTED_ERRORS]
+        if len(errors) > len(reported):
+            reported.append(f"and {len(errors) - len(reported)} more errors")
+        super().__init__(
+            f"{source} is not a valid playbook:"
+            + "".join(f"\n  {error}" for error in reported)
+        )
+
+
+def is_string(value: Any) -> bool:
+    """Return whether a value is a string"""
+    return isinstance(value, str)
+
+
+def is_count(value: Any) -> bool:
+    """Return whether a value is a non-negative integer"""
+    return isinstance(value, int) and not isinstance(value, bool) and (
+        value >= 0
+    )
+
+
+def is_object(value: Any) -> bool:
+    """Return whether a value is a JSON object"""
+    return isinstance(value, Mapping)
+
+
+def is_string_list(value: Any) -> bool:
+    """Return whether a value is a list of strings"""
+    return isinstance(value, list) and all(
+        isinstance(item, str) for item in value
+    )
+
+
+def is_step_ids(value: Any) -> bool:
+    """Return whether a value is a step id or a list of step ids"""
+    return isinstance(value, str) or is_string_list(value)
+
+
+def is_object_list(value: Any) -> bool:
+    """Return whether a value is a list of JSON objects"""
+    return isinstance(value, list) and all(
+        isinstance(item, Mapping) for item in value
+    )
+
+
+def is_cases(value: Any) -> bool:
+    """Return whether a value maps each case to a list of step ids"""
+    return isinstance(value, Mapping) and all(
+        is_string_list(step_ids) for step_ids in value.values()
+    )
+
+
+# Constant defining the checks of the attributes of a playbook, other than of
+# its workflow steps
+PLAYBOOK_CHECKS: Dict[str, AttributeCheck] = {
+    'id': (True, is_string, "a string"),
+    'name': (True, is_string, "a string"),
+    'description': (True, is_string, "a string"),
+    'playbook_variables': (True, is_object, "an object"),
+    'workflow_start': (True, is_string, "a step id"),
+    'workflow': (True, is_object, "an object"),
+}
+
+# Constant defining the checks of the attributes of every workflow step
+COMMON_STEP_CHECKS: Dict[str, AttributeCheck] = {
+    'name': (False, is_string, "a string"),
+    'description': (False, is_string, "a string"),
+    'delay': (False, is_count, "a non-negative integer"),
+    'timeout': (False, is_count, "a non-negative integer"),
+    'step_variables': (False, is_object, "an object"),
+    'on_completion': (False, is_string, "a step id"),
+    'on_success': (False, is_string, "a step id"),
+    'on_failure': (False, is_string, "a step id"),
+    'in_args': (False, is_string_list, "a list of strings"),
+    'out_args': (False, is_string_list, "a list of strings"),
+}
+
+# Constant defining the checks of the attributes of each Workflow Step Type,
+# in addition to or in place of the checks common to every step
+STEP_TYPE_CHECKS: Dict[str, Dict[str, AttributeCheck]] = {
+    "start": {},
+    "end": {},
+    "single": {
+        'name': (True, is_string, "a string"),
+        'description': (True, is_string, "a string"),
+        'commands': (True, is_object_list, "a list of commands"),
+    },
+    "playbook": {
+        'playbook_id': (True, is_string, "a playbook id"),
+    },
+    "parallel": {
+        'next_steps': (True, is_string_list, "a list of step ids"),
+    },
+    "if-condition": {
+        'on_true': (True, is_string_list, "a list of step ids"),
+        'on_false': (False, is_string_list, "a list of step ids"),
+    },
+    "while-condition": {
+        'on_true': (True, is_string_list, "a list of step ids"),
+        'on_false': (False, is_step_ids, "a step id or list of step ids"),
+    },
+    "switch-condition": {
+        'cases': (True, is_cases, "an object of lists of step ids"),
+    },
+}
+
+
+def compile_step_checks() -> Dict[str, CompiledChecks]:
+    """
+    Compile the checks of the attributes of each Workflow Step Type into a
+    single table, giving the (attribute, check) pairs of each type
+    """
+    return {
+        step_type: tuple({**COMMON_STEP_CHECKS, **type_checks}.items())
+        for step_type, type_checks in STEP_TYPE_CHECKS.items()
+    }
+
+
+# Constant defining the compiled checks of each Workflow Step Type
+STEP_CHECKS: Dict[str, CompiledChecks] = compile_step_checks()
+
+
+class PlaybookValidator:
+    """
+    Class object checking a playbook and its workflow steps, collecting every
+    error found, and compiling the workflow graph as the steps are checked
+    """
+
+    def __init__(
+        self,
+        limits: Optional[ValidationLimits] = None,
+        library: Optional[CalderaLibrary] = None
+        ) -> None:
+        """
+        Initialise PlaybookValidator class. If a library is given, the
+        abilities referred to by attack-cmd commands must be in it
+        """
+        self.limits: ValidationLimits = limits or default_limits()
+        self.library: Optional[CalderaLibrary] = library
+        self.errors: List[str] = []
+        self.graph = WorkflowGraph()
+
+    def check_attributes(
+        self,
+        location: str,
+        contents: Any,
+        checks: Iterable[Tuple[str, AttributeCheck]]
+        ) -> None:
+        """
+        Check the attributes of an object against the (attribute, check)
+        pairs given, where location is the path to the object in the
+        playbook
+        """
+        for attribute, (required, is_valid, expected) in checks:
+            value: Any = contents.get(attribute)
+            if value is None:
+                if required:
+                    self.errors.append(f"{location}{attribute}: is missing")
+            elif not is_valid(value):
+                self.errors.append(
+                    f"{location}{attribute}: expected {expected}"
+                )
+
+    def check_playbook(self, playbook: CacaoPlaybookAttributes) -> None:
+        """Check the attributes of a playbook other than its workflow"""
+        if not isinstance(playbook, Mapping):
+            self.errors.append("expected a JSON object")
+            return
+        self.check_attributes("", playbook, PLAYBOOK_CHECKS.items())
+
+    def check_command(
+        self,
+        location: str,
+        command: CommandData
+        ) -> None:
+        """Check a command of a workflow step of type single"""
+        command_type: Any = command.get('type')
+        if not isinstance(command_type, str):
+            self.errors.append(f"{location}type: expected a string")
+            return
+        command_value: Any = command.get('command')
+        if command_value is None:
+            command_value = command.get('command_b64')
+        if command_value is None:
+            self.errors.append(f"{location}command: is missing")
+        elif command_type == "attack-cmd":
+            # The command of an attack-cmd gives the id of a Caldera ability
+            if not (isinstance(command_value, Mapping)
+                    and isinstance(command_value.get('id'), str)):
+                self.errors.append(
+                    f"{location}command: expected an object with an id"
+                )
+            elif (self.library is not None
+                  and self.library.ability(command_value['id']) is None):
+                self.errors.append(
+                    f"{location}command: refers to the unknown ability "
+                    f"{command_value['id']!r}"
+                )
+        elif not isinstance(command_value, str):
+            self.errors.append(f"{location}command: expected a string")
+        elif len(command_value) > self.limits['max_command_size']:
+            self.errors.append(
+                f"{location}command: longer than "
+                f"{self.limits['max_command_size']} characters"
+            )
+
+    def check_step(self, step_id: str, step: WorkflowStep) -> None:
+        """Check a workflow step, adding it to the workflow graph"""
+        location: str = f"workflow.{step_id}."
+        if not isinstance(step, Mapping):
+            self.errors.append(f"{location[:-1]}: expected an object")
+            return
+        if len(self.graph.step_ids) >= self.limits['max_steps']:
+            if len(self.graph.step_ids) == self.limits['max_steps']:
+                self.errors.append(
+                    f"workflow: more than {self.limits['max_steps']} steps"
+                )
+            # Count the steps beyond the limit without checking them
+            self.graph.add_step(step_id, [])
+            return
+        step_type: Any = step.get('type')
+        checks: Optional[CompiledChecks] = (
+            STEP_CHECKS.get(step_type) if isinstance(step_type, str) else None
+        )
+        if checks is None:
+            self.errors.append(
+                f"{location}type: is missing" if step_type is None
+                else f"{location}type: unknown Workflow Step Type "
+                f"{step_type!r}"
+            )
+            self.graph.add_step(step_id, [])
+            return
+        errors: int = len(self.errors)
+        self.check_attributes(location, step, checks)
+        if step['type'] == "single" and len(self.errors) == errors:
+            for index, command in enumerate(step['commands']):
+                self.check_command(f"{location}commands.{index}.", command)
+        # The edges of a step with malformed attributes can't be read
+        self.graph.add_step(
+            step_id, next_step_ids(step) if len(self.errors) == errors else []
+        )
+
+    def check_graph(self, start_step_id: Optional[str]) -> WorkflowGraph:
+        """
+        Compile the workflow graph of the steps checked and check that every
+        step they lead to, and the start step, are in the workflow
+        """
+        self.graph.compile(start_step_id)
+        for step_id, next_step_id in self.graph.missing_edges:
+            self.errors.append(
+                f"workflow.{step_id}: refers to the missing step "
+                f"{next_step_id!r}"
+            )
+        if isinstance(start_step_id, str) and self.graph.start is None:
+            self.errors.append(
+                f"workflow_start: refers to the missing step {start_step_id!r}"
+            )
+        return self.graph
+
+    def raise_errors(self, source: str) -> None:
+        """Raise a PlaybookValidationError if any error has been found"""
+        if self.errors:
+            raise PlaybookValidationError(source, self.errors)
+
+
+def validate_playbook(
+    playbook: CacaoPlaybookAttributes,
+    limits: Optional[ValidationLimits] = None,
+    source: str = "Playbook",
+    library: Optional[CalderaLibrary] = None
+    ) -> WorkflowGraph:
+    """
+    Check a playbook, raising a PlaybookValidationError giving every error
+    found if it isn't valid, and return its compiled workflow graph. If a
+    library is given, attack-cmd commands are checked against it
+    """
+    validator = PlaybookValidator(limits, library)
+    validator.check_playbook(playbook)
+    if is_object(playbook):
+        if is_object(playbook.get('workflow')):
+            for step_id, step in playbook['workflow'].items():
+                validator.check_step(step_id, step)
+        validator.check_graph(playbook.get('workflow_start'))
+    validator.raise_errors(source)
+    return validator.graph
+
+
+def validate_streamed_playbook(
+    path_to_file: str,
+    playbook: CacaoPlaybookAttributes,
+    limits: Optional[ValidationLimits] = None,
+    library: Optional[CalderaLibrary] = None
+    ) -> WorkflowGraph:
+    """
+    Check a playbook loaded without its workflow, reading its workflow steps
+    from the playbook file one at a time, raising a PlaybookValidationError
+    giving every error found if it isn't valid, and return its compiled
+    workflow graph. If a library is given, attack-cmd commands are checked
+    against it
+    """
+    validator = PlaybookValidator(limits, library)
+    validator.check_playbook(playbook)
+    for step_id, step in iter_workflow_steps(path_to_file):
+        validator.check_step(step_id, step)
+    validator.check_graph(playbook.get('workflow_start'))
+    validator.raise_errors(path_to_file)
+    return validator.graph
+
+
+def check_playbook_file(
+    path_to_file: str,
+    streaming: bool = False,
+    limits: Optional[ValidationLimits] = None,
+    library: Optional[CalderaLibrary] = None
+    ) -> CacaoPlaybookAttributes:
+    """
+    Load and check the playbook at path_to_file without converting it,
+    raising a PlaybookValidationError giving every error found if it isn't
+    valid, and return the playbook, without its workflow if streaming. If a
+    library is given, attack-cmd commands are checked against it
+    """
+    if streaming:
+        playbook: CacaoPlaybookAttributes = (
+            load_playbook_attributes(path_to_file)
+        )
+        validate_streamed_playbook(path_to_file, playbook, limits, library)
+    else:
+        with open(path_to_file) as file:
+            playbook = load_compact(file)
+        validate_playbook(playbook, limits, path_to_file, library)
+    return playbook
@@ -0,0 +1,138 @@
+"""
+Module for converting the Cacao playbooks dropped into a directory as they
+arrive, in a single long-running process
+
+The playbooks already in the directory are converted on start, then every
+playbook added or changed is converted once the directory has been quiet for
+a moment. A playbook whose contents are the same as when it was last
+converted isn't converted again. The cache of embedded playbooks, the writer
+threads and the output sink are kept between conversions, so an embedded
+playbook is only converted again once its contents change.
+"""
+import threading
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.background_writer import (
+    DEFAULT_WRITER_THREADS, BackgroundWriter
+)
+from ability_converter.cacao_importer.ability_store import AbilityStore
+from ability_converter.cacao_importer.import_playbooks import (
+    ImportResult, convert_playbook
+)
+from ability_converter.cacao_importer.playbook_cache import (
+    PlaybookCache, hash_playbook_file
+)
+from ability_converter.directory_watcher import (
+    DEFAULT_DEBOUNCE_SECONDS, DEFAULT_POLL_INTERVAL, DirectoryWatcher,
+    open_watcher, wait_for_changes
+)
+from ability_converter.output_sink import DirectorySink, OutputSink
+
+# Constant defining the suffix of the playbook files watched
+PLAYBOOK_SUFFIX = ".json"
+
+# Constant defining how often a watcher checks whether it has been stopped
+STOP_CHECK_INTERVAL = 1.0
+
+
+class PlaybookWatcher:
+    """
+    Class object converting the playbooks added to or changed in a directory
+
+    The options are passed on to convert_playbook. As a bundle holds the
+    abilities of the embedded playbooks converted with its playbook, the
+    cache of embedded playbooks isn't kept between conversions when
+    bundling. When deduplicating abilities, the playbooks converted together
+    after a change share a store of abilities.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+        polling: bool = False,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        writer_threads: int = DEFAULT_WRITER_THREADS,
+        sink: Optional[OutputSink] = None,
+        dedupe_abilities: bool = False,
+        **options: Any
+        ) -> None:
+        """Initialise PlaybookWatcher class, starting to watch directory"""
+        self.debounce: float = debounce
+        self.dedupe_abilities: bool = dedupe_abilities
+        self.options: Dict[str, Any] = options
+        self.sink: OutputSink = sink or DirectorySink()
+        self.playbook_cache: PlaybookCache = PlaybookCache()
+        self.background_writer: Optional[BackgroundWriter] = (
+            BackgroundWriter(writer_threads) if writer_threads > 0 else None
+        )
+        # The hash of the contents of each playbook when it was last
+        # converted, keyed by path
+        self.content_hashes: Dict[str, str] = {}
+        self.watcher: DirectoryWatcher = open_watcher(
+            directory, PLAYBOOK_SUFFIX, polling, poll_interval
+        )
+
+    def convert_playbooks(self, paths: Iterable[str]) -> List[ImportResult]:
+        """
+        Convert each of the playbooks at the given paths whose contents
+        changed since it was last converted, returning the results
+        """
+        results: List[ImportResult] = []
+        ability_store: Optional[AbilityStore] = (
+            AbilityStore() if self.dedupe_abilities else None
+        )
+
+        # Bring the index of the Caldera library up to date with any changes
+        # made while waiting
+        if self.options.get('library') is not None:
+            self.options['library'].refresh()
+        for path in sorted(paths):
+            try:
+                content_hash: str = hash_playbook_file(path)
+            except OSError:
+                # The playbook was removed or moved away since it changed
+                continue
+            if self.content_hashes.get(path) == content_hash:
+                continue
+            result: ImportResult = convert_playbook(
+                path, playbook_cache=self.playbook_cache,
+                background_writer=self.background_writer, sink=self.sink,
+                ability_store=ability_store, **self.options
+            )
+            if result['error'] is None:
+                self.content_hashes[path] = content_hash
+            results.append(result)
+        return results
+
+    def run(
+        self,
+        report: Callable[[ImportResult], None],
+        stop_event: Optional[threading.Event] = None
+        ) -> None:
+        """
+        Convert the playbooks in the directory, then every playbook added or
+        changed until stop_event is set, reporting each result
+        """
+        for result in self.convert_playbooks(self.watcher.list_files()):
+            report(result)
+        while stop_event is None or not stop_event.is_set():
+            changed: Set[str] = wait_for_changes(
+                self.watcher, self.debounce, STOP_CHECK_INTERVAL
+            )
+            for result in self.convert_playbooks(changed):
+                report(result)
+
+    def close(self) -> None:
+        """Stop watching the directory and wait for the pending writes"""
+        self.watcher.close()
+        if self.background_writer is not None:
+            self.background_writer.close()
+
+    def __enter__(self) -> "PlaybookWatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,201 @@
+"""
+Module for compiling the workflow of a Cacao playbook into a graph
+
+The edges of a workflow are spread across the attributes of its steps: the
+branches of parallel and condition steps, and the next step on completion,
+success or failure of any step. Compiling the workflow reads them once,
+numbering the steps in the order given and holding the edges as adjacency
+arrays in compressed sparse row form: the next steps of step i are
+targets[offsets[i]:offsets[i + 1]], in the order in which they're converted.
+
+From the start step, the compiled graph precomputes which steps are reachable
+and the order in which they're executed, so that traversal, validation and
+the atomic ordering of the Caldera profile all take time linear in the size
+of the workflow.
+"""
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.cacao_importer.cacao_types import WorkflowStep
+
+# Constant defining the attributes of a workflow step which give the next
+# workflow step on completion, success or failure, in order of conversion
+WORKFLOW_STEP_TRANSITIONS: Tuple[str, ...] = (
+    "on_completion", "on_success", "on_failure"
+)
+
+# Constant defining, for each Workflow Step Type which branches, the attributes
+# giving the workflow steps on each branch, in order of conversion
+BRANCH_ATTRIBUTES: Dict[str, Tuple[str, ...]] = {
+    "parallel": ("next_steps",),
+    "if-condition": ("on_true", "on_false"),
+    "while-condition": ("on_true", "on_false"),
+    "switch-condition": ("cases",),
+}
+
+
+def branch_step_ids(step: WorkflowStep) -> List[str]:
+    """
+    Return the ids of the workflow steps on each branch of a workflow step
+    which branches, in order, and no ids for any other step
+    """
+    step_ids: List[str] = []
+    for attribute in BRANCH_ATTRIBUTES.get(step['type'], ()):
+        branch = step.get(attribute)
+        if branch is None:
+            continue
+        if isinstance(branch, str):
+            # The on_false branch of a while-condition is a single step
+            step_ids.append(branch)
+        elif attribute == "cases":
+            for case_step_ids in branch.values():
+                step_ids.extend(case_step_ids)
+        else:
+            step_ids.extend(branch)
+    return step_ids
+
+
+def next_step_ids(step: WorkflowStep) -> List[str]:
+    """
+    Return the ids of the workflow steps following a workflow step: those on
+    its branches, then those given for its completion, success or failure
+    """
+    step_ids: List[str] = branch_step_ids(step)
+    for attribute in WORKFLOW_STEP_TRANSITIONS:
+        if step.get(attribute) is not None:
+            step_ids.append(step[attribute])
+    return step_ids
+
+
+class WorkflowGraph:
+    """
+    Class object for a workflow compiled into integer step indexes and
+    adjacency arrays in compressed sparse row form
+
+    Steps are added in the order given, along with the ids of their next
+    steps, which may not have been added yet. Once every step has been added,
+    compiling the graph resolves those ids to indexes, recording the edges to
+    steps missing from the workflow, and orders the steps reachable from the
+    start step.
+    """
+
+    def __init__(self) -> None:
+        """Initialise WorkflowGraph class"""
+        # The id of each step, by index, and the index of each step id
+        self.step_ids: List[str] = []
+        self.indexes: Dict[str, int] = {}
+        self.offsets: array = array("i", [0])
+        self.targets: array = array("i")
+        # The ids of the next steps of every step, until compiled
+        self.target_ids: List[str] = []
+        # The (step id, next step id) edges to steps missing from the workflow
+        self.missing_edges: List[Tuple[str, str]] = []
+        self.start: Optional[int] = None
+        self.reachable: bytearray = bytearray()
+        # The indexes of the reachable steps in order of execution
+        self.execution_order: array = array("i")
+
+    def add_step(self, step_id: str, step_next_step_ids: List[str]) -> None:
+        """Add a workflow step and the ids of the steps following it"""
+        self.indexes[step_id] = len(self.step_ids)
+        self.step_ids.append(step_id)
+        self.target_ids.extend(step_next_step_ids)
+        self.offsets.append(len(self.target_ids))
+
+    def compile(self, start_step_id: Optional[str]) -> "WorkflowGraph":
+        """
+        Resolve the next steps added to step indexes, then find the steps
+        reachable from the start step and their order of execution
+        """
+        for source, step_id in enumerate(self.step_ids):
+            for target_id in self.target_ids[
+                self.offsets[source]:self.offsets[source + 1]
+            ]:
+                target: Optional[int] = self.indexes.get(target_id)
+                if target is None:
+                    self.missing_edges.append((step_id, target_id))
+                    # Keep the offsets of the edges, pointing the edge back
+                    # at its own step, which has been visited already
+                    target = source
+                self.targets.append(target)
+        self.target_ids = []
+        self.start = self.indexes.get(start_step_id)
+        self.order_steps()
+        return self
+
+    def next_steps(self, index: int) -> array:
+        """Return the indexes of the steps following the step at index"""
+        return self.targets[self.offsets[index]:self.offsets[index + 1]]
+
+    def order_steps(self) -> None:
+        """
+        Find the steps reachable from the start step and order them for
+        execution, so that each step comes after the steps leading to it,
+        other than those it loops back to, and the branches of a step keep
+        their order
+
+        The order is the reverse postorder of a depth first search which
+        visits the next steps of each step last to first, using an explicit
+        stack so that long workflows aren't bounded by the recursion limit.
+        """
+        self.reachable = bytearray(len(self.step_ids))
+        postorder: List[int] = []
+        if self.start is not None:
+            self.reachable[self.start] = 1
+            # The steps being visited and the position of the next edge of
+            # each to follow, counting down
+            stack: List[int] = [self.start]
+            positions: List[int] = [self.offsets[self.start + 1]]
+            while stack:
+                index: int = stack[-1]
+                position: int = positions[-1]
+                if position > self.offsets[index]:
+                    position -= 1
+                    positions[-1] = position
+                    target: int = self.targets[position]
+                    if not self.reachable[target]:
+                        self.reachable[target] = 1
+                        stack.append(target)
+                        positions.append(self.offsets[target + 1])
+                else:
+                    postorder.append(stack.pop())
+                    positions.pop()
+        postorder.reverse()
+        self.execution_order = array("i", postorder)
+
+    def step_order(self) -> List[str]:
+        """
+        Return the ids of the reachable steps in order of execution, followed
+        by those of any unreachable steps in the order given
+        """
+        return [
+            *(self.step_ids[index] for index in self.execution_order),
+            *self.unreachable_step_ids()
+        ]
+
+    def unreachable_step_ids(self) -> List[str]:
+        """Return the ids of the steps the start step doesn't lead to"""
+        return [
+            step_id for index, step_id in enumerate(self.step_ids)
+            if not self.reachable[index]
+        ]
+
+
+def compile_workflow(
+    workflow: Dict[str, WorkflowStep],
+    start_step_id: Optional[str]
+    ) -> WorkflowGraph:
+    """Compile the workflow of a playbook into a WorkflowGraph"""
+    graph = WorkflowGraph()
+    add_workflow_steps(graph, workflow.items())
+    return graph.compile(start_step_id)
+
+
+def add_workflow_steps(
+    graph: WorkflowGraph,
+    steps: Iterable[Tuple[str, WorkflowStep]]
+    ) -> None:
+    """Add the (step id, workflow step) pairs to a graph"""
+    for step_id, step in steps:
+        graph.add_step(step_id, next_step_ids(step))
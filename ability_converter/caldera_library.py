@@ -0,0 +1,292 @@
+"""
+Module for an index of the abilities, adversaries and sources of a Caldera
+installation
+
+The library of a Caldera installation is made of thousands of YAML files in
+data/ and in the data/ directory of each of its plugins. Rather than loading
+every file on each import, the id, name and technique of each object are
+kept in an index cached on disk, in .cacao_importer_library.json below the
+Caldera directory. The index is validated against the modification time and
+size of each file, so only the files added or changed since it was cached
+are loaded, and looking up an object by its id or name takes a dictionary
+lookup.
+"""
+import json
+import os
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple, TypedDict
+
+import yaml
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.atomic_file import write_file_atomic
+from ability_converter.instrumentation import span
+
+# Use the libyaml Loader if PyYAML was built with it
+try:
+    from yaml import CSafeLoader as Loader
+except ImportError: # pragma: no cover
+    from yaml import SafeLoader as Loader # type: ignore
+
+# Constant defining the name of the file caching the index, below the
+# Caldera directory
+CACHE_FILE_NAME = ".cacao_importer_library.json"
+
+# Constant defining the version of the cached index, changed whenever the
+# shape of its entries changes
+CACHE_VERSION = 2
+
+# Constant defining the prefix of the tag giving the id of the Cacao playbook
+# an adversary was generated from by the importer
+PLAYBOOK_TAG_PREFIX = "cacao-playbook:"
+
+# Constant defining the kinds of objects in the library, named after the
+# directories of data/ holding them
+LIBRARY_KINDS = ("abilities", "adversaries", "sources")
+
+
+class LibraryObject(TypedDict):
+    """Class defining an ability, adversary or source of the library"""
+    id: str
+    name: str
+    # The tactic and technique of an ability, empty for other objects
+    tactic: str
+    technique_id: str
+    technique_name: str
+    # The id of the Cacao playbook an adversary was generated from by the
+    # importer, empty for other objects
+    playbook_id: str
+    # The path of the file defining the object, below the Caldera directory
+    path: str
+
+
+class CachedFile(TypedDict):
+    """Class defining the objects of a file of the library, when loaded"""
+    kind: str
+    mtime_ns: int
+    size: int
+    objects: List[LibraryObject]
+
+
+def library_directories(root: str) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the (kind, path) pairs of the directories of the library of the
+    Caldera installation at root, including those of its plugins, where path
+    is relative to root
+    """
+    data_directories: List[str] = ["data"]
+    if os.path.isdir(os.path.join(root, "plugins")):
+        data_directories.extend(
+            f"plugins/{plugin}/data"
+            for plugin in sorted(os.listdir(os.path.join(root, "plugins")))
+        )
+    for data_directory in data_directories:
+        for kind in LIBRARY_KINDS:
+            path: str = f"{data_directory}/{kind}"
+            if os.path.isdir(os.path.join(root, path)):
+                yield kind, path
+
+
+def walk_yaml_files(
+    directory: str,
+    path: str
+    ) -> Iterator[Tuple[os.DirEntry, str]]:
+    """
+    Yield the entry of each YAML file below directory, along with its path
+    below the directory given by path
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_yaml_files(
+                    entry.path, f"{path}/{entry.name}"
+                )
+            elif entry.name.endswith(".yml") and entry.is_file():
+                yield entry, f"{path}/{entry.name}"
+
+
+def library_objects(
+    kind: str,
+    path: str,
+    contents: str
+    ) -> List[LibraryObject]:
+    """
+    Return the objects of the given kind defined by the contents of the file
+    at path, which may hold several documents and lists of objects
+    """
+    objects: List[LibraryObject] = []
+    for document in yaml.load_all(contents, Loader=Loader):
+        for caldera_object in (
+            document if isinstance(document, list) else [document]
+        ):
+            if not isinstance(caldera_object, dict):
+                continue
+            object_id: Any = (
+                caldera_object.get('adversary_id') or caldera_object.get('id')
+            )
+            if object_id is None:
+                continue
+            # Plugin abilities give their technique as an object instead
+            technique: Any = caldera_object.get('technique')
+            if not isinstance(technique, dict):
+                technique = {}
+            tags: Any = caldera_object.get('tags')
+            playbook_tags: List[str] = [
+                tag for tag in (tags if isinstance(tags, list) else [])
+                if isinstance(tag, str) and tag.startswith(PLAYBOOK_TAG_PREFIX)
+            ]
+            objects.append({
+                'id': str(object_id),
+                'name': str(caldera_object.get('name') or ""),
+                'tactic': str(caldera_object.get('tactic') or ""),
+                'technique_id': str(
+                    caldera_object.get('technique_id')
+                    or technique.get('attack_id') or ""
+                ),
+                'technique_name': str(
+                    caldera_object.get('technique_name')
+                    or technique.get('name') or ""
+                ),
+                'playbook_id': (
+                    playbook_tags[0][len(PLAYBOOK_TAG_PREFIX):]
+                    if playbook_tags else ""
+                ),
+                'path': path,
+            })
+    return objects
+
+
+class CalderaLibrary:
+    """
+    Class object indexing the abilities, adversaries and sources of the
+    Caldera installation at root by id, and its adversaries by name
+    """
+
+    def __init__(
+        self,
+        root: str = ".",
+        cache_path: Optional[str] = None
+        ) -> None:
+        """
+        Initialise CalderaLibrary class, loading the index cached at
+        cache_path, by default in the Caldera directory, and bringing it up
+        to date
+        """
+        self.root: str = root
+        self.cache_path: str = cache_path or os.path.join(
+            root, CACHE_FILE_NAME
+        )
+        self.files: Dict[str, CachedFile] = {}
+        try:
+            with open(self.cache_path) as file:
+                cache: Dict[str, Any] = json.load(file)
+            if cache.get('version') == CACHE_VERSION:
+                self.files = cache['files']
+        except (OSError, ValueError, KeyError):
+            # No usable cache, so every file is loaded
+            pass
+        self.objects: Dict[str, Dict[str, LibraryObject]] = {}
+        self.adversary_names: Dict[str, List[LibraryObject]] = {}
+        # The number of files loaded by the last refresh
+        self.loaded_count: int = 0
+        self.refresh()
+
+    def refresh(self) -> None:
+        """
+        Load the files of the library added or changed since the index was
+        cached, drop those removed, and cache the index again if it changed
+        """
+        with span("index_library"):
+            files: Dict[str, CachedFile] = {}
+            self.loaded_count = 0
+            for kind, directory in library_directories(self.root):
+                for entry, path in walk_yaml_files(
+                        os.path.join(self.root, directory), directory):
+                    stat: os.stat_result = entry.stat()
+                    cached_file: Optional[CachedFile] = self.files.get(path)
+                    if (cached_file is None
+                            or cached_file['kind'] != kind
+                            or cached_file['mtime_ns'] != stat.st_mtime_ns
+                            or cached_file['size'] != stat.st_size):
+                        cached_file = self.load_file(kind, entry.path, path)
+                        cached_file['mtime_ns'] = stat.st_mtime_ns
+                        cached_file['size'] = stat.st_size
+                        self.loaded_count += 1
+                    files[path] = cached_file
+            changed: bool = self.loaded_count > 0 or len(files) != len(
+                self.files
+            )
+            self.files = files
+            self.build_lookups()
+        if changed:
+            self.save()
+
+    def load_file(self, kind: str, file_name: str, path: str) -> CachedFile:
+        """Load the objects of the file of the library at file_name"""
+        objects: List[LibraryObject] = []
+        try:
+            with open(file_name) as file:
+                objects = library_objects(kind, path, file.read())
+        except (OSError, UnicodeDecodeError, yaml.YAMLError):
+            # A file Caldera couldn't load either defines no objects
+            pass
+        return {'kind': kind, 'mtime_ns': 0, 'size': 0, 'objects': objects}
+
+    def build_lookups(self) -> None:
+        """Index the objects of every file by kind and id, and by name"""
+        self.objects = {kind: {} for kind in LIBRARY_KINDS}
+        self.adversary_names = {}
+        for cached_file in self.files.values():
+            for library_object in cached_file['objects']:
+                self.objects[cached_file['kind']].setdefault(
+                    library_object['id'], library_object
+                )
+                if cached_file['kind'] == "adversaries":
+                    self.adversary_names.setdefault(
+                        library_object['name'], []
+                    ).append(library_object)
+
+    def save(self) -> None:
+        """Cache the index, unless the Caldera directory can't be written"""
+        try:
+            write_file_atomic(self.cache_path, json.dumps({
+                'version': CACHE_VERSION, 'files': self.files
+            }, separators=(",", ":")))
+        except OSError:
+            pass
+
+    def ability(self, ability_id: str) -> Optional[LibraryObject]:
+        """Return the ability with the given id, if there is one"""
+        return self.objects['abilities'].get(ability_id)
+
+    def adversary(self, adversary_id: str) -> Optional[LibraryObject]:
+        """Return the adversary with the given id, if there is one"""
+        return self.objects['adversaries'].get(adversary_id)
+
+    def source(self, source_id: str) -> Optional[LibraryObject]:
+        """Return the source with the given id, if there is one"""
+        return self.objects['sources'].get(source_id)
+
+    def adversaries_named(self, name: str) -> List[LibraryObject]:
+        """Return the adversaries with the given name"""
+        return self.adversary_names.get(name, [])
+
+    def check_adversary_name(
+        self,
+        name: str,
+        adversary_id: str,
+        playbook_id: Optional[str] = None
+        ) -> None:
+        """
+        Raise a ValueError if an adversary other than the one with the given
+        id already has the given name, unless it was generated from the
+        playbook with the given id by an earlier import
+        """
+        for adversary in self.adversaries_named(name):
+            if (adversary['id'] != adversary_id
+                    and (not playbook_id
+                         or adversary['playbook_id'] != playbook_id)):
+                raise ValueError(
+                    f"The adversary name {name!r} is already used by "
+                    f"adversary {adversary['id']} in {adversary['path']}"
+                )
@@ -0,0 +1,381 @@
+"""
+Module for loading the abilities, adversaries and sources of an import into a
+running Caldera server through its REST API
+
+The files of an import are written to a CalderaSink like any other output
+sink. The abilities, adversaries and sources among them are read back and put
+to the server, through /api/v2/{abilities,adversaries,sources}/{id}, which
+creates or replaces them, so no restart of the server is needed. Every other
+file, such as the updated playbooks and manifests, is written to a fallback
+sink if one is given and dropped otherwise.
+
+Requests are sent concurrently over a pool of keep-alive connections, a batch
+of staged files at a time, and retried with exponential backoff when the
+server can't be reached or is unavailable.
+"""
+import http.client
+import json
+import posixpath
+import queue
+import random
+import time
+import urllib.parse
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+
+import yaml
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.instrumentation import count, span
+from ability_converter.output_sink import (
+    OutputSink, StagedBuffer, digest_contents
+)
+
+# Use the libyaml Loader if PyYAML was built with it
+try:
+    from yaml import CSafeLoader as Loader
+except ImportError: # pragma: no cover
+    from yaml import SafeLoader as Loader # type: ignore
+
+# Constant defining the number of requests sent to Caldera at once by default
+DEFAULT_CONCURRENCY = 4
+
+# Constant defining the number of times a failed request is retried by default
+DEFAULT_MAX_RETRIES = 4
+
+# Constant defining the delay before the first retry of a request, doubled
+# for each further retry
+DEFAULT_BACKOFF_SECONDS = 0.5
+
+# Constant defining the seconds after which a request to Caldera times out
+REQUEST_TIMEOUT = 30
+
+# Constant defining the statuses of responses to requests worth retrying
+RETRY_STATUSES = frozenset((429, 502, 503, 504))
+
+# Constant defining the Caldera resource of the files of each directory
+RESOURCE_DIRECTORIES: Dict[str, str] = {
+    "data/adversaries": "adversaries",
+    "data/sources": "sources",
+}
+
+# Constant defining the attribute holding the id of each Caldera resource
+ID_ATTRIBUTES: Dict[str, str] = {
+    "abilities": "ability_id",
+    "adversaries": "adversary_id",
+    "sources": "id",
+}
+
+# A request to Caldera: the method, the path below the API and the body
+CalderaRequest = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+class CalderaApiError(Exception):
+    """Exception raised when Caldera refuses or fails a request"""
+
+    def __init__(
+        self,
+        method: str,
+        path: str,
+        status: int,
+        body: str
+        ) -> None:
+        """Initialise CalderaApiError with the request and response"""
+        self.status: int = status
+        super().__init__(f"{method} {path} failed with {status}: {body}")
+
+
+class CalderaClient:
+    """
+    Class object sending requests to the REST API of a Caldera server
+
+    Up to concurrency requests are sent at once, each over a keep-alive
+    connection taken from a pool. A request which can't reach the server, or
+    gets a response with one of RETRY_STATUSES, is retried up to max_retries
+    times, waiting backoff_seconds, then twice as long for each further
+    retry, with some jitter.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS
+        ) -> None:
+        """Initialise CalderaClient class"""
+        parsed_url = urllib.parse.urlsplit(url)
+        if parsed_url.scheme not in ("http", "https"):
+            raise ValueError(f"Expected an http or https URL: {url}")
+        self.scheme: str = parsed_url.scheme
+        self.netloc: str = parsed_url.netloc
+        self.base_path: str = parsed_url.path.rstrip("/")
+        self.api_key: str = api_key
+        self.max_retries: int = max_retries
+        self.backoff_seconds: float = backoff_seconds
+        # The idle connections, most recently used last
+        self.connections: "queue.LifoQueue[http.client.HTTPConnection]" = (
+            queue.LifoQueue()
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(concurrency, 1), thread_name_prefix="caldera"
+        )
+
+    def connect(self) -> http.client.HTTPConnection:
+        """Return an idle connection to Caldera, or a new one"""
+        try:
+            return self.connections.get_nowait()
+        except queue.Empty:
+            count("caldera_connections")
+            if self.scheme == "https":
+                return http.client.HTTPSConnection(
+                    self.netloc, timeout=REQUEST_TIMEOUT
+                )
+            return http.client.HTTPConnection(
+                self.netloc, timeout=REQUEST_TIMEOUT
+            )
+
+    def send(
+        self,
+        method: str,
+        path: str,
+        body: Optional[Dict[str, Any]] = None
+        ) -> Tuple[int, bytes]:
+        """
+        Send a request to Caldera, retrying it if it fails, and return the
+        status and body of the response
+        """
+        headers: Dict[str, str] = {
+            'KEY': self.api_key, 'Accept': "application/json"
+        }
+        data: Optional[bytes] = None
+        if body is not None:
+            data = json.dumps(body).encode()
+            headers['Content-Type'] = "application/json"
+        attempt: int = 0
+        while True:
+            connection = self.connect()
+            try:
+                connection.request(
+                    method, f"{self.base_path}/api/v2/{path}", data, headers
+                )
+                response = connection.getresponse()
+                response_body: bytes = response.read()
+            except (OSError, http.client.HTTPException):
+                # The connection may be broken, so it isn't reused
+                connection.close()
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                self.connections.put(connection)
+                if (response.status not in RETRY_STATUSES
+                        or attempt >= self.max_retries):
+                    count("caldera_requests")
+                    return response.status, response_body
+            count("caldera_retries")
+            time.sleep(
+                self.backoff_seconds * 2 ** attempt * random.uniform(0.5, 1.0)
+            )
+            attempt += 1
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[Dict[str, Any]] = None
+        ) -> Tuple[int, bytes]:
+        """
+        Send a request to Caldera, raising CalderaApiError unless it succeeds
+        or the resource wasn't found, and return the status and body of the
+        response
+        """
+        status, response_body = self.send(method, path, body)
+        if status >= 400 and status != 404:
+            raise CalderaApiError(
+                method, path, status, response_body.decode(errors='replace')
+            )
+        return status, response_body
+
+    def request_all(
+        self,
+        requests: List[CalderaRequest]
+        ) -> List[Tuple[int, bytes]]:
+        """
+        Send the requests to Caldera concurrently and return the status and
+        body of each response, raising the first error once every request has
+        finished
+        """
+        with span("caldera_requests"):
+            futures: List[Future] = [
+                self.executor.submit(self.request, *request)
+                for request in requests
+            ]
+            errors: List[BaseException] = [
+                error for error in (future.exception() for future in futures)
+                if error is not None
+            ]
+        if errors:
+            raise errors[0]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        """Wait for the pending requests and close every connection"""
+        self.executor.shutdown()
+        while True:
+            try:
+                self.connections.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def caldera_resource(file_name: str) -> Optional[str]:
+    """
+    Return the Caldera resource which a file of the Caldera library defines,
+    if it defines one
+    """
+    if not file_name.endswith(".yml"):
+        return None
+    directory: str = posixpath.dirname(file_name)
+    if posixpath.dirname(directory) == "data/abilities":
+        return "abilities"
+    return RESOURCE_DIRECTORIES.get(directory)
+
+
+def caldera_objects(
+    resource: str,
+    contents: str
+    ) -> List[Dict[str, Any]]:
+    """
+    Return the objects of a Caldera resource defined by the contents of a
+    file, in the shape of the REST API
+    """
+    objects: List[Dict[str, Any]] = []
+    for document in yaml.load_all(contents, Loader=Loader):
+        # Ability files and bundles hold lists of abilities
+        for caldera_object in (
+            document if isinstance(document, list) else [document]
+        ):
+            if resource == "abilities":
+                caldera_object = {
+                    'ability_id': caldera_object['id'],
+                    **{
+                        key: value for key, value in caldera_object.items()
+                        if key != 'id'
+                    }
+                }
+            objects.append(caldera_object)
+    return objects
+
+
+class CalderaSink(OutputSink):
+    """
+    Class object putting the abilities, adversaries and sources written to it
+    to a Caldera server, and writing every other file to fallback
+
+    A file whose contents have already been put to the server by the sink
+    isn't put again. Removing an ability file deletes the ability from the
+    server.
+    """
+
+    def __init__(
+        self,
+        client: CalderaClient,
+        fallback: Optional[OutputSink] = None
+        ) -> None:
+        """Initialise CalderaSink class"""
+        super().__init__()
+        self.client: CalderaClient = client
+        self.fallback: Optional[OutputSink] = fallback
+        # The digest of the contents of each file put to the server
+        self.digests: Dict[str, str] = {}
+
+    def input_path(self, file_name: str) -> str:
+        if self.fallback is not None:
+            return self.fallback.input_path(file_name)
+        return file_name
+
+    def read(self, file_name: str) -> Optional[str]:
+        if caldera_resource(file_name) is None and self.fallback is not None:
+            return self.fallback.read(file_name)
+        return None
+
+    def exists(self, file_name: str) -> bool:
+        if caldera_resource(file_name) is None:
+            return self.fallback is not None and self.fallback.exists(
+                file_name
+            )
+        return file_name in self.digests
+
+    def has_contents(self, file_name: str, contents: str) -> bool:
+        if caldera_resource(file_name) is None:
+            return self.fallback is not None and self.fallback.has_contents(
+                file_name, contents
+            )
+        return self.digests.get(file_name) == digest_contents(
+            contents.encode()
+        )
+
+    def open_staged(self, file_name: str) -> Tuple[Any, TextIO]:
+        if caldera_resource(file_name) is None and self.fallback is not None:
+            return self.fallback.open_staged(file_name)
+        staged = StagedBuffer()
+        return staged, staged
+
+    def has_staged_contents(self, staged: Any, file_name: str) -> bool:
+        if caldera_resource(file_name) is None:
+            return self.fallback is not None and (
+                self.fallback.has_staged_contents(staged, file_name)
+            )
+        return self.digests.get(file_name) == digest_contents(
+            staged.staged.encode()
+        )
+
+    def commit(self, staged_files: List[Tuple[Any, str]]) -> None:
+        requests: List[CalderaRequest] = []
+        committed: Dict[str, str] = {}
+        fallback_files: List[Tuple[Any, str]] = []
+        for staged, file_name in staged_files:
+            resource: Optional[str] = caldera_resource(file_name)
+            if resource is None:
+                fallback_files.append((staged, file_name))
+                continue
+            digest: str = digest_contents(staged.staged.encode())
+            if self.digests.get(file_name) == digest:
+                continue
+            for caldera_object in caldera_objects(resource, staged.staged):
+                object_id: str = caldera_object[ID_ATTRIBUTES[resource]]
+                requests.append(
+                    ("PUT", f"{resource}/{object_id}", caldera_object)
+                )
+            committed[file_name] = digest
+        if self.fallback is not None and fallback_files:
+            self.fallback.commit(fallback_files)
+        self.client.request_all(requests)
+        with self.lock:
+            self.digests.update(committed)
+
+    def discard(self, staged_files: List[Tuple[Any, str]]) -> None:
+        if self.fallback is not None:
+            self.fallback.discard([
+                (staged, file_name) for staged, file_name in staged_files
+                if caldera_resource(file_name) is None
+            ])
+
+    def remove(self, file_name: str) -> bool:
+        resource: Optional[str] = caldera_resource(file_name)
+        if resource is None:
+            return self.fallback is not None and self.fallback.remove(
+                file_name
+            )
+        object_id: str = posixpath.splitext(posixpath.basename(file_name))[0]
+        status, _ = self.client.request("DELETE", f"{resource}/{object_id}")
+        with self.lock:
+            self.digests.pop(file_name, None)
+        return status != 404
+
+    def close(self) -> None:
+        self.client.close()
+        if self.fallback is not None:
+            self.fallback.close()
@@ -0,0 +1,207 @@
+"""
+Module for a local stand-in for the REST API of a Caldera server
+
+The stand-in keeps the abilities, adversaries and sources put to it in memory
+and serves them back, so that loading an import into Caldera can be tried out
+and tested without a Caldera server. It answers the requests a CalderaSink
+sends, checking the API key, and can be made to fail requests to exercise
+retries.
+
+Run with: python -m ability_converter.caldera_stand_in --port 8888
+"""
+import argparse
+import http.server
+import json
+import sys
+import threading
+
+from typing import Any, Dict, List, Optional, Tuple
+
+# Constant defining the API key the stand-in accepts by default, that of a
+# default Caldera installation
+DEFAULT_API_KEY = "ADMIN123"
+
+# Constant defining the resources served by the stand-in
+RESOURCES = ("abilities", "adversaries", "sources")
+
+
+class CalderaStandIn(http.server.ThreadingHTTPServer):
+    """
+    Class object serving the stand-in Caldera REST API on a local port,
+    by default any free port
+
+    The objects of each resource are held in objects, keyed by id. The
+    connections accepted and requests handled are counted, and the next
+    failures requests are answered with a 503 status.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 0,
+        api_key: str = DEFAULT_API_KEY
+        ) -> None:
+        """Initialise CalderaStandIn class, listening on localhost"""
+        super().__init__(("127.0.0.1", port), CalderaStandInHandler)
+        self.api_key: str = api_key
+        self.objects: Dict[str, Dict[str, Any]] = {
+            resource: {} for resource in RESOURCES
+        }
+        self.lock = threading.Lock()
+        self.connections: int = 0
+        self.requests: int = 0
+        self.failures: int = 0
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Return the URL of the stand-in"""
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "CalderaStandIn":
+        """Serve requests in a background thread"""
+        self.thread = threading.Thread(
+            target=self.serve_forever, name="caldera-stand-in", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving requests and close the socket"""
+        if self.thread is not None:
+            self.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server_close()
+
+    def fail_requests(self, failures: int) -> None:
+        """Answer the next failures requests with a 503 status"""
+        with self.lock:
+            self.failures = failures
+
+    def __enter__(self) -> "CalderaStandIn":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+class CalderaStandInHandler(http.server.BaseHTTPRequestHandler):
+    """Class object handling a request to the stand-in Caldera REST API"""
+
+    # Keep connections alive between requests, as Caldera does
+    protocol_version = "HTTP/1.1"
+    server: CalderaStandIn
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # pylint: disable=redefined-builtin
+        """Don't log each request to standard error"""
+
+    def respond(self, status: int, body: Any = None) -> None:
+        """Send a response with a JSON body"""
+        data: bytes = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def route(self) -> Optional[Tuple[str, Optional[str], bytes]]:
+        """
+        Check the request, answering it if it can't be served, and return the
+        resource and the object id it's for along with its body
+        """
+        # Read the body first, so the connection can be kept alive
+        length: int = int(self.headers.get("Content-Length") or 0)
+        body: bytes = self.rfile.read(length)
+        with self.server.lock:
+            self.server.requests += 1
+            if self.server.failures > 0:
+                self.server.failures -= 1
+                self.respond(503, {'error': "Unavailable"})
+                return None
+        if self.headers.get("KEY") != self.server.api_key:
+            self.respond(401, {'error': "Unauthorized"})
+            return None
+        parts: List[str] = self.path.strip("/").split("/")
+        if parts[:2] != ["api", "v2"] or len(parts) not in (3, 4) or (
+                parts[2] not in RESOURCES):
+            self.respond(404, {'error': "Not found"})
+            return None
+        return parts[2], parts[3] if len(parts) == 4 else None, body
+
+    def do_GET(self) -> None: # pylint: disable=invalid-name
+        """Return every object of a resource, or a single object"""
+        route = self.route()
+        if route is None:
+            return
+        resource, object_id, _ = route
+        objects: Dict[str, Any] = self.server.objects[resource]
+        if object_id is None:
+            self.respond(200, list(objects.values()))
+        elif object_id in objects:
+            self.respond(200, objects[object_id])
+        else:
+            self.respond(404, {'error': "Not found"})
+
+    def do_PUT(self) -> None: # pylint: disable=invalid-name
+        """Create or replace an object"""
+        route = self.route()
+        if route is None:
+            return
+        resource, object_id, body = route
+        try:
+            caldera_object: Any = json.loads(body)
+        except ValueError:
+            caldera_object = None
+        if object_id is None or not isinstance(caldera_object, dict):
+            self.respond(400, {'error': "Expected a JSON object"})
+            return
+        with self.server.lock:
+            self.server.objects[resource][object_id] = caldera_object
+        self.respond(200, caldera_object)
+
+    def do_DELETE(self) -> None: # pylint: disable=invalid-name
+        """Delete an object"""
+        route = self.route()
+        if route is None:
+            return
+        resource, object_id, _ = route
+        with self.server.lock:
+            deleted: Any = self.server.objects[resource].pop(object_id, None)
+        if deleted is None:
+            self.respond(404, {'error': "Not found"})
+        else:
+            self.respond(204)
+
+
+def main(args: List[str]) -> int:
+    """Serve the stand-in Caldera REST API until interrupted"""
+    parser = argparse.ArgumentParser(
+        prog="caldera_stand_in",
+        description="Serve a stand-in for the Caldera REST API"
+    )
+    parser.add_argument('--port', type=int, default=8888)
+    parser.add_argument('--api-key', default=DEFAULT_API_KEY)
+    options = parser.parse_args(args[1:])
+
+    server = CalderaStandIn(options.port, options.api_key)
+    print(f"Serving a stand-in Caldera REST API on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
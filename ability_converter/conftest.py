@@ -0,0 +1,212 @@
+"""
+Module defining the fixtures shared by the tests of the ability_converter
+package and its subpackages
+"""
+import json
+import os
+
+from typing import Callable, List, Optional
+
+import pytest
+
+# Constant defining the directory of the example playbooks
+TEST_PLAYBOOKS_DIR: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "test_playbooks"
+)
+
+# Constant defining an ability of the test Caldera library, in data/
+TEST_LIBRARY_ABILITY = """\
+- id: 1ab2c3
+  name: Discover processes
+  tactic: discovery
+  technique:
+    attack_id: T1057
+    name: Process Discovery
+"""
+
+# Constant defining an ability of a plugin of the test Caldera library
+TEST_PLUGIN_ABILITY = """\
+id: 4de5f6
+name: Find files
+tactic: collection
+technique_id: T1005
+technique_name: Data from Local System
+"""
+
+# Constant defining an adversary of the test Caldera library
+TEST_ADVERSARY = """\
+adversary_id: 7ab8c9
+name: Hunter
+atomic_ordering: [1ab2c3]
+"""
+
+
+@pytest.fixture(name="test_playbook_paths")
+def fixture_test_playbook_paths() -> List[str]:
+    """Give the paths of the example playbooks"""
+    return [
+        os.path.join(TEST_PLAYBOOKS_DIR, "SuperSpy.json"),
+        os.path.join(TEST_PLAYBOOKS_DIR, "IncidentResponder.json"),
+    ]
+
+
+@pytest.fixture(name="make_test_playbook")
+def fixture_make_test_playbook() -> Callable[[str, list], dict]:
+    """
+    Give a function constructing a playbook whose workflow embeds each of the
+    playbooks with the given ids in turn
+    """
+    def make_test_playbook(playbook_id: str, embedded_ids: list) -> dict:
+        step_ids = [f"step_{index}" for index in range(len(embedded_ids) + 2)]
+        workflow = {
+            step_ids[0]: {'type': "start", 'on_completion': step_ids[1]},
+            step_ids[-1]: {'type': "end"},
+        }
+        for index, embedded_id in enumerate(embedded_ids, start=1):
+            workflow[step_ids[index]] = {
+                'type': "playbook",
+                'playbook_id': embedded_id,
+                'on_completion': step_ids[index + 1],
+            }
+        return {
+            'id': playbook_id,
+            'name': f"Test Playbook {playbook_id}",
+            'description': "",
+            'playbook_variables': {},
+            'workflow_start': step_ids[0],
+            'workflow': workflow,
+        }
+    return make_test_playbook
+
+
+@pytest.fixture(name="make_triage_playbook")
+def fixture_make_triage_playbook(
+    make_test_playbook: Callable[[str, list], dict]
+    ) -> Callable[[str, list], dict]:
+    """
+    Give a function constructing a playbook with a single step running each
+    of the given bash commands
+    """
+    def make_triage_playbook(playbook_id: str, commands: list) -> dict:
+        playbook = make_test_playbook(playbook_id, [])
+        playbook['workflow']['step_0']['on_completion'] = "triage"
+        playbook['workflow']['triage'] = {
+            'type': "single",
+            'name': f"Triage {playbook_id}",
+            'description': "",
+            'commands': [
+                {'type': "bash", 'command': command} for command in commands
+            ],
+            'on_completion': "step_1",
+        }
+        return playbook
+    return make_triage_playbook
+
+
+@pytest.fixture(name="write_test_playbook")
+def fixture_write_test_playbook() -> Callable[[str, dict], None]:
+    """Give a function writing a playbook to the given path"""
+    def write_test_playbook(path: str, playbook: dict) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(json.dumps(playbook))
+    return write_test_playbook
+
+
+@pytest.fixture(name="make_test_library")
+def fixture_make_test_library() -> Callable[[], None]:
+    """
+    Give a function writing a Caldera library to the working directory, with
+    an ability in data/, an ability in a plugin and an adversary
+    """
+    def write_library_file(path: str, contents: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            file.write(contents)
+
+    def make_test_library() -> None:
+        write_library_file(
+            "data/abilities/discovery/1ab2c3.yml", TEST_LIBRARY_ABILITY
+        )
+        write_library_file(
+            "plugins/stockpile/data/abilities/collection/4de5f6.yml",
+            TEST_PLUGIN_ABILITY
+        )
+        write_library_file("data/adversaries/7ab8c9.yml", TEST_ADVERSARY)
+    return make_test_library
+
+
+@pytest.fixture(name="make_attack_pattern")
+def fixture_make_attack_pattern() -> Callable[..., dict]:
+    """
+    Give a function constructing the STIX attack pattern of an ATT&CK
+    technique
+    """
+    def make_attack_pattern(
+        technique_id: str,
+        name: str,
+        tactics: list,
+        revoked: bool = False
+        ) -> dict:
+        return {
+            'type': "attack-pattern",
+            'id': f"attack-pattern--{technique_id}",
+            'name': name,
+            'revoked': revoked,
+            'external_references': [
+                {'source_name': "capec", 'external_id': "CAPEC-1"},
+                {
+                    'source_name': "mitre-attack",
+                    'external_id': technique_id,
+                    'url': (
+                        f"https://attack.mitre.org/techniques/{technique_id}"
+                    ),
+                },
+            ],
+            'kill_chain_phases': [
+                {'kill_chain_name': "mitre-attack", 'phase_name': tactic}
+                for tactic in tactics
+            ],
+        }
+    return make_attack_pattern
+
+
+@pytest.fixture(name="test_bundle")
+def fixture_test_bundle(make_attack_pattern: Callable[..., dict]) -> dict:
+    """
+    Give a STIX bundle of ATT&CK techniques, which a test may change without
+    affecting the others
+    """
+    return {
+        'type': "bundle",
+        'id': "bundle--test",
+        'objects': [
+            {'type': "x-mitre-tactic", 'name': "Discovery"},
+            make_attack_pattern("T1057", "Process Discovery", ["discovery"]),
+            make_attack_pattern(
+                "T1059", "Command and Scripting Interpreter", ["execution"]
+            ),
+            make_attack_pattern("T1059.004", "Unix Shell", ["execution"]),
+            make_attack_pattern(
+                "T1003", "OS Credential Dumping",
+                ["credential-access", "impact"]
+            ),
+            make_attack_pattern(
+                "T1099", "Timestomp", ["defense-evasion"], True
+            ),
+        ],
+    }
+
+
+@pytest.fixture(name="write_test_bundle")
+def fixture_write_test_bundle(
+    test_bundle: dict
+    ) -> Callable[[str, Optional[dict]], None]:
+    """
+    Give a function writing a STIX bundle to the given path, the test bundle
+    unless another is given
+    """
+    def write_test_bundle(path: str, bundle: Optional[dict] = None) -> None:
+        with open(path, 'w') as file:
+            json.dump(test_bundle if bundle is None else bundle, file)
+    return write_test_bundle
@@ -0,0 +1,257 @@
+"""
+Module for watching a directory for files which are added or changed
+
+On Linux the directory is watched with inotify, called through ctypes, so a
+change is seen as soon as the file is closed or moved into the directory.
+Elsewhere, or if inotify can't be used, the directory is scanned for files
+whose modification time or size changed. Writers often touch a file several
+times in quick succession, so wait_for_changes only returns once the
+directory has been quiet for a while, with every file changed in the burst.
+"""
+import abc
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from typing import Dict, Optional, Set, Tuple
+
+# Constant defining the interval between scans of a polled directory
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Constant defining how long a directory must be quiet before its changes are
+# returned
+DEFAULT_DEBOUNCE_SECONDS = 0.5
+
+# Constants defining the inotify flags and event masks used, from
+# <sys/inotify.h>
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+
+# Constant defining the layout of the fixed part of an inotify event:
+# wd, mask, cookie and the length of the name which follows
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class DirectoryWatcher(abc.ABC):
+    """
+    Class object watching the files of a directory with a given suffix for
+    being added or changed
+    """
+
+    def __init__(self, directory: str, suffix: str = "") -> None:
+        """Initialise DirectoryWatcher class"""
+        self.directory: str = directory
+        self.suffix: str = suffix
+
+    def watches(self, file_name: str) -> bool:
+        """Check whether a file name is one being watched"""
+        return file_name.endswith(self.suffix) and not file_name.startswith(
+            "."
+        )
+
+    def list_files(self) -> Set[str]:
+        """Return the paths of every file being watched"""
+        return {
+            entry.path for entry in os.scandir(self.directory)
+            if entry.is_file() and self.watches(entry.name)
+        }
+
+    @abc.abstractmethod
+    def changes(self, timeout: Optional[float] = None) -> Set[str]:
+        """
+        Wait up to timeout seconds, or forever if timeout is None, for files
+        to be added or changed, and return their paths. Returns an empty set
+        if nothing changed in time
+        """
+
+    def close(self) -> None:
+        """Stop watching the directory"""
+
+    def __enter__(self) -> "DirectoryWatcher":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class PollingWatcher(DirectoryWatcher):
+    """
+    Class object watching a directory by scanning it every poll_interval
+    seconds for files whose modification time or size changed
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        suffix: str = "",
+        poll_interval: float = DEFAULT_POLL_INTERVAL
+        ) -> None:
+        """Initialise PollingWatcher class, taking the first scan"""
+        super().__init__(directory, suffix)
+        self.poll_interval: float = poll_interval
+        self.snapshot: Dict[str, Tuple[int, int]] = self.scan()
+
+    def scan(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Return the modification time and size of every file being watched,
+        keyed by path
+        """
+        snapshot: Dict[str, Tuple[int, int]] = {}
+        for entry in os.scandir(self.directory):
+            if not self.watches(entry.name):
+                continue
+            try:
+                stat: os.stat_result = entry.stat()
+            except FileNotFoundError:
+                continue
+            if entry.is_file():
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def changes(self, timeout: Optional[float] = None) -> Set[str]:
+        deadline: Optional[float] = (
+            None if timeout is None else time.monotonic() + timeout
+        )
+        while True:
+            snapshot: Dict[str, Tuple[int, int]] = self.scan()
+            changed: Set[str] = {
+                path for path, state in snapshot.items()
+                if self.snapshot.get(path) != state
+            }
+            self.snapshot = snapshot
+            if changed:
+                return changed
+            delay: float = self.poll_interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return set()
+            time.sleep(delay)
+
+
+class InotifyWatcher(DirectoryWatcher):
+    """
+    Class object watching a directory with inotify for files which are
+    closed after being written or moved into the directory
+
+    Raises OSError if inotify isn't available.
+    """
+
+    def __init__(self, directory: str, suffix: str = "") -> None:
+        """Initialise InotifyWatcher class, adding the inotify watch"""
+        super().__init__(directory, suffix)
+        library_name: Optional[str] = ctypes.util.find_library("c")
+        try:
+            libc = ctypes.CDLL(library_name, use_errno=True)
+            inotify_init1 = libc.inotify_init1
+            inotify_add_watch = libc.inotify_add_watch
+        except (AttributeError, OSError) as error:
+            raise OSError(f"inotify isn't available: {error}") from error
+        inotify_add_watch.argtypes = [
+            ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32
+        ]
+
+        self.file_descriptor: int = inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.file_descriptor < 0:
+            errno: int = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        watch_descriptor: int = inotify_add_watch(
+            self.file_descriptor, os.fsencode(directory),
+            IN_CLOSE_WRITE | IN_MOVED_TO
+        )
+        if watch_descriptor < 0:
+            errno = ctypes.get_errno()
+            os.close(self.file_descriptor)
+            raise OSError(errno, os.strerror(errno), directory)
+
+    def read_events(self) -> Set[str]:
+        """Read the pending events, returning the paths of the files changed"""
+        changed: Set[str] = set()
+        while True:
+            try:
+                data: bytes = os.read(self.file_descriptor, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset: int = 0
+            while offset < len(data):
+                _, mask, _, name_length = INOTIFY_EVENT.unpack_from(
+                    data, offset
+                )
+                offset += INOTIFY_EVENT.size
+                name: str = os.fsdecode(
+                    data[offset:offset + name_length].rstrip(b"\0")
+                )
+                offset += name_length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped, so any file may have changed
+                    changed |= self.list_files()
+                elif name and self.watches(name):
+                    changed.add(os.path.join(self.directory, name))
+
+    def changes(self, timeout: Optional[float] = None) -> Set[str]:
+        deadline: Optional[float] = (
+            None if timeout is None else time.monotonic() + timeout
+        )
+        while True:
+            remaining: Optional[float] = (
+                None if deadline is None
+                else max(deadline - time.monotonic(), 0.0)
+            )
+            readable, _, _ = select.select(
+                [self.file_descriptor], [], [], remaining
+            )
+            if readable:
+                changed: Set[str] = self.read_events()
+                if changed:
+                    return changed
+            elif deadline is not None:
+                return set()
+
+    def close(self) -> None:
+        if self.file_descriptor >= 0:
+            os.close(self.file_descriptor)
+            self.file_descriptor = -1
+
+
+def open_watcher(
+    directory: str,
+    suffix: str = "",
+    polling: bool = False,
+    poll_interval: float = DEFAULT_POLL_INTERVAL
+    ) -> DirectoryWatcher:
+    """
+    Return an InotifyWatcher for the directory if inotify can be used and
+    polling isn't asked for, and a PollingWatcher otherwise
+    """
+    if not os.path.isdir(directory):
+        raise NotADirectoryError(f"Not a directory: {directory}")
+    if not polling:
+        try:
+            return InotifyWatcher(directory, suffix)
+        except OSError:
+            pass
+    return PollingWatcher(directory, suffix, poll_interval)
+
+
+def wait_for_changes(
+    watcher: DirectoryWatcher,
+    debounce: float = DEFAULT_DEBOUNCE_SECONDS,
+    timeout: Optional[float] = None
+    ) -> Set[str]:
+    """
+    Wait up to timeout seconds for files to change, then until no file has
+    changed for debounce seconds, and return the paths of every file changed
+    """
+    changed: Set[str] = watcher.changes(timeout)
+    while changed:
+        more_changed: Set[str] = watcher.changes(debounce)
+        if not more_changed:
+            break
+        changed |= more_changed
+    return changed
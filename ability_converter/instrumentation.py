@@ -0,0 +1,140 @@
+"""
+Module for measuring where the time of an import goes
+
+The phases of an import are wrapped in named spans and the work done is
+tallied in named counters. Nothing is recorded unless a Profiler is active,
+in which case span and count record into it; otherwise span returns a shared
+context manager which does nothing and count returns straight away, so the
+instrumentation costs a function call when profiling is off. Spans may be
+recorded from several threads, each with its own nesting of spans.
+"""
+import contextlib
+import threading
+import time
+
+from typing import ContextManager, Dict, Iterator, List, Optional, TypedDict
+
+# A span which records nothing, used while no profiler is active
+NULL_SPAN: ContextManager[None] = contextlib.nullcontext()
+
+
+class SpanStatistics(TypedDict):
+    """Class defining the time recorded for a span"""
+    calls: int
+    # The time spent in the span, including any spans nested within it
+    total_seconds: float
+    # The time spent in the span outside of any nested spans
+    self_seconds: float
+
+
+class ProfileReport(TypedDict):
+    """Class defining the report of a profiled import"""
+    wall_seconds: float
+    spans: Dict[str, SpanStatistics]
+    counters: Dict[str, int]
+
+
+class Span:
+    """Class object timing a single run of a span of a Profiler"""
+
+    def __init__(self, profiler: "Profiler", name: str) -> None:
+        """Initialise Span class"""
+        self.profiler: Profiler = profiler
+        self.name: str = name
+        self.start: float = 0.0
+        # The time spent in the spans nested within this one
+        self.nested_seconds: float = 0.0
+
+    def __enter__(self) -> None:
+        self.profiler.open_spans().append(self)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        seconds: float = time.perf_counter() - self.start
+        open_spans: List[Span] = self.profiler.open_spans()
+        open_spans.pop()
+        if open_spans:
+            open_spans[-1].nested_seconds += seconds
+        # A span nested within a span of the same name, such as the conversion
+        # of an embedded playbook, is already part of the outer span's total
+        outermost: bool = not any(
+            open_span.name == self.name for open_span in open_spans
+        )
+        with self.profiler.lock:
+            statistics: SpanStatistics = self.profiler.spans.setdefault(
+                self.name,
+                {'calls': 0, 'total_seconds': 0.0, 'self_seconds': 0.0}
+            )
+            statistics['calls'] += 1
+            statistics['self_seconds'] += seconds - self.nested_seconds
+            if outermost:
+                statistics['total_seconds'] += seconds
+
+
+class Profiler:
+    """
+    Class object recording the spans and counters of the imports run while it
+    is active
+    """
+
+    def __init__(self) -> None:
+        """Initialise Profiler class"""
+        self.spans: Dict[str, SpanStatistics] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.thread_state = threading.local()
+        self.wall_seconds: float = 0.0
+
+    def open_spans(self) -> List[Span]:
+        """
+        Return the spans of the current thread which have been entered but
+        not exited, innermost last
+        """
+        try:
+            return self.thread_state.open_spans
+        except AttributeError:
+            self.thread_state.open_spans = []
+            return self.thread_state.open_spans
+
+    @contextlib.contextmanager
+    def activate(self) -> Iterator["Profiler"]:
+        """Record the spans and counters of the context into the profiler"""
+        global active_profiler # pylint: disable=global-statement
+        previous_profiler: Optional[Profiler] = active_profiler
+        active_profiler = self
+        start: float = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.wall_seconds += time.perf_counter() - start
+            active_profiler = previous_profiler
+
+    def report(self) -> ProfileReport:
+        """Return the spans and counters recorded"""
+        return {
+            'wall_seconds': self.wall_seconds,
+            'spans': {
+                name: dict(statistics)
+                for name, statistics in sorted(self.spans.items())
+            },
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+
+# The profiler recording the current import, if profiling is enabled
+active_profiler: Optional[Profiler] = None
+
+
+def span(name: str) -> ContextManager[None]:
+    """Return a context manager recording the time spent in a named span"""
+    if active_profiler is None:
+        return NULL_SPAN
+    return Span(active_profiler, name)
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Add the amount to a named counter"""
+    profiler: Optional[Profiler] = active_profiler
+    if profiler is not None:
+        with profiler.lock:
+            profiler.counters[name] = profiler.counters.get(name, 0) + amount
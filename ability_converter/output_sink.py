@@ -0,0 +1,435 @@
+"""
+Module for the destinations the files of an import are written to
+
+Every file of an import is named by its path relative to the Caldera
+directory, such as data/abilities/{TACTIC}/{ID}.yml, and written through an
+output sink. A DirectorySink writes the files below a root directory, a
+MemorySink holds them in a dictionary, so that playbooks can be converted
+without touching the disk, and an ArchiveSink appends them to a tar or zip
+archive written in a single sequential pass.
+
+Files are either written straight away, or staged and committed later as a
+batch so that none of them appear until every one has been written. Files
+whose contents are unchanged aren't written again. Sinks may be written to
+from several threads at once.
+
+The playbooks embedded by a playbook are read from playbooks/ below the
+Caldera directory written to, which is the root directory of a
+DirectorySink. Sinks writing to no directory of their own read them from
+the working directory.
+"""
+import abc
+import filecmp
+import hashlib
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+from typing import (
+    Any, Callable, Dict, Iterable, List, Optional, Set, TextIO, Tuple
+)
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.atomic_file import (
+    commit_staged_files, discard_staged_files, file_has_contents,
+    open_staged_file
+)
+from ability_converter.instrumentation import count, span
+
+# Constant defining the size up to which the staged files of an archive are
+# held in memory rather than in a temporary file
+ARCHIVE_SPOOL_SIZE = 1024 * 1024
+
+# Constant defining the tarfile compression of each tar archive extension
+TAR_COMPRESSIONS: Dict[str, str] = {
+    ".tar": "",
+    ".tar.gz": "gz",
+    ".tgz": "gz",
+    ".tar.bz2": "bz2",
+    ".tar.xz": "xz",
+}
+
+
+class StagedBuffer(io.StringIO):
+    """
+    Class object holding the contents of a staged file in memory until it's
+    closed, when they're handed to keep and the result is held as staged
+    """
+
+    def __init__(self, keep: Callable[[str], Any] = str) -> None:
+        """Initialise StagedBuffer class"""
+        super().__init__()
+        self.keep: Callable[[str], Any] = keep
+        self.staged: Any = None
+
+    def close(self) -> None:
+        if not self.closed:
+            self.staged = self.keep(self.getvalue())
+        super().close()
+
+
+class OutputSink(abc.ABC):
+    """
+    Class object for a destination of the files of an import
+
+    Subclasses implement reading, staging, committing and removing files,
+    from which writing a single file is built. A staged file is given by the
+    handle returned by open_staged and the name of the file it's staged for.
+    """
+
+    def __init__(self) -> None:
+        """Initialise OutputSink class"""
+        # Guards the state of the sink updated by several threads
+        self.lock = threading.Lock()
+
+    @abc.abstractmethod
+    def read(self, file_name: str) -> Optional[str]:
+        """Return the contents of a file, or None if it doesn't exist"""
+
+    def input_path(self, file_name: str) -> str:
+        """
+        Return the path an input file of the Caldera directory, such as an
+        embedded playbook, is read from
+        """
+        return file_name
+
+    def exists(self, file_name: str) -> bool:
+        """Check whether a file exists"""
+        return self.read(file_name) is not None
+
+    def has_contents(self, file_name: str, contents: str) -> bool:
+        """Check whether a file exists and consists exactly of contents"""
+        return self.read(file_name) == contents
+
+    @abc.abstractmethod
+    def open_staged(self, file_name: str) -> Tuple[Any, TextIO]:
+        """
+        Return the handle of a new staged file for file_name and the staged
+        file opened for writing
+        """
+
+    def stage(self, file_name: str, contents: str) -> Any:
+        """Stage contents for file_name and return the staged file handle"""
+        staged, file = self.open_staged(file_name)
+        try:
+            with file:
+                count("bytes_written", file.write(contents))
+        except BaseException:
+            self.discard([(staged, file_name)])
+            raise
+        count("files_written")
+        return staged
+
+    def has_staged_contents(self, staged: Any, file_name: str) -> bool:
+        """Check whether a file holds the same contents as a staged file"""
+        return False
+
+    @abc.abstractmethod
+    def commit(self, staged_files: List[Tuple[Any, str]]) -> None:
+        """
+        Put each staged file in place of its file, given as a list of
+        (staged file handle, file name) pairs
+        """
+
+    def discard(self, staged_files: List[Tuple[Any, str]]) -> None:
+        """Drop each staged file which hasn't been committed"""
+
+    def write(self, file_name: str, contents: str) -> bool:
+        """
+        Write contents to file_name, unless the file holds the same contents
+        already. Returns whether the file was written
+        """
+        with span("write_files"):
+            if self.has_contents(file_name, contents):
+                count("files_unchanged")
+                return False
+            staged_files: List[Tuple[Any, str]] = [
+                (self.stage(file_name, contents), file_name)
+            ]
+            try:
+                self.commit(staged_files)
+            except BaseException:
+                self.discard(staged_files)
+                raise
+            return True
+
+    def write_chunks(self, file_name: str, chunks: Iterable[str]) -> bool:
+        """
+        Write the contents given in chunks to file_name, staging them one
+        chunk at a time rather than joining them in memory, unless the file
+        holds the same contents already. Returns whether the file was written
+        """
+        staged, file = self.open_staged(file_name)
+        staged_files: List[Tuple[Any, str]] = [(staged, file_name)]
+        written_bytes: int = 0
+        try:
+            with file:
+                for chunk in chunks:
+                    written_bytes += file.write(chunk)
+            with span("write_files"):
+                if self.has_staged_contents(staged, file_name):
+                    count("files_unchanged")
+                    self.discard(staged_files)
+                    return False
+                self.commit(staged_files)
+        except BaseException:
+            self.discard(staged_files)
+            raise
+        count("files_written")
+        count("bytes_written", written_bytes)
+        return True
+
+    @abc.abstractmethod
+    def remove(self, file_name: str) -> bool:
+        """Remove a file if it exists, returning whether it existed"""
+
+    def close(self) -> None:
+        """Finish writing to the sink"""
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class DirectorySink(OutputSink):
+    """
+    Class object writing files below a root directory, by default the
+    working directory
+
+    Each file is staged to a temporary file in its directory and renamed over
+    the file, so that other processes reading the directory never see a
+    partially written file.
+    """
+
+    def __init__(self, root: str = ".") -> None:
+        """Initialise DirectorySink class"""
+        super().__init__()
+        self.root: str = root
+        # The directories known to exist
+        self.created_directories: Set[str] = set()
+
+    def path(self, file_name: str) -> str:
+        """Return the path of a file below the root directory"""
+        return os.path.join(self.root, file_name)
+
+    def input_path(self, file_name: str) -> str:
+        return self.path(file_name)
+
+    def read(self, file_name: str) -> Optional[str]:
+        try:
+            with open(self.path(file_name)) as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def exists(self, file_name: str) -> bool:
+        return os.path.exists(self.path(file_name))
+
+    def has_contents(self, file_name: str, contents: str) -> bool:
+        return file_has_contents(self.path(file_name), contents)
+
+    def open_staged(self, file_name: str) -> Tuple[str, TextIO]:
+        path: str = self.path(file_name)
+        directory: str = os.path.dirname(path)
+        if directory not in self.created_directories:
+            os.makedirs(directory, exist_ok=True)
+            with self.lock:
+                self.created_directories.add(directory)
+        return open_staged_file(path)
+
+    def has_staged_contents(self, staged: str, file_name: str) -> bool:
+        path: str = self.path(file_name)
+        return (
+            os.path.exists(path) and filecmp.cmp(staged, path, shallow=False)
+        )
+
+    def commit(self, staged_files: List[Tuple[str, str]]) -> None:
+        commit_staged_files([
+            (staged, self.path(file_name))
+            for staged, file_name in staged_files
+        ])
+
+    def discard(self, staged_files: List[Tuple[str, str]]) -> None:
+        discard_staged_files(staged_files)
+
+    def remove(self, file_name: str) -> bool:
+        try:
+            os.remove(self.path(file_name))
+        except FileNotFoundError:
+            return False
+        return True
+
+
+class MemorySink(OutputSink):
+    """Class object holding the files written in memory, keyed by file name"""
+
+    def __init__(self) -> None:
+        """Initialise MemorySink class"""
+        super().__init__()
+        self.files: Dict[str, str] = {}
+
+    def read(self, file_name: str) -> Optional[str]:
+        return self.files.get(file_name)
+
+    def open_staged(self, file_name: str) -> Tuple[StagedBuffer, TextIO]:
+        staged = StagedBuffer()
+        return staged, staged
+
+    def has_staged_contents(
+        self,
+        staged: StagedBuffer,
+        file_name: str
+        ) -> bool:
+        return self.files.get(file_name) == staged.staged
+
+    def commit(self, staged_files: List[Tuple[StagedBuffer, str]]) -> None:
+        with self.lock:
+            for staged, file_name in staged_files:
+                self.files[file_name] = staged.staged
+
+    def remove(self, file_name: str) -> bool:
+        with self.lock:
+            return self.files.pop(file_name, None) is not None
+
+
+class ArchiveSink(OutputSink):
+    """
+    Class object appending the files written to a tar or zip archive
+
+    The kind of archive is given by the extension of its path: .zip, or .tar
+    optionally compressed as .tar.gz, .tgz, .tar.bz2 or .tar.xz. Files are
+    only appended to the archive when committed, so the archive is written in
+    a single sequential pass and the staged files of a failed import never
+    reach it. The archive can't be read back: a file exists if it has been
+    written to the archive, and removing it leaves the archive unchanged. A
+    file written again with other contents is appended again, and the last
+    copy is the one extracted.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialise ArchiveSink class, creating the archive"""
+        super().__init__()
+        self.path: str = path
+        self.created: float = time.time()
+        # The digest of the contents of each file in the archive
+        self.digests: Dict[str, str] = {}
+        self.tar_file: Optional[tarfile.TarFile] = None
+        self.zip_file: Optional[zipfile.ZipFile] = None
+        if path.endswith(".zip"):
+            self.zip_file = zipfile.ZipFile(
+                path, 'w', compression=zipfile.ZIP_DEFLATED
+            )
+            return
+        for extension, compression in TAR_COMPRESSIONS.items():
+            if path.endswith(extension):
+                # Stream the archive, which never seeks back into the file
+                self.tar_file = tarfile.open(path, f"w|{compression}")
+                return
+        raise ValueError(
+            f"Unknown archive extension of {path}, expected .zip, "
+            + ", ".join(TAR_COMPRESSIONS)
+        )
+
+    def read(self, file_name: str) -> Optional[str]:
+        return None
+
+    def exists(self, file_name: str) -> bool:
+        return file_name in self.digests
+
+    def has_contents(self, file_name: str, contents: str) -> bool:
+        return self.digests.get(file_name) == digest_contents(
+            contents.encode()
+        )
+
+    def open_staged(self, file_name: str) -> Tuple[StagedBuffer, TextIO]:
+        staged = StagedBuffer(spool_contents)
+        return staged, staged
+
+    def has_staged_contents(
+        self,
+        staged: StagedBuffer,
+        file_name: str
+        ) -> bool:
+        digest, _, _ = staged.staged
+        return self.digests.get(file_name) == digest
+
+    def commit(self, staged_files: List[Tuple[StagedBuffer, str]]) -> None:
+        with self.lock:
+            for staged, file_name in staged_files:
+                digest, size, spool = staged.staged
+                with spool:
+                    # A file staged twice before being committed is only
+                    # appended once
+                    if self.digests.get(file_name) == digest:
+                        continue
+                    self.append(file_name, size, spool)
+                self.digests[file_name] = digest
+
+    def append(self, file_name: str, size: int, file: Any) -> None:
+        """Append a file of the given size, read from file, to the archive"""
+        if self.tar_file is not None:
+            tar_info = tarfile.TarInfo(file_name)
+            tar_info.size = size
+            tar_info.mtime = int(self.created)
+            tar_info.mode = 0o644
+            self.tar_file.addfile(tar_info, file)
+        elif self.zip_file is not None:
+            zip_info = zipfile.ZipInfo(
+                file_name, date_time=time.localtime(self.created)[:6]
+            )
+            zip_info.compress_type = zipfile.ZIP_DEFLATED
+            with self.zip_file.open(zip_info, 'w') as entry:
+                shutil.copyfileobj(file, entry)
+
+    def discard(self, staged_files: List[Tuple[StagedBuffer, str]]) -> None:
+        for staged, _ in staged_files:
+            if staged.staged is not None:
+                staged.staged[2].close()
+
+    def remove(self, file_name: str) -> bool:
+        return False
+
+    def close(self) -> None:
+        with self.lock:
+            if self.tar_file is not None:
+                self.tar_file.close()
+            if self.zip_file is not None:
+                self.zip_file.close()
+
+
+def digest_contents(contents: bytes) -> str:
+    """Return the digest of the contents of a file"""
+    return hashlib.sha1(contents).hexdigest()
+
+
+def spool_contents(contents: str) -> Tuple[str, int, Any]:
+    """
+    Return the digest and size of the encoded contents of a staged file,
+    along with a file holding them, which is only written to disk if it's
+    large
+    """
+    encoded: bytes = contents.encode()
+    spool = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_SIZE)
+    spool.write(encoded)
+    spool.seek(0)
+    return digest_contents(encoded), len(encoded), spool
+
+
+def open_sink(
+    output_root: str = ".",
+    archive: Optional[str] = None
+    ) -> OutputSink:
+    """
+    Return the sink writing to the archive at the given path if there is
+    one, and below output_root otherwise
+    """
+    if archive is not None:
+        return ArchiveSink(archive)
+    return DirectorySink(output_root)
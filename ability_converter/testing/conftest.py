@@ -0,0 +1,41 @@
+"""
+Module defining the fixtures shared by the tests of the ability_converter
+package
+"""
+import os
+
+from typing import Callable
+
+import pytest
+
+
+@pytest.fixture(name="make_test_ability")
+def fixture_make_test_ability() -> Callable[..., dict]:
+    """Give a function constructing an ability with the given id and tactic"""
+    def make_test_ability(ability_id: str, tactic: str = "") -> dict:
+        return {
+            'id': ability_id,
+            'name': f"Test Ability {ability_id}",
+            'description': "Test Ability Description",
+            'tactic': tactic,
+            'technique_id': "",
+            'technique_name': "",
+            'singleton': False,
+            'repeatable': False,
+            'delete_payload': False,
+            'requirements': [],
+            'executors': []
+        }
+    return make_test_ability
+
+
+@pytest.fixture(name="list_files")
+def fixture_list_files() -> Callable[[str], list]:
+    """Give a function listing every file below the given directory"""
+    def list_files(directory: str) -> list:
+        return sorted(
+            os.path.join(path, file_name)
+            for path, _, file_names in os.walk(directory)
+            for file_name in file_names
+        )
+    return list_files
@@ -0,0 +1,107 @@
+"""
+Module to test the attack_index.py module
+"""
+import json
+import os
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.attack_index import (
+    INDEX_SUFFIX, AttackIndex, attack_techniques
+)
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+
+def test_attack_techniques(test_bundle) -> None:
+    """
+    Test that the techniques of a bundle are given their first tactic, that
+    sub-techniques are named after their parent and that revoked techniques
+    are left out
+    """
+    techniques = attack_techniques(test_bundle)
+    assert techniques["T1057"] == {
+        'tactic': "discovery",
+        'technique_id': "T1057",
+        'technique_name': "Process Discovery",
+    }
+    assert techniques["T1059.004"]['technique_name'] == (
+        "Command and Scripting Interpreter: Unix Shell"
+    )
+    assert techniques["T1003"]['tactic'] == "credential-access"
+    assert "T1099" not in techniques
+
+def test_attack_index(
+    tmp_path, make_attack_pattern, test_bundle, write_test_bundle
+    ) -> None:
+    """
+    Test that the index is pickled next to the bundle and reused until the
+    bundle changes
+    """
+    bundle_path = str(tmp_path / "enterprise-attack.json")
+    write_test_bundle(bundle_path)
+    assert AttackIndex(bundle_path).built
+    assert os.path.exists(bundle_path + INDEX_SUFFIX)
+
+    attack_index = AttackIndex(bundle_path)
+    assert not attack_index.built
+    assert attack_index.technique("t1057")['tactic'] == "discovery"
+    assert attack_index.technique("T9999") is None
+
+    test_bundle['objects'].append(
+        make_attack_pattern("T1082", "System Information Discovery", [
+            "discovery"
+        ])
+    )
+    write_test_bundle(bundle_path, test_bundle)
+    attack_index = AttackIndex(bundle_path)
+    assert attack_index.built
+    assert attack_index.technique("T1082") is not None
+
+def test_step_technique(tmp_path, write_test_bundle) -> None:
+    """
+    Test that a step is given the technique of its first external reference
+    referring to one, by id or by URL
+    """
+    bundle_path = str(tmp_path / "enterprise-attack.json")
+    write_test_bundle(bundle_path)
+    attack_index = AttackIndex(bundle_path)
+    assert attack_index.step_technique({'type': "single"}) is None
+    assert attack_index.step_technique({'external_references': [
+        {'name': "Runbook", 'url': "https://example.com/runbook"},
+        {'name': "ATT&CK", 'external_id': "T1057"},
+    ]})['technique_id'] == "T1057"
+    assert attack_index.step_technique({'external_references': [
+        {'url': "https://attack.mitre.org/techniques/T1059/004/"},
+    ]})['technique_id'] == "T1059.004"
+
+def test_import_playbooks_attack_index(
+    tmp_path,
+    monkeypatch,
+    write_test_playbook,
+    make_triage_playbook,
+    write_test_bundle
+    ) -> None:
+    """
+    Test that the abilities of a step referring to a technique are filed
+    under its tactic
+    """
+    monkeypatch.chdir(tmp_path)
+    write_test_bundle("enterprise-attack.json")
+    playbook = make_triage_playbook("playbook", ["ps aux", "ps -ef"])
+    playbook['workflow']['triage']['external_references'] = [
+        {'name': "Process Discovery", 'external_id': "T1057"}
+    ]
+    write_test_playbook("playbook.json", playbook)
+    [result] = import_playbooks(
+        ["playbook.json"],
+        attack_index=AttackIndex("enterprise-attack.json")
+    )
+    assert result['error'] is None
+    assert len(os.listdir("data/abilities/discovery")) == 2
+    assert not os.path.exists("data/abilities/Miscallaneous")
+    with open("playbooks/playbook.json") as file:
+        [ability_id, _] = json.load(file)['workflow']['triage'][
+            'caldera_ability_ids'
+        ]
+    with open(f"data/abilities/discovery/{ability_id}.yml") as file:
+        contents = file.read()
+    assert "technique_id: T1057" in contents
+    assert "technique_name: Process Discovery" in contents
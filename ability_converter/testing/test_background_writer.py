@@ -0,0 +1,129 @@
+"""
+Module to test the background_writer.py module
+"""
+import os
+import threading
+
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.background_writer import BackgroundWriter, write_file
+from ability_converter.write_ability import AbilityWriter
+
+def test_background_writer_backpressure() -> None:
+    """
+    Test that submit waits for the writer threads once the queue of pending
+    writes is full
+    """
+    release = threading.Event()
+    started = threading.Event()
+    submitted = threading.Event()
+
+    def blocked_write() -> None:
+        started.set()
+        release.wait()
+
+    with BackgroundWriter(threads=1, max_queued=1) as background_writer:
+        background_writer.submit(blocked_write)
+        started.wait()
+        # The writer thread is busy, so the next write fills the queue
+        background_writer.submit(lambda: None)
+
+        def submit_one_more() -> None:
+            background_writer.submit(lambda: None)
+            submitted.set()
+
+        submitter = threading.Thread(target=submit_one_more)
+        submitter.start()
+        assert not submitted.wait(0.1)
+        release.set()
+        submitter.join()
+        assert submitted.is_set()
+
+def test_background_writer_error() -> None:
+    """
+    Test that the error of a failed write is raised by the next call to wait,
+    that the writes queued after it are skipped, and that it's raised once
+    """
+    written = []
+    release = threading.Event()
+
+    def failed_write() -> None:
+        release.wait()
+        raise OSError("disk full")
+
+    with BackgroundWriter(threads=1) as background_writer:
+        background_writer.submit(failed_write)
+        background_writer.submit(written.append, "skipped")
+        release.set()
+        with pytest.raises(OSError, match="disk full"):
+            background_writer.wait()
+        assert written == []
+
+        background_writer.submit(written.append, "written")
+        background_writer.wait()
+        assert written == ["written"]
+
+def test_background_writer_close(tmp_path) -> None:
+    """
+    Test that leaving the context writes every pending file and stops the
+    writer threads
+    """
+    with BackgroundWriter(threads=2) as background_writer:
+        for index in range(20):
+            write_file(
+                str(tmp_path / f"{index}.txt"), str(index), background_writer
+            )
+
+    assert len(os.listdir(tmp_path)) == 20
+    assert (tmp_path / "7.txt").read_text() == "7"
+    assert not any(thread.is_alive() for thread in background_writer.threads)
+
+def test_ability_writer_background(
+    tmp_path, monkeypatch, make_test_ability, list_files
+    ) -> None:
+    """
+    Test that an AbilityWriter with a background writer writes the same files
+    as one without, and only on flush
+    """
+    abilities = [
+        make_test_ability(f"ability-{index}", tactic=f"tactic-{index % 3}")
+        for index in range(30)
+    ]
+    for directory in ("sequential", "background"):
+        os.makedirs(tmp_path / directory)
+
+    monkeypatch.chdir(tmp_path / "sequential")
+    ability_writer = AbilityWriter()
+    for ability in abilities:
+        ability_writer.write(ability)
+    ability_writer.flush()
+
+    monkeypatch.chdir(tmp_path / "background")
+    with BackgroundWriter(threads=3) as background_writer:
+        ability_writer = AbilityWriter(background_writer=background_writer)
+        for ability in abilities:
+            ability_writer.write(ability)
+        background_writer.wait()
+        assert all(
+            os.path.basename(file_name).startswith(".tmp-")
+            for file_name in list_files("data")
+        )
+        ability_writer.flush()
+
+    sequential_files = list_files(str(tmp_path / "sequential"))
+    background_files = list_files(str(tmp_path / "background"))
+    assert [
+        os.path.relpath(file_name, tmp_path / "background")
+        for file_name in background_files
+    ] == [
+        os.path.relpath(file_name, tmp_path / "sequential")
+        for file_name in sequential_files
+    ]
+    for sequential_file, background_file in zip(
+        sequential_files, background_files
+    ):
+        with open(sequential_file) as file:
+            sequential_contents = file.read()
+        with open(background_file) as file:
+            assert file.read() == sequential_contents
@@ -0,0 +1,152 @@
+"""
+Module to test the caldera_library.py module
+"""
+import json
+import os
+
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.caldera_library import CACHE_FILE_NAME, CalderaLibrary
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+
+def test_caldera_library(tmp_path, monkeypatch, make_test_library) -> None:
+    """
+    Test that CalderaLibrary indexes the abilities and adversaries of data/
+    and of the plugins, whichever way their technique is given
+    """
+    monkeypatch.chdir(tmp_path)
+    make_test_library()
+    library = CalderaLibrary()
+    assert library.ability("1ab2c3") == {
+        'id': "1ab2c3",
+        'name': "Discover processes",
+        'tactic': "discovery",
+        'technique_id': "T1057",
+        'technique_name': "Process Discovery",
+        'playbook_id': "",
+        'path': "data/abilities/discovery/1ab2c3.yml",
+    }
+    assert library.ability("4de5f6")['technique_id'] == "T1005"
+    assert library.ability("4de5f6")['path'] == (
+        "plugins/stockpile/data/abilities/collection/4de5f6.yml"
+    )
+    assert library.ability("7ab8c9") is None
+    assert library.adversary("7ab8c9")['name'] == "Hunter"
+    assert library.source("7ab8c9") is None
+    assert [adversary['id'] for adversary in library.adversaries_named(
+        "Hunter"
+    )] == ["7ab8c9"]
+
+def test_caldera_library_cache(
+    tmp_path, monkeypatch, make_test_library
+    ) -> None:
+    """
+    Test that the cached index is reused, and that only the files changed
+    since it was cached are loaded again
+    """
+    monkeypatch.chdir(tmp_path)
+    make_test_library()
+    assert CalderaLibrary().loaded_count == 3
+    assert os.path.exists(CACHE_FILE_NAME)
+
+    library = CalderaLibrary()
+    assert library.loaded_count == 0
+    assert library.ability("1ab2c3")['name'] == "Discover processes"
+
+    ability_path = "data/abilities/discovery/1ab2c3.yml"
+    with open(ability_path) as file:
+        contents = file.read()
+    with open(ability_path, 'w') as file:
+        file.write(contents.replace("Discover processes", "List processes"))
+    os.remove("data/adversaries/7ab8c9.yml")
+    library.refresh()
+    assert library.loaded_count == 1
+    assert library.ability("1ab2c3")['name'] == "List processes"
+    assert library.adversary("7ab8c9") is None
+    with open(CACHE_FILE_NAME) as file:
+        assert len(json.load(file)['files']) == 2
+
+def test_check_adversary_name(tmp_path, monkeypatch, make_test_library) -> None:
+    """
+    Test that a name can only be given to the adversary already having it
+    """
+    monkeypatch.chdir(tmp_path)
+    make_test_library()
+    library = CalderaLibrary()
+    library.check_adversary_name("Hunter", "7ab8c9")
+    library.check_adversary_name("Gatherer", "other id")
+    with pytest.raises(ValueError, match="already used by adversary 7ab8c9"):
+        library.check_adversary_name("Hunter", "other id")
+
+def test_import_playbooks_library(
+    tmp_path,
+    monkeypatch,
+    make_test_playbook,
+    write_test_playbook,
+    make_test_library
+    ) -> None:
+    """
+    Test that attack-cmd commands must refer to an ability of the library,
+    which is recorded in the updated playbook, and that a profile can't take
+    the name of another adversary
+    """
+    monkeypatch.chdir(tmp_path)
+    make_test_library()
+    library = CalderaLibrary()
+    playbook = make_test_playbook("playbook", [])
+    playbook['workflow']['step_0']['on_completion'] = "attack"
+    playbook['workflow']['attack'] = {
+        'type': "single",
+        'name': "Attack",
+        'description': "",
+        'commands': [{'type': "attack-cmd", 'command': {'id': "unknown"}}],
+        'on_completion': "step_1",
+    }
+    write_test_playbook("playbook.json", playbook)
+    [result] = import_playbooks(["playbook.json"], library=library)
+    assert "refers to the unknown ability 'unknown'" in result['error']
+
+    playbook['workflow']['attack']['commands'][0]['command']['id'] = "1ab2c3"
+    write_test_playbook("playbook.json", playbook)
+    [result] = import_playbooks(["playbook.json"], library=library)
+    assert result['error'] is None
+    with open("playbooks/playbook.json") as file:
+        [command] = json.load(file)['workflow']['attack']['commands']
+    assert command['command'] == {
+        'id': "1ab2c3",
+        'name': "Discover processes",
+        'tactic': "discovery",
+        'technique_id': "T1057",
+        'technique_name': "Process Discovery",
+    }
+
+    playbook['name'] = "Hunter"
+    write_test_playbook("playbook.json", playbook)
+    [result] = import_playbooks(["playbook.json"], library=library)
+    assert "already used by adversary 7ab8c9" in result['error']
+
+def test_import_playbooks_library_again(
+    tmp_path, monkeypatch, make_test_library, test_playbook_paths
+    ) -> None:
+    """
+    Test that a playbook can be imported again into the Caldera directory of
+    the library, though the profile of the earlier import has its name
+    """
+    monkeypatch.chdir(tmp_path)
+    make_test_library()
+    playbook_path = test_playbook_paths[1]
+    [first_result] = import_playbooks([playbook_path], library=CalderaLibrary())
+    assert first_result['error'] is None
+    library = CalderaLibrary()
+    [adversary] = library.adversaries_named("Incident Responder 1")
+    assert adversary['id'] == first_result['caldera_id']
+    assert adversary['playbook_id'] == first_result['playbook_id']
+
+    [second_result] = import_playbooks([playbook_path], library=library)
+    assert second_result['error'] is None
+    assert second_result['caldera_id'] != first_result['caldera_id']
+    with pytest.raises(ValueError, match="already used by adversary"):
+        library.check_adversary_name(
+            "Incident Responder 1", "other id", "other playbook"
+        )
@@ -0,0 +1,91 @@
+"""
+Module to test the caldera_sink.py and caldera_stand_in.py modules
+"""
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.caldera_sink import (
+    CalderaApiError, CalderaClient, CalderaSink
+)
+from ability_converter.caldera_stand_in import CalderaStandIn
+from ability_converter.cacao_importer import import_playbooks
+from ability_converter.output_sink import MemorySink
+from ability_converter.write_ability import AbilityWriter
+
+def test_import_to_caldera(test_playbook_paths) -> None:
+    """
+    Test that importing to a CalderaSink loads the abilities, adversaries and
+    sources into Caldera over a bounded number of connections, writes the
+    other files to the fallback and doesn't put unchanged files again
+    """
+    fallback = MemorySink()
+    with CalderaStandIn() as server:
+        with CalderaSink(
+            CalderaClient(server.url, server.api_key, concurrency=3),
+            fallback=fallback
+        ) as sink:
+            results = import_playbooks.import_playbooks(
+                test_playbook_paths, deterministic_ids=True, sink=sink
+            )
+            requests = server.requests
+            import_playbooks.import_playbooks(
+                test_playbook_paths, deterministic_ids=True, sink=sink
+            )
+            assert server.requests == requests
+
+    assert [result['error'] for result in results] == [None, None]
+    assert set(server.objects['adversaries']) == {
+        result['caldera_id'] for result in results
+    }
+    assert len(server.objects['sources']) == 2
+    adversary = server.objects['adversaries'][results[0]['caldera_id']]
+    assert adversary['atomic_ordering']
+    for ability_id in adversary['atomic_ordering']:
+        assert server.objects['abilities'][ability_id]['ability_id'] == (
+            ability_id
+        )
+    assert server.connections <= 3
+    assert all(
+        file_name.startswith("playbooks/") for file_name in fallback.files
+    )
+
+def test_caldera_client_retries() -> None:
+    """
+    Test that a request is retried while Caldera is unavailable, and fails
+    once the retries run out
+    """
+    with CalderaStandIn() as server:
+        client = CalderaClient(
+            server.url, server.api_key, max_retries=2, backoff_seconds=0.01
+        )
+        server.fail_requests(2)
+        status, _ = client.request("PUT", "sources/test", {'id': "test"})
+        assert status == 200
+        assert server.requests == 3
+
+        server.fail_requests(3)
+        with pytest.raises(CalderaApiError) as error:
+            client.request("PUT", "sources/test", {'id': "test"})
+        assert error.value.status == 503
+        client.close()
+
+def test_caldera_sink_refused(make_test_ability) -> None:
+    """
+    Test that an ability refused by Caldera fails the flush, and that
+    removing an ability file deletes the ability
+    """
+    with CalderaStandIn() as server:
+        with CalderaSink(CalderaClient(server.url, "wrong key")) as sink:
+            ability_writer = AbilityWriter(sink=sink)
+            ability_writer.write(make_test_ability("test-1"))
+            with pytest.raises(CalderaApiError):
+                ability_writer.flush()
+
+        with CalderaSink(CalderaClient(server.url, server.api_key)) as sink:
+            ability_writer = AbilityWriter(sink=sink)
+            ability_writer.write(make_test_ability("test-1"))
+            ability_writer.flush()
+            assert "test-1" in server.objects['abilities']
+            assert sink.remove("data/abilities/Miscallaneous/test-1.yml")
+            assert not sink.remove("data/abilities/Miscallaneous/test-1.yml")
+    assert server.objects['abilities'] == {}
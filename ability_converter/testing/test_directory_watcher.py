@@ -0,0 +1,87 @@
+"""
+Module to test the directory_watcher.py module
+"""
+import os
+import threading
+import time
+
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.directory_watcher import (
+    DirectoryWatcher, InotifyWatcher, PollingWatcher, open_watcher,
+    wait_for_changes
+)
+
+def make_inotify_watcher(directory: str) -> InotifyWatcher:
+    """Return an InotifyWatcher, skipping the test if it can't be used"""
+    try:
+        return InotifyWatcher(directory, ".json")
+    except OSError as error:
+        pytest.skip(f"inotify isn't available: {error}")
+
+def test_incomplete_directory_watcher(tmp_path) -> None:
+    """
+    Test that a watcher which doesn't implement changes can't be created
+    """
+    class ListingWatcher(DirectoryWatcher):
+        """Class object for a watcher which can only list files"""
+
+    with pytest.raises(TypeError, match="changes"):
+        # pylint: disable=abstract-class-instantiated
+        ListingWatcher(str(tmp_path), ".json")
+
+@pytest.mark.parametrize("kind", ["polling", "inotify"])
+def test_watcher_changes(tmp_path, kind) -> None:
+    """
+    Test that a watcher returns the watched files added or changed, ignoring
+    other and hidden files, and nothing once the timeout passes
+    """
+    (tmp_path / "existing.json").write_text("{}")
+    watcher = (
+        PollingWatcher(str(tmp_path), ".json", poll_interval=0.01)
+        if kind == "polling" else make_inotify_watcher(str(tmp_path))
+    )
+    with watcher:
+        assert watcher.changes(0.05) == set()
+
+        (tmp_path / "new.json").write_text("{}")
+        (tmp_path / "notes.txt").write_text("")
+        (tmp_path / ".new.json.part").write_text("")
+        assert watcher.changes(5) == {str(tmp_path / "new.json")}
+
+        (tmp_path / ".moved.part").write_text("{}")
+        os.replace(tmp_path / ".moved.part", tmp_path / "moved.json")
+        assert watcher.changes(5) == {str(tmp_path / "moved.json")}
+        assert watcher.list_files() == {
+            str(tmp_path / name)
+            for name in ("existing.json", "new.json", "moved.json")
+        }
+
+def test_wait_for_changes_debounces(tmp_path) -> None:
+    """
+    Test that wait_for_changes returns the files of a burst of changes
+    together, once the directory is quiet
+    """
+    def write_burst() -> None:
+        for index in range(5):
+            (tmp_path / f"{index}.json").write_text("{}")
+            time.sleep(0.02)
+
+    with open_watcher(str(tmp_path), ".json") as watcher:
+        writer = threading.Thread(target=write_burst)
+        writer.start()
+        changed = wait_for_changes(watcher, debounce=0.2, timeout=5)
+        writer.join()
+
+    assert changed == {str(tmp_path / f"{index}.json") for index in range(5)}
+
+def test_open_watcher_polling(tmp_path) -> None:
+    """
+    Test that open_watcher gives a polling watcher when asked for and refuses
+    a missing directory
+    """
+    with open_watcher(str(tmp_path), polling=True) as watcher:
+        assert isinstance(watcher, PollingWatcher)
+    with pytest.raises(NotADirectoryError):
+        open_watcher(str(tmp_path / "missing"))
@@ -0,0 +1,87 @@
+"""
+Module to test the benchmarks generate_playbook.py and bench_pipeline.py
+modules
+"""
+from collections import Counter
+
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.benchmarks import bench_pipeline
+from ability_converter.benchmarks.generate_playbook import (
+    default_parameters, generate_playbooks, write_playbooks
+)
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+
+def test_generate_playbooks() -> None:
+    """
+    Test that the generated playbooks have the number of steps asked for,
+    embed playbooks down to the nesting depth and are the same for a seed
+    """
+    parameters = default_parameters(
+        steps=300, branching=0.5, nesting_depth=2, playbook_steps=0.1,
+        nested_steps=40, seed=7
+    )
+    playbooks = generate_playbooks(parameters)
+
+    assert list(playbooks)[0] == "synthetic-7"
+    assert {
+        playbook_id: len(playbook['workflow'])
+        for playbook_id, playbook in playbooks.items()
+    } == {"synthetic-7": 300, "synthetic-7-1": 40, "synthetic-7-2": 40}
+    step_types = Counter(
+        step['type'] for step in playbooks["synthetic-7"]['workflow'].values()
+    )
+    assert step_types['playbook'] > 0
+    assert step_types['parallel'] + step_types['switch-condition'] > 0
+    assert not any(
+        step['type'] == "playbook"
+        for step in playbooks["synthetic-7-2"]['workflow'].values()
+    )
+    assert generate_playbooks(parameters) == playbooks
+
+def test_default_parameters_unknown() -> None:
+    """Test that an unknown playbook parameter is rejected"""
+    with pytest.raises(TypeError):
+        default_parameters(stepz=10)
+
+def test_generated_playbook_converts(tmp_path, monkeypatch) -> None:
+    """
+    Test that a generated playbook with embedded playbooks is imported
+    without errors
+    """
+    monkeypatch.chdir(tmp_path)
+    path = write_playbooks(
+        default_parameters(steps=100, nesting_depth=1, playbook_steps=0.2),
+        "input"
+    )
+    [result] = import_playbooks([path])
+
+    assert result['error'] is None
+
+def test_run_benchmarks() -> None:
+    """
+    Test that the benchmarks record the time of every stage and the peak
+    memory of each scenario, and report regressions against a baseline
+    """
+    results = bench_pipeline.run_benchmarks(
+        ["baseline", "branching"], repeat=1, scale=0.02, label="test"
+    )
+
+    assert list(results['scenarios']) == ["baseline", "branching"]
+    for result in results['scenarios'].values():
+        assert set(result['timings']) == {*bench_pipeline.STAGES, 'total'}
+        assert result['abilities'] > 0
+        assert result['peak_memory'] > 0
+
+    faster_baseline = {
+        **results,
+        'scenarios': {
+            name: {**result, 'peak_memory': result['peak_memory'] // 2}
+            for name, result in results['scenarios'].items()
+        }
+    }
+    assert bench_pipeline.compare_results(results, results) == []
+    assert bench_pipeline.compare_results(results, faster_baseline) == [
+        "baseline peak_memory x2.00", "branching peak_memory x2.00"
+    ]
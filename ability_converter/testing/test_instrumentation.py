@@ -0,0 +1,49 @@
+"""
+Module to test the instrumentation.py module
+"""
+import time
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter import instrumentation
+
+def test_inactive_profiler() -> None:
+    """
+    Test that nothing is recorded while no profiler is active
+    """
+    profiler = instrumentation.Profiler()
+    with profiler.activate():
+        pass
+    assert instrumentation.span("phase") is instrumentation.NULL_SPAN
+    with instrumentation.span("phase"):
+        instrumentation.count("steps")
+
+    assert profiler.report()['spans'] == {}
+    assert profiler.report()['counters'] == {}
+
+def test_nested_spans() -> None:
+    """
+    Test that the time of nested spans is excluded from the self time of the
+    outer span, and spans nested in a span of the same name are only counted
+    once in its total
+    """
+    profiler = instrumentation.Profiler()
+    with profiler.activate():
+        with instrumentation.span("outer"):
+            with instrumentation.span("inner"):
+                time.sleep(0.01)
+            with instrumentation.span("outer"):
+                time.sleep(0.01)
+            instrumentation.count("steps", 2)
+        instrumentation.count("steps")
+    assert instrumentation.active_profiler is None
+
+    report = profiler.report()
+    outer = report['spans']['outer']
+    inner = report['spans']['inner']
+    assert outer['calls'] == 2 and inner['calls'] == 1
+    assert outer['total_seconds'] >= 0.02
+    assert outer['total_seconds'] < inner['total_seconds'] + 0.02
+    assert outer['self_seconds'] >= 0.01
+    assert outer['self_seconds'] < outer['total_seconds'] - 0.009
+    assert report['wall_seconds'] >= outer['total_seconds']
+    assert report['counters'] == {'steps': 3}
@@ -0,0 +1,149 @@
+"""
+Module to test the output_sink.py module
+"""
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.atomic_file import FILE_MODE, write_bytes_atomic
+from ability_converter.output_sink import (
+    ArchiveSink, DirectorySink, MemorySink, OutputSink
+)
+from ability_converter.write_ability import AbilityWriter, BundleWriter
+
+def test_incomplete_output_sink() -> None:
+    """
+    Test that a sink which doesn't implement every abstract method of
+    OutputSink can't be created
+    """
+    class ReadOnlySink(OutputSink):
+        """Class object for a sink which can only read files"""
+
+        def read(self, file_name: str) -> None:
+            return None
+
+    with pytest.raises(TypeError, match="commit, open_staged, remove"):
+        ReadOnlySink()  # pylint: disable=abstract-class-instantiated
+
+def test_directory_sink(tmp_path, list_files) -> None:
+    """
+    Test that a DirectorySink writes files below its root, leaves unchanged
+    files alone and only replaces staged files on commit
+    """
+    sink = DirectorySink(str(tmp_path / "caldera"))
+    assert sink.write("data/sources/test.yml", "facts: []\n")
+    assert not sink.write("data/sources/test.yml", "facts: []\n")
+    assert sink.read("data/sources/test.yml") == "facts: []\n"
+    assert sink.read("data/sources/missing.yml") is None
+
+    staged = sink.stage("data/sources/test.yml", "facts: [1]\n")
+    assert sink.read("data/sources/test.yml") == "facts: []\n"
+    sink.commit([(staged, "data/sources/test.yml")])
+    assert (tmp_path / "caldera/data/sources/test.yml").read_text() == (
+        "facts: [1]\n"
+    )
+
+    assert sink.remove("data/sources/test.yml")
+    assert not sink.remove("data/sources/test.yml")
+    assert list_files(str(tmp_path)) == []
+    assert sink.input_path("playbooks/child") == str(
+        tmp_path / "caldera/playbooks/child"
+    )
+
+def test_directory_sink_file_mode(tmp_path) -> None:
+    """
+    Test that the files written are given the mode of files created under
+    the umask, rather than that of their temporary files
+    """
+    sink = DirectorySink(str(tmp_path))
+    sink.write("data/sources/test.yml", "facts: []\n")
+    staged = sink.stage("data/sources/staged.yml", "facts: []\n")
+    sink.commit([(staged, "data/sources/staged.yml")])
+    write_bytes_atomic(str(tmp_path / "test.pickle"), b"contents")
+
+    for path in [
+        tmp_path / "data/sources/test.yml",
+        tmp_path / "data/sources/staged.yml",
+        tmp_path / "test.pickle",
+    ]:
+        assert os.stat(path).st_mode & 0o777 == FILE_MODE
+
+def test_write_chunks(tmp_path, list_files) -> None:
+    """
+    Test that contents written in chunks are only written if they differ
+    from those of the file, leaving no staged file behind either way
+    """
+    for sink in [DirectorySink(str(tmp_path)), MemorySink()]:
+        assert sink.write_chunks("playbooks/test.json", ["{", "}"])
+        assert sink.read("playbooks/test.json") == "{}"
+        assert not sink.write_chunks("playbooks/test.json", ["{}"])
+        assert sink.write_chunks("playbooks/test.json", ["[", "]"])
+        assert sink.read("playbooks/test.json") == "[]"
+    assert list_files(str(tmp_path)) == [str(tmp_path / "playbooks/test.json")]
+
+def test_memory_sink(make_test_ability) -> None:
+    """
+    Test that abilities and bundles written to a MemorySink are held in
+    memory, and that discarded abilities never appear
+    """
+    sink = MemorySink()
+    ability_writer = AbilityWriter(max_buffered_bytes=0, sink=sink)
+    ability_writer.write(make_test_ability("discarded"))
+    ability_writer.discard()
+    ability_writer.write(make_test_ability("test-1", tactic="collection"))
+    ability_writer.flush()
+
+    assert list(sink.files) == ["data/abilities/collection/test-1.yml"]
+    assert "id: test-1" in sink.files["data/abilities/collection/test-1.yml"]
+
+    bundle_writer = BundleWriter("bundle-1", sink=sink)
+    bundle_writer.write(make_test_ability("test-2"))
+    bundle_writer.flush()
+    assert sink.files["data/abilities/bundles/bundle-1.yml"].startswith(
+        "---\n"
+    )
+    assert "data/abilities/bundles/bundle-1.index.json" in sink.files
+
+@pytest.mark.parametrize("archive_name", ["library.zip", "library.tar.gz"])
+def test_archive_sink(tmp_path, archive_name, make_test_ability) -> None:
+    """
+    Test that an ArchiveSink appends committed files to the archive, once
+    for unchanged contents, and leaves discarded files out
+    """
+    path = str(tmp_path / archive_name)
+    with ArchiveSink(path) as sink:
+        ability_writer = AbilityWriter(max_buffered_bytes=0, sink=sink)
+        ability_writer.write(make_test_ability("discarded"))
+        ability_writer.discard()
+        for ability_id in ("test-1", "test-2", "test-1"):
+            ability_writer.write(make_test_ability(ability_id))
+        ability_writer.flush()
+        assert sink.write("data/sources/test.yml", "facts: []\n")
+        assert not sink.write("data/sources/test.yml", "facts: []\n")
+        assert sink.exists("data/sources/test.yml")
+
+    if archive_name.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            names = archive.namelist()
+            contents = archive.read("data/sources/test.yml").decode()
+    else:
+        with tarfile.open(path) as archive:
+            names = archive.getnames()
+            contents = archive.extractfile(
+                "data/sources/test.yml"
+            ).read().decode()
+    assert names == [
+        "data/abilities/Miscallaneous/test-1.yml",
+        "data/abilities/Miscallaneous/test-2.yml",
+        "data/sources/test.yml",
+    ]
+    assert contents == "facts: []\n"
+    assert os.listdir(tmp_path) == [archive_name]
+
+def test_archive_sink_unknown_extension(tmp_path) -> None:
+    """Test that an archive with an unknown extension is refused"""
+    with pytest.raises(ValueError):
+        ArchiveSink(str(tmp_path / "library.rar"))
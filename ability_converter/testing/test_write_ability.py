@@ -0,0 +1,110 @@
+"""
+Module to test the write_ability.py module
+"""
+import json
+
+import yaml
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter.write_ability import (
+    AbilityWriter, BundleWriter, format_ability
+)
+
+def test_format_ability(make_test_ability) -> None:
+    """
+    Test that format_ability files an ability without a tactic under
+    Miscallaneous and fills in the default technique
+    """
+    file_name, contents = format_ability(make_test_ability("ability_01"))
+
+    assert file_name == "data/abilities/Miscallaneous/ability_01.yml"
+    [ability] = yaml.safe_load(contents)
+    assert ability['tactic'] == "Miscallaneous"
+    assert ability['technique_id'] == "x|x"
+
+def test_ability_writer_flush(
+    tmp_path, monkeypatch, make_test_ability, list_files
+    ) -> None:
+    """
+    Test that AbilityWriter only writes the abilities on flush, staging them
+    to temporary files once the buffer limit is exceeded
+    """
+    monkeypatch.chdir(tmp_path)
+    writer = AbilityWriter(max_buffered_bytes=500)
+    for index in range(5):
+        writer.write(make_test_ability(f"ability_{index:02}", "Start"))
+
+    # Some abilities have been staged but none are in the library yet
+    assert writer.staged_files
+    assert not [
+        file_name for file_name in list_files("data")
+        if file_name.endswith(".yml")
+    ]
+
+    writer.flush()
+    assert list_files("data") == [
+        f"data/abilities/Start/ability_{index:02}.yml" for index in range(5)
+    ]
+
+def test_ability_writer_discard(
+    tmp_path, monkeypatch, make_test_ability, list_files
+    ) -> None:
+    """
+    Test that AbilityWriter leaves no files behind when discarded
+    """
+    monkeypatch.chdir(tmp_path)
+    writer = AbilityWriter(max_buffered_bytes=0)
+    writer.write(make_test_ability("ability_01"))
+    writer.write(make_test_ability("ability_02", "End"))
+    writer.discard()
+    writer.flush()
+
+    assert list_files("data") == []
+
+def test_bundle_writer_flush(
+    tmp_path, monkeypatch, make_test_ability, list_files
+    ) -> None:
+    """
+    Test that BundleWriter writes every ability as a document of one bundle
+    with an index, and leaves an unchanged bundle alone
+    """
+    monkeypatch.chdir(tmp_path)
+    abilities = [make_test_ability("ability_01", "Start")] + [
+        make_test_ability(f"ability_{index:02}") for index in range(2, 4)
+    ]
+    for expected_written_count in (3, 0):
+        writer = BundleWriter("bundle_01")
+        for ability in abilities:
+            writer.write(ability)
+        writer.flush()
+        assert writer.written_count == expected_written_count
+
+    assert list_files("data") == [
+        "data/abilities/bundles/bundle_01.index.json",
+        "data/abilities/bundles/bundle_01.yml",
+    ]
+    with open("data/abilities/bundles/bundle_01.yml") as file:
+        documents = list(yaml.safe_load_all(file))
+    assert [ability['id'] for [ability] in documents] == [
+        "ability_01", "ability_02", "ability_03"
+    ]
+    assert documents[1][0]['tactic'] == "Miscallaneous"
+    with open("data/abilities/bundles/bundle_01.index.json") as file:
+        index = json.loads(file.read())
+    assert [(entry['id'], entry['document']) for entry in index] == [
+        ("ability_01", 0), ("ability_02", 1), ("ability_03", 2)
+    ]
+
+def test_bundle_writer_discard(
+    tmp_path, monkeypatch, make_test_ability, list_files
+    ) -> None:
+    """
+    Test that BundleWriter leaves no files behind when discarded
+    """
+    monkeypatch.chdir(tmp_path)
+    writer = BundleWriter("bundle_01")
+    writer.write(make_test_ability("ability_01"))
+    writer.discard()
+    writer.flush()
+
+    assert list_files("data") == []
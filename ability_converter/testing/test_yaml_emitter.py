@@ -0,0 +1,118 @@
+"""
+Module to test the yaml_emitter.py module
+"""
+import os
+import random
+
+import pytest
+import yaml
+
+# pylint: disable=import-error, wrong-import-position
+from ability_converter import yaml_emitter
+from ability_converter.cacao_importer.import_playbooks import import_playbooks
+
+TEST_PLAYBOOKS_PATH: str = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "test_playbooks"
+)
+
+class PythonDumper(yaml.Dumper): # pylint: disable=too-many-ancestors
+    """Pure Python Dumper writing repeated objects in full"""
+
+    def ignore_aliases(self, data) -> bool:
+        return True
+
+def python_dump(data) -> str:
+    """Serialise data with the pure Python PyYAML emitter"""
+    return yaml.dump(data, Dumper=PythonDumper)
+
+TEST_STRINGS = [
+    "", " ", "plain text", "trailing space ", " leading space", "yes", "No",
+    "TRUE", "null", "~", "123", "1.5", "0x1f", "2024-01-01", "1:20", ".inf",
+    "x|x", "- item", "key: value", "comment #here", "#comment", "'quoted'",
+    '"double"', "it's", "{curly}", "[square]", "*alias", "&anchor", "!tag",
+    "%directive", "@at", "`tick`", "a,b", "path/to/file.sh", "<<",
+    "C:\\Windows\\System32", "tab\tseparated", "line\nbreak", "unicode é",
+    "x" * 200, "long " * 30, "#{host.ip} ping -c 1",
+    # Escaped strings long enough to be folded
+    "é " * 60, "line\nbreak and more words " * 8, "\x07bell " * 30,
+    "naïve café crème brûlée " * 5,
+]
+
+@pytest.mark.parametrize("value", TEST_STRINGS)
+def test_dump_yaml_strings(value: str) -> None:
+    """
+    Test that dump_yaml writes strings exactly as PyYAML does, in mappings
+    and sequences at several depths
+    """
+    for data in (
+        {'key': value},
+        [value],
+        [{'command': value, 'list': [value, {'nested': value}]}],
+        {value or 'key': [[value]]},
+    ):
+        assert yaml_emitter.dump_yaml(data) == python_dump(data)
+        assert yaml.safe_load(yaml_emitter.dump_yaml(data)) == data
+
+def test_dump_yaml_random_strings() -> None:
+    """
+    Test that dump_yaml writes random strings mixing indicators, escaped
+    characters and spaces exactly as PyYAML does, whichever Dumper they fall
+    back to
+    """
+    characters = list("ab  :#'\"-|{}[],&*!`\\/.\n\t\x07é€") + ["word "]
+    generator = random.Random(0)
+    for _ in range(500):
+        value = "".join(
+            generator.choice(characters)
+            for _ in range(generator.randint(0, 160))
+        )
+        data = [{'command': value, 'list': [value]}]
+        assert yaml_emitter.dump_yaml(data) == python_dump(data)
+
+def test_dump_yaml_other_types() -> None:
+    """
+    Test that dump_yaml writes documents which the specialised emitter
+    doesn't support, such as floats, empty documents and long keys, through
+    PyYAML
+    """
+    for data in ({'float': 1.5}, {}, [], {1: "integer"}, {"k" * 200: "long"}):
+        with pytest.raises(yaml_emitter.UnsupportedDocument):
+            yaml_emitter.emit_document(data)
+        assert yaml_emitter.dump_yaml(data) == python_dump(data)
+
+def test_dump_yaml_repeated_objects() -> None:
+    """
+    Test that dump_yaml writes an object used several times in full rather
+    than as an alias
+    """
+    fact = {'trait': "host.ip", 'value': ""}
+    data = [{'facts': [fact]}, {'facts': [fact]}]
+
+    assert yaml_emitter.dump_yaml(data) == python_dump(data)
+    assert "&" not in yaml_emitter.dump_yaml(data)
+    assert yaml.dump(
+        data, Dumper=yaml_emitter.Dumper
+    ) == yaml_emitter.dump_yaml(data)
+
+def test_dump_yaml_converted_playbooks(tmp_path, monkeypatch) -> None:
+    """
+    Test that every ability, profile and source written for the test
+    playbooks is exactly as PyYAML would write it
+    """
+    monkeypatch.chdir(tmp_path)
+    paths = [
+        os.path.join(TEST_PLAYBOOKS_PATH, file_name)
+        for file_name in sorted(os.listdir(TEST_PLAYBOOKS_PATH))
+        if file_name.endswith(".json")
+    ]
+    results = import_playbooks(paths)
+    assert [result['error'] for result in results] == [None] * len(paths)
+
+    number_of_files = 0
+    for path, _, file_names in os.walk("data"):
+        for file_name in file_names:
+            with open(os.path.join(path, file_name)) as file:
+                contents = file.read()
+            assert contents == python_dump(yaml.safe_load(contents))
+            number_of_files += 1
+    assert number_of_files > len(paths)
@@ -4,21 +4,43 @@ Module adds an ability to Caldera framework
 Below are the inputs required to create an ability are found at:
 https://caldera.readthedocs.io/en/latest/Basic-Usage.html
 """
-import os
+import json
 import string
+import threading
 
-import yaml
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple, TypedDict
 
 # pylint: disable=import-error, no-name-in-module
 from ability_converter.ability_types import Ability
+from ability_converter.background_writer import BackgroundWriter
+from ability_converter.instrumentation import count, span
+from ability_converter.output_sink import DirectorySink, OutputSink
+from ability_converter.yaml_emitter import dump_yaml
 
 # Constant defining the set of alphanumeric characters
 ALPHANUMERIC_CHARS = list(string.digits + string.ascii_lowercase)
 
-def write_ability(ability: Ability) -> None:
+# Constant defining the number of bytes of abilities an AbilityWriter holds in
+# memory before staging them to the output sink
+MAX_BUFFERED_BYTES = 16 * 1024 * 1024
+
+# Constant defining the directory holding the ability bundle of each playbook
+BUNDLE_DIRECTORY = "data/abilities/bundles"
+
+
+class BundleIndexEntry(TypedDict):
+    """Class defining the entry of an ability in the index of a bundle"""
+    id: str
+    name: str
+    tactic: str
+    technique_id: str
+    technique_name: str
+    document: int
+
+def format_ability(ability: Ability) -> Tuple[str, str]:
     """
-    Function creates yaml file consisting of the data of the input ability with
-    the file name as ability[id].yml
+    Function returns the file name, data/abilities/{tactic}/{id}.yml, and the
+    yaml contents of the file describing the input ability
     """
     # Construct the file_contents in the appropriate format using the contents
     # the ability
@@ -36,13 +58,230 @@ def write_ability(ability: Ability) -> None:
         "executors": ability['executors']
     }
 
-    # Ensure directory containing abilities of the same tactic is created
-    tactic_folder_path = f"data/abilities/{file_contents['tactic']}"
     file_name = (
         f"data/abilities/{file_contents['tactic']}/{file_contents['id']}.yml"
     )
-    os.makedirs(tactic_folder_path, exist_ok=True)
+    return file_name, dump_yaml([file_contents])
+
+def write_ability(ability: Ability, sink: Optional[OutputSink] = None) -> None:
+    """
+    Function creates yaml file consisting of the data of the input ability with
+    the file name as ability[id].yml, in the working directory unless another
+    sink is given
+    """
+    # Write the contents of the ability to the .yaml file. The directory of
+    # the tactic is created if necessary and the file is replaced atomically
+    # so that concurrent imports never see a partially written ability
+    (sink or DirectorySink()).write(*format_ability(ability))
+
+
+class AbilityWriter:
+    """
+    Class object buffering the abilities of a playbook and writing them to the
+    Caldera library in bulk
+
+    Abilities are written to sink, by default the working directory. They are
+    held in memory, and staged once more than max_buffered_bytes are held. If
+    a background_writer is given, each ability is instead staged by its writer
+    threads as soon as it's added. None of the abilities appear in the Caldera
+    library until flush is called, at which point every staged file is
+    committed to the sink. If the import fails,
+    discard drops the staged files, leaving the library untouched. Abilities
+    whose file already holds the same contents aren't written again. Files of
+    abilities which are no longer produced can be deleted on flush too.
+    """
+
+    def __init__(
+        self,
+        max_buffered_bytes: int = MAX_BUFFERED_BYTES,
+        background_writer: Optional[BackgroundWriter] = None,
+        sink: Optional[OutputSink] = None
+        ) -> None:
+        """Initialise AbilityWriter class"""
+        self.max_buffered_bytes: int = max_buffered_bytes
+        self.background_writer: Optional[BackgroundWriter] = background_writer
+        self.sink: OutputSink = sink or DirectorySink()
+        # The contents of the abilities held in memory, keyed by file name
+        self.buffered_files: Dict[str, str] = {}
+        self.buffered_bytes: int = 0
+        # The (staged file handle, file name) pairs of the staged abilities
+        self.staged_files: List[Tuple[Any, str]] = []
+        # The names of the files of every ability added, in order
+        self.file_names: List[str] = []
+        # The files to delete on flush
+        self.deleted_files: Set[str] = set()
+        # The number of abilities written and left unchanged on flush
+        self.written_count: int = 0
+        self.unchanged_count: int = 0
+        # Guards the staged files and counts updated by the writer threads
+        self.lock = threading.Lock()
+
+    def write(self, ability: Ability) -> None:
+        """Add an ability to the abilities to be written"""
+        count("abilities")
+        file_name, contents = format_ability(ability)
+        self.file_names.append(file_name)
+        if self.background_writer is not None:
+            self.background_writer.submit(
+                self.stage_ability, file_name, contents
+            )
+            return
+        self.buffered_files[file_name] = contents
+        self.buffered_bytes += len(contents)
+        if self.buffered_bytes > self.max_buffered_bytes:
+            self.stage()
+
+    def delete(self, file_name: str) -> None:
+        """Add a file to the files to be deleted from the Caldera library"""
+        self.deleted_files.add(file_name)
+
+    def stage_ability(self, file_name: str, contents: str) -> None:
+        """
+        Stage an ability to the sink, unless its file holds the same contents
+        already
+        """
+        with span("write_files"):
+            if self.sink.has_contents(file_name, contents):
+                count("files_unchanged")
+                with self.lock:
+                    self.unchanged_count += 1
+                return
+            staged_file: Tuple[Any, str] = (
+                self.sink.stage(file_name, contents), file_name
+            )
+        with self.lock:
+            self.staged_files.append(staged_file)
+
+    def stage(self) -> None:
+        """Stage the abilities held in memory to the sink"""
+        for file_name, contents in self.buffered_files.items():
+            self.stage_ability(file_name, contents)
+        self.buffered_files = {}
+        self.buffered_bytes = 0
+
+    def flush(self) -> None:
+        """Write every ability added to the Caldera library"""
+        try:
+            self.stage()
+            if self.background_writer is not None:
+                self.background_writer.wait()
+            with span("write_files"):
+                self.sink.commit(self.staged_files)
+        except BaseException:
+            self.discard()
+            raise
+        self.written_count += len(self.staged_files)
+        self.staged_files = []
+
+        # Delete the files after the new abilities are in place, keeping any
+        # which have been written again
+        written_files: Set[str] = set(self.file_names)
+        for file_name in self.deleted_files - written_files:
+            if self.sink.remove(file_name):
+                count("files_deleted")
+        self.deleted_files = set()
+
+    def discard(self) -> None:
+        """Drop every ability added which hasn't been flushed"""
+        if self.background_writer is not None:
+            # Let the pending writes finish so that none of their staged
+            # files are left behind. Their errors are superseded by the one
+            # which caused the import to be abandoned
+            try:
+                self.background_writer.wait()
+            except Exception: # pylint: disable=broad-except
+                pass
+        self.sink.discard(self.staged_files)
+        self.staged_files = []
+        self.buffered_files = {}
+        self.buffered_bytes = 0
+        self.deleted_files = set()
+
+
+class BundleWriter(AbilityWriter):
+    """
+    Class object writing every ability of a playbook to a single
+    multi-document YAML bundle rather than one file per ability
+
+    Each ability is a document of the bundle, which Caldera loads like any
+    other ability file. The abilities are streamed to a temporary file as they
+    are added and the bundle is committed to the sink on flush, alongside a
+    JSON index of the abilities it holds. An unchanged bundle isn't written
+    again.
+    """
+
+    def __init__(
+        self,
+        bundle_id: str,
+        sink: Optional[OutputSink] = None
+        ) -> None:
+        """Initialise BundleWriter class"""
+        super().__init__(max_buffered_bytes=0, sink=sink)
+        self.bundle_file_name: str = f"{BUNDLE_DIRECTORY}/{bundle_id}.yml"
+        self.index_file_name: str = (
+            f"{BUNDLE_DIRECTORY}/{bundle_id}.index.json"
+        )
+        self.index: List[BundleIndexEntry] = []
+        # The staged file the abilities are streamed to, once opened
+        self.staged_bundle: Optional[Tuple[Any, TextIO]] = None
+
+    def write(self, ability: Ability) -> None:
+        """Add an ability to the bundle"""
+        count("abilities")
+        _, contents = format_ability(ability)
+        with span("write_files"):
+            if self.staged_bundle is None:
+                self.staged_bundle = self.sink.open_staged(
+                    self.bundle_file_name
+                )
+            count(
+                "bytes_written",
+                self.staged_bundle[1].write(f"---\n{contents}")
+            )
+        self.file_names.append(self.bundle_file_name)
+        self.index.append({
+            'id': ability['id'],
+            'name': ability['name'],
+            'tactic': ability['tactic'] or "Miscallaneous",
+            'technique_id': ability['technique_id'] or "x|x",
+            'technique_name': ability['technique_name'] or "Miscallaneous",
+            'document': len(self.index)
+        })
+
+    def flush(self) -> None:
+        """Write the bundle and its index to the Caldera library"""
+        if self.staged_bundle is None:
+            return
+        staged, file = self.staged_bundle
+        staged_files: List[Tuple[Any, str]] = [
+            (staged, self.bundle_file_name)
+        ]
+        try:
+            with span("write_files"):
+                file.close()
+                if self.sink.has_staged_contents(
+                        staged, self.bundle_file_name):
+                    self.sink.discard(staged_files)
+                    count("files_unchanged")
+                    self.unchanged_count += len(self.index)
+                else:
+                    self.sink.commit(staged_files)
+                    count("files_written")
+                    self.written_count += len(self.index)
+            self.sink.write(
+                self.index_file_name, json.dumps(self.index, indent=4)
+            )
+        except BaseException:
+            self.discard()
+            raise
+        self.staged_bundle = None
+        self.index = []
 
-    # Write the contents of the ability to the .yaml file
-    with open(file_name, 'w') as file:
-        yaml.dump([file_contents], file)
+    def discard(self) -> None:
+        """Drop the bundle if it hasn't been flushed"""
+        if self.staged_bundle is not None:
+            staged, file = self.staged_bundle
+            file.close()
+            self.sink.discard([(staged, self.bundle_file_name)])
+        self.staged_bundle = None
+        self.index = []
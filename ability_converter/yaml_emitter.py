@@ -0,0 +1,234 @@
+"""
+Module for serialising the abilities, profiles and sources written to the
+Caldera library as YAML
+
+dump_yaml gives the same output as yaml.dump with the default block style and
+sorted keys, except that repeated objects are written out in full rather than
+as anchors and aliases. Documents made only of mappings, sequences, strings,
+integers, booleans and None, which covers the fixed schemas of Ability,
+CalderaProfile and Sources, are written directly by a specialised emitter.
+Anything it can't write exactly as PyYAML would is passed to PyYAML, using the
+C-accelerated libyaml Dumper when it's available. libyaml folds escaped
+double-quoted scalars at other places than the pure Python emitter, so
+documents holding strings written double-quoted are passed to the pure Python
+Dumper instead.
+"""
+import functools
+import re
+
+from typing import Any, List, Optional
+
+import yaml
+
+# pylint: disable=import-error, no-name-in-module
+from ability_converter.instrumentation import span
+
+# Use the libyaml Dumper if PyYAML was built with it
+try:
+    from yaml import CSafeDumper as BaseDumper
+except ImportError: # pragma: no cover
+    from yaml import SafeDumper as BaseDumper # type: ignore
+
+# Constant defining the width past which PyYAML folds long scalars
+BEST_WIDTH = 80
+
+# Constant defining the length from which PyYAML writes a mapping key as a
+# complex key
+MAX_SIMPLE_KEY_LENGTH = 128
+
+# Constant defining the strings which are certainly written plain by PyYAML:
+# they start with a letter, contain no indicators and don't end in a space
+PLAIN_SCALAR_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_ ./()+=,-]*(?<! )")
+
+# Constant defining the characters which PyYAML writes without escaping
+PRINTABLE_PATTERN = re.compile(r"[\x20-\x7e]*")
+
+# Constant defining the strings starting with a letter which PyYAML resolves
+# to a type other than str
+RESERVED_SCALARS = frozenset(
+    word
+    for stem in ("yes", "no", "true", "false", "on", "off", "null")
+    for word in (stem, stem.capitalize(), stem.upper())
+)
+
+# Constant defining the tag of str scalars
+STR_TAG = "tag:yaml.org,2002:str"
+
+
+class Dumper(BaseDumper): # pylint: disable=too-many-ancestors
+    """
+    Dumper writing repeated objects in full instead of using anchors and
+    aliases, so the output matches the specialised emitter
+    """
+
+    def ignore_aliases(self, data: Any) -> bool:
+        return True
+
+
+class PythonDumper(yaml.SafeDumper): # pylint: disable=too-many-ancestors
+    """
+    Pure Python Dumper writing repeated objects in full, for the documents
+    which libyaml wouldn't write as the pure Python emitter does
+    """
+
+    def ignore_aliases(self, data: Any) -> bool:
+        return True
+
+
+class UnsupportedDocument(Exception):
+    """Exception raised when the specialised emitter can't write a document"""
+
+
+# An emitter and resolver used to choose the style of scalars exactly as
+# PyYAML would
+_analyser = yaml.emitter.Emitter(None)
+_resolver = yaml.resolver.Resolver()
+
+
+@functools.lru_cache(maxsize=4096)
+def scalar_style(value: str) -> Optional[str]:
+    """
+    Return the style in which PyYAML writes a string in block context, ''
+    for plain and "'" for single-quoted, or None for any other style
+    """
+    if PLAIN_SCALAR_PATTERN.fullmatch(value) and value not in RESERVED_SCALARS:
+        return ""
+    if not PRINTABLE_PATTERN.fullmatch(value):
+        return None
+
+    analysis = _analyser.analyze_scalar(value)
+    implicit: bool = _resolver.resolve(
+        yaml.ScalarNode, value, (True, False)
+    ) == STR_TAG
+    if implicit and analysis.allow_block_plain:
+        return ""
+    if analysis.allow_single_quoted and not analysis.multiline:
+        return "'"
+    return None
+
+
+def format_scalar(value: Any, column: int) -> str:
+    """
+    Format a scalar starting at the given column, raising
+    UnsupportedDocument if it isn't written on a single line by PyYAML
+    """
+    if value is None:
+        return "null"
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        style: Optional[str] = scalar_style(value)
+        if style == "":
+            formatted: str = value
+        elif style == "'":
+            formatted = "'" + value.replace("'", "''") + "'"
+        else:
+            raise UnsupportedDocument(value)
+        # PyYAML folds scalars which run past the best width at spaces
+        if column + len(formatted) > BEST_WIDTH and " " in formatted:
+            raise UnsupportedDocument(value)
+        return formatted
+    if isinstance(value, dict) and not value:
+        return "{}"
+    if isinstance(value, list) and not value:
+        return "[]"
+    raise UnsupportedDocument(value)
+
+
+def has_double_quoted_scalar(data: Any) -> bool:
+    """Check whether PyYAML writes any string of data double-quoted"""
+    if isinstance(data, str):
+        return scalar_style(data) is None
+    if isinstance(data, dict):
+        return any(
+            has_double_quoted_scalar(key) or has_double_quoted_scalar(value)
+            for key, value in data.items()
+        )
+    if isinstance(data, list):
+        return any(has_double_quoted_scalar(item) for item in data)
+    return False
+
+
+def emit_mapping(
+    mapping: dict,
+    indent: int,
+    lines: List[str],
+    inline: bool = False
+    ) -> None:
+    """
+    Append the lines of a block mapping at the given indent. If inline is
+    set, the first key follows a sequence indicator on the current line
+    """
+    for key in sorted(mapping):
+        if (not isinstance(key, str) or scalar_style(key) != ""
+                or len(key) >= MAX_SIMPLE_KEY_LENGTH):
+            raise UnsupportedDocument(key)
+        prefix: str = "" if inline else " " * indent
+        inline = False
+        value: Any = mapping[key]
+        if isinstance(value, dict) and value:
+            lines.append(f"{prefix}{key}:\n")
+            emit_mapping(value, indent + 2, lines)
+        elif isinstance(value, list) and value:
+            # Sequences in a mapping aren't indented
+            lines.append(f"{prefix}{key}:\n")
+            emit_sequence(value, indent, lines)
+        else:
+            scalar: str = format_scalar(value, indent + len(key) + 2)
+            lines.append(f"{prefix}{key}: {scalar}\n")
+
+
+def emit_sequence(
+    sequence: list,
+    indent: int,
+    lines: List[str],
+    inline: bool = False
+    ) -> None:
+    """
+    Append the lines of a block sequence at the given indent. If inline is
+    set, the first item follows a sequence indicator on the current line
+    """
+    for item in sequence:
+        prefix: str = "- " if inline else " " * indent + "- "
+        inline = False
+        if isinstance(item, dict) and item:
+            lines.append(prefix)
+            emit_mapping(item, indent + 2, lines, inline=True)
+        elif isinstance(item, list) and item:
+            lines.append(prefix)
+            emit_sequence(item, indent + 2, lines, inline=True)
+        else:
+            lines.append(f"{prefix}{format_scalar(item, indent + 2)}\n")
+
+
+def emit_document(data: Any) -> str:
+    """
+    Write a document with the specialised emitter, raising
+    UnsupportedDocument if it can't be written exactly as PyYAML would
+    """
+    lines: List[str] = []
+    if isinstance(data, dict) and data:
+        emit_mapping(data, 0, lines)
+    elif isinstance(data, list) and data:
+        emit_sequence(data, 0, lines)
+    else:
+        raise UnsupportedDocument(data)
+    return "".join(lines)
+
+
+def dump_yaml(data: Any) -> str:
+    """Serialise data as a YAML document"""
+    with span("serialise_yaml"):
+        try:
+            return emit_document(data)
+        except UnsupportedDocument:
+            return yaml.dump(
+                data,
+                Dumper=(
+                    PythonDumper if has_double_quoted_scalar(data) else Dumper
+                )
+            )